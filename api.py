@@ -0,0 +1,411 @@
+import os
+import json
+import gzip
+import uuid
+import hashlib
+from datetime import date
+from flask import Blueprint, current_app, request, url_for
+from werkzeug.exceptions import HTTPException, BadRequest, NotFound
+from scryfall import Scryfall
+from recognition_jobs import QueueFullError
+from game_store import new_game_state, apply_guess, current_blur_level
+from price_tracking import CURRENCIES
+from upload_stream import sniff_image_format
+
+# Por quanto tempo clientes e proxies podem reutilizar uma resposta sem revalidar
+CARD_MAX_AGE = int(os.environ.get("API_CARD_MAX_AGE", "3600"))
+SEARCH_MAX_AGE = int(os.environ.get("API_SEARCH_MAX_AGE", "300"))
+PRICES_MAX_AGE = int(os.environ.get("API_PRICES_MAX_AGE", "900"))
+
+# Respostas menores que isso não compensam a compressão
+COMPRESS_MIN_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Módulo brotli (opcional), importado na primeira resposta comprimida
+_brotli = None
+
+
+def _get_brotli():
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli
+
+
+# -------------------------------------------------------------------
+# PROJEÇÃO DE CAMPOS E RESPOSTAS
+# -------------------------------------------------------------------
+def requested_fields():
+    """Campos pedidos em ?fields=name,prices,image_uris.normal (ou None para todos)."""
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    return fields or None
+
+
+def project(data, fields):
+    """
+    Mantém só os campos pedidos (e o ID). Um campo com ponto seleciona
+    um subcampo: 'image_uris.normal' traz só a imagem normal.
+    Campos inexistentes são ignorados.
+    """
+    if not fields:
+        return data
+
+    result = {'id': data['id']} if 'id' in data else {}
+    for field in fields:
+        parts = field.split('.')
+        value = data
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = result
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return result
+
+
+def version_etag(*parts):
+    """
+    ETag a partir da versão dos dados (ex: ID da carta, quando foi buscada e
+    ?fields=), calculado antes de montar a resposta. None se faltar a versão.
+    """
+    if any(part is None for part in parts):
+        return None
+    return hashlib.sha1('|'.join(map(str, parts)).encode('utf-8')).hexdigest()
+
+
+def _cacheable(response, max_age, etag):
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    # Fraco: o mesmo ETag vale para as versões gzip, brotli e sem compressão
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def not_modified(etag, max_age):
+    """
+    Resposta 304 (sem corpo) se o If-None-Match do cliente já tem esse ETag,
+    senão None. Chamada antes da projeção e da serialização da resposta.
+    """
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    return _cacheable(current_app.response_class(status=304), max_age, etag)
+
+
+def api_response(payload, status=200, max_age=0, etag=None):
+    """
+    Resposta JSON compacta. Com max_age, a resposta é pública e leva um
+    ETag: o de version_etag (`etag`) ou, sem ele, o hash do conteúdo;
+    um If-None-Match igual recebe 304 sem corpo.
+    Sem max_age, não pode ser guardada (estado de jogos e jobs).
+    """
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    response = current_app.response_class(body, status=status, mimetype='application/json')
+
+    if max_age:
+        _cacheable(response, max_age, etag or hashlib.sha1(body).hexdigest())
+        response.make_conditional(request)
+    else:
+        response.cache_control.no_store = True
+    return response
+
+
+def api_error(message, status):
+    return api_response({'error': message}, status=status)
+
+
+def compress_response(response):
+    """Comprime respostas JSON com brotli (se instalado) ou gzip, conforme o Accept-Encoding."""
+    response.vary.add('Accept-Encoding')
+
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    offered = ['br', 'gzip'] if _get_brotli() else ['gzip']
+    encoding = request.accept_encodings.best_match(offered)
+
+    if encoding == 'br':
+        response.set_data(_get_brotli().compress(body, quality=BROTLI_QUALITY))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+    else:
+        return response
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# -------------------------------------------------------------------
+# JOGO: O QUE O CLIENTE PODE VER
+# -------------------------------------------------------------------
+def game_view(game_id, game_state):
+    """Estado público do jogo (o nome da carta só aparece quando o jogo termina)."""
+    view = {
+        'id': game_id,
+        'image_url': current_blur_level(game_state),
+        'word_length': game_state.get('word_length'),
+        'attempts': game_state['attempts'],
+        'max_attempts': game_state['max_attempts'],
+        'guesses': game_state['guesses'],
+        'game_over': game_state['game_over'],
+        'win': game_state['win']
+    }
+    if game_state['game_over']:
+        view['card_name'] = game_state['card_name']
+        view['image_url_original'] = game_state['image_url_original']
+    return view
+
+
+# -------------------------------------------------------------------
+# ROTAS (/api/v1)
+# -------------------------------------------------------------------
+def create_api(recognition_pipeline, game_pool, game_store, price_tracker=None):
+    """
+    Cria o blueprint da API JSON v1 usando o pipeline de reconhecimento,
+    o estoque de jogos, o armazenamento de jogos e (opcional) o histórico de preços do app.
+    """
+    api = Blueprint('api', __name__, url_prefix='/api/v1')
+    api.after_request(compress_response)
+
+    @api.errorhandler(HTTPException)
+    def http_error(error):
+        return api_error(error.description, error.code)
+
+    # -------------------------------
+    # CARTAS
+    # -------------------------------
+
+    @api.route('/cards/<card_id>')
+    def card(card_id):
+        """Carta completa da Scryfall (ou só os campos de ?fields=)."""
+        card_data = Scryfall.search_unique_card(card_id)
+        if card_data == "Not found":
+            return api_error('Card not found', 404)
+
+        # Revalidação: a versão da carta basta, sem projetar nem serializar
+        etag = version_etag('card', card_data['id'], Scryfall.card_version(card_data['id']),
+                            request.args.get('fields', ''))
+        cached = not_modified(etag, CARD_MAX_AGE)
+        if cached is not None:
+            return cached
+        return api_response(project(card_data, requested_fields()), max_age=CARD_MAX_AGE, etag=etag)
+
+    @api.route('/cards/search')
+    def card_search():
+        """
+        Busca paginada: ?q=...&page=N. Cada carta traz ID, nome e imagem
+        (ou só os campos de ?fields= dentre esses).
+        """
+        query = request.args.get('q', '').strip()
+        if not query:
+            return api_error('Missing query parameter q', 400)
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        results = Scryfall.search_cards(query, page=page)
+        if results == "Not found":
+            return api_error('Card search failed', 502)
+
+        etag = version_etag('search', query, page, results['page_size'],
+                            results['fetched_at'] or None, request.args.get('fields', ''))
+        cached = not_modified(etag, SEARCH_MAX_AGE)
+        if cached is not None:
+            return cached
+
+        fields = requested_fields()
+        payload = {
+            'data': [project(card_data, fields) for card_data in results['cards']],
+            'total_cards': results['total_cards'],
+            'page': page,
+            'page_size': results['page_size'],
+            'has_more': results['has_more']
+        }
+        if results['has_more']:
+            payload['next_page'] = url_for('api.card_search', q=query, page=page + 1,
+                                           **({'fields': request.args['fields']} if fields else {}))
+        return api_response(payload, max_age=SEARCH_MAX_AGE, etag=etag)
+
+    # -------------------------------
+    # RECONHECIMENTO
+    # -------------------------------
+
+    @api.route('/recognition', methods=['POST'])
+    def create_recognition():
+        """Enfileira o reconhecimento da imagem em card_image (HTTP 202 com o ID do job)."""
+        file = request.files.get('card_image')
+        if file is None or not file.filename:
+            return api_error('No file selected', 400)
+
+        image_format = sniff_image_format(file.stream)
+        if not image_format:
+            return api_error('Invalid file type. Upload PNG/JPG/JPEG/GIF/HEIC only.', 400)
+
+        try:
+            job = recognition_pipeline.submit(file.stream.read(), formats=[image_format])
+        except QueueFullError:
+            response = api_error('Recognition queue is full, try again shortly', 503)
+            response.headers['Retry-After'] = '5'
+            return response
+
+        response = api_response({
+            'job_id': job['id'],
+            'status': job['status'],
+            'status_url': url_for('api.recognition_status', job_id=job['id'])
+        }, status=202)
+        response.headers['Location'] = url_for('api.recognition_status', job_id=job['id'])
+        return response
+
+    @api.route('/recognition/<job_id>')
+    def recognition_status(job_id):
+        """Estado do job; quando termina, traz a carta identificada e o link para ela."""
+        job = recognition_pipeline.get(job_id)
+        if job is None:
+            return api_error('Job not found', 404)
+
+        if job['status'] == 'done':
+            job['card_url'] = url_for('api.card', card_id=job['card_id'])
+        return api_response(job)
+
+    # -------------------------------
+    # JOGO
+    # -------------------------------
+
+    @api.route('/games', methods=['POST'])
+    def create_game():
+        """Inicia um jogo com uma carta aleatória (HTTP 201)."""
+        game = game_pool.get_game()
+        if game is None:
+            return api_error('Could not fetch a valid card', 503)
+
+        game_id = uuid.uuid4().hex
+        game_state = new_game_state(game, lambda path: url_for('static', filename=path))
+        game_store.save(game_id, game_state)
+
+        response = api_response(game_view(game_id, game_state), status=201)
+        response.headers['Location'] = url_for('api.game', game_id=game_id)
+        return response
+
+    @api.route('/games/<game_id>')
+    def game(game_id):
+        game_state = game_store.get(game_id)
+        if game_state is None:
+            return api_error('Game not found', 404)
+        game_pool.touch_game(game_state)
+        return api_response(game_view(game_id, game_state))
+
+    @api.route('/games/<game_id>/guesses', methods=['POST'])
+    def make_guess(game_id):
+        """Palpite em JSON ({"guess": "..."}) ou formulário. Retorna o resultado e o jogo."""
+        game_state = game_store.get(game_id)
+        if game_state is None:
+            return api_error('Game not found', 404)
+        game_pool.touch_game(game_state)
+        if game_state['game_over']:
+            return api_error('Game is over', 409)
+
+        data = request.get_json(silent=True) or request.form
+        guess = str(data.get('guess') or '').strip()
+        if not guess:
+            return api_error('Missing guess', 400)
+
+        result = apply_guess(game_state, guess)
+        game_store.save(game_id, game_state)
+        return api_response({'result': result, 'game': game_view(game_id, game_state)})
+
+    # -------------------------------
+    # PREÇOS
+    # -------------------------------
+
+    def price_store():
+        if price_tracker is None:
+            raise NotFound('Price tracking is not enabled')
+        return price_tracker.store
+
+    def requested_dates():
+        """Datas de ?from= e ?to= (AAAA-MM-DD), ou None quando ausentes."""
+        dates = []
+        for name in ('from', 'to'):
+            value = request.args.get(name) or None
+            if value is not None:
+                try:
+                    date.fromisoformat(value)
+                except ValueError:
+                    raise BadRequest(f'Invalid date in {name} (use YYYY-MM-DD)')
+            dates.append(value)
+        return dates
+
+    @api.route('/cards/<card_id>/prices')
+    def card_prices(card_id):
+        """
+        Histórico de preços: ?from=AAAA-MM-DD&to=AAAA-MM-DD (padrão: tudo até hoje).
+        Só os dias com mudança, ou um ponto por dia com ?daily=1.
+        """
+        start, end = requested_dates()
+        store = price_store()
+        history = store.history(card_id, start, end, daily=request.args.get('daily') == '1')
+        if history is None:
+            return api_error('No price history for this card', 404)
+
+        # Variação entre o primeiro e o último ponto do intervalo
+        change = {
+            currency: round((history[-1][currency] - history[0][currency]) * 100 / history[0][currency], 2)
+            for currency in CURRENCIES
+            if history and history[0][currency] and history[-1][currency] is not None
+        }
+        return api_response({'id': card_id, 'points': history, 'percent_change': change}, max_age=PRICES_MAX_AGE)
+
+    @api.route('/prices/movers')
+    def price_movers():
+        """
+        Maiores altas (ou quedas, com ?falling=1) entre ?from e ?to:
+        ?currency=usd&limit=20&min_price=1&watched=1.
+        """
+        start, end = requested_dates()
+        if start is None:
+            return api_error('Missing query parameter from', 400)
+
+        currency = request.args.get('currency', 'usd')
+        if currency not in CURRENCIES:
+            return api_error(f'Unknown currency (use one of {", ".join(CURRENCIES)})', 400)
+
+        movers = price_store().movers(
+            start, end, currency=currency,
+            limit=min(request.args.get('limit', 20, type=int), 200),
+            min_price=request.args.get('min_price', 1.0, type=float),
+            watched_only=request.args.get('watched') == '1',
+            falling=request.args.get('falling') == '1'
+        )
+        return api_response({'data': movers}, max_age=PRICES_MAX_AGE)
+
+    @api.route('/prices/watchlist', methods=['GET', 'POST'])
+    def price_watchlist():
+        """Cartas acompanhadas; POST {"card_id": ...} adiciona uma carta."""
+        store = price_store()
+        if request.method == 'GET':
+            return api_response({'data': store.watched()})
+
+        data = request.get_json(silent=True) or request.form
+        card_data = Scryfall.search_unique_card(str(data.get('card_id') or ''))
+        if card_data == "Not found":
+            return api_error('Card not found', 404)
+
+        store.watch(card_data)
+        return api_response({'id': card_data['id'], 'name': card_data['name']}, status=201)
+
+    @api.route('/prices/watchlist/<card_id>', methods=['DELETE'])
+    def price_unwatch(card_id):
+        price_store().unwatch(card_id)
+        return '', 204
+
+    return api
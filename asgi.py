@@ -0,0 +1,296 @@
+# Versão ASGI (assíncrona) das páginas do site: `hypercorn asgi:app` ou
+# `uvicorn asgi:app` (requer quart e httpx). As rotas aguardam a Scryfall e o
+# OCR remoto sem prender uma thread por requisição, e o trabalho de CPU roda
+# no executor de async_clients. Os objetos compartilhados (jobs, lote, estoque
+# e estado dos jogos) são os de main.py, com cookie de sessão compatível.
+# A API JSON (/api/v1) continua no app WSGI.
+import json
+import asyncio
+from quart import Quart, render_template, request, redirect, url_for, flash, session, jsonify, abort, Response, g
+from werkzeug.utils import secure_filename
+from async_clients import AsyncResources, AsyncScryfall, AsyncCardRecognition, iterate_in_thread
+from recognition_jobs import QueueFullError
+from game_store import (new_game_state, apply_guess,
+                        load_session_game, save_session_game, reset_session_game)
+import metrics
+import main
+import views
+
+# Cria instância do Quart (mesmos templates e arquivos estáticos do app WSGI)
+app = Quart(__name__)
+app.secret_key = main.app.secret_key
+
+app.config['UPLOAD_FOLDER'] = main.UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = views.MAX_BATCH_SIZE
+app.config['ALLOWED_EXTENSIONS'] = views.ALLOWED_EXTENSIONS
+
+recognition_pipeline = main.recognition_pipeline
+batch_recognizer = main.batch_recognizer
+game_pool = main.game_pool
+game_store = main.game_store
+
+@app.after_serving
+async def close_clients():
+    """Fecha o cliente HTTP compartilhado ao encerrar o servidor."""
+    await AsyncResources.close()
+
+@app.before_request
+async def start_workers():
+    """Threads do estoque de jogos e dos preços (ver main.start_background_threads)."""
+    main.start_background_threads()
+
+@app.before_request
+async def start_request_metrics():
+    """Marca o início da requisição (latência por rota em /metrics)."""
+    g.metrics_started = metrics.request_started()
+
+@app.after_request
+async def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    return metrics.request_finished(g.get('metrics_started'), route, request.method, response)
+
+@app.before_request
+async def limit_upload_size():
+    """Só as rotas de lote aceitam uploads acima de MAX_FILE_SIZE."""
+    views.limit_upload_size(request.endpoint, request.content_length)
+
+@app.after_request
+async def cache_derived_images(response):
+    """Derivadas com hash na URL: cache imutável (ver views.cache_derived_images)."""
+    return views.cache_derived_images(request.endpoint, request.path, response)
+
+# -------------------------------
+# ROTAS PRINCIPAIS
+# -------------------------------
+
+@app.route('/')
+async def home():
+    """Página inicial do site."""
+    return await render_template('index.html')
+
+@app.route('/card-detail/<card_id>')
+async def card_detail(card_id):
+    """Exibe detalhes de uma carta pelo ID."""
+    card_data = await AsyncScryfall.search_unique_card(card_id)
+    if card_data != "Not found":
+        return await render_template('pages/card-detail.html', card=card_data)
+    else:
+        await flash(views.CARD_NOT_FOUND, 'error')
+        return redirect(url_for('home'))
+
+@app.route('/random-card')
+async def random_card():
+    """Mostra uma carta aleatória usando a API Scryfall."""
+    try:
+        card_data = await AsyncScryfall.get_random_card()
+        if card_data != "Not found":
+            return await render_template('pages/card-detail.html', card=card_data)
+        else:
+            return redirect(url_for('home'))
+    except Exception as e:
+        await flash(f'Error fetching random card: {str(e)}', 'error')
+        return redirect(url_for('home'))
+
+# -------------------------------
+# BUSCA DE CARTAS
+# -------------------------------
+
+@app.route('/card-search', methods=['GET', 'POST'])
+async def card_search():
+    """Busca paginada de cartas (ver main.card_search)."""
+    if request.method == 'POST':
+        search_term = (await request.form).get('search_term', '').strip()
+        if not search_term:
+            await flash(views.EMPTY_SEARCH, 'error')
+            return redirect(url_for('card_search'))
+        return redirect(url_for('card_search', q=search_term))
+
+    search_term = request.args.get('q', '').strip()
+    if not search_term:
+        return await render_template('pages/card-search.html')
+
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    try:
+        results = await AsyncScryfall.search_cards(search_term, page=page)
+
+        if results == "Not found" or not results['cards']:
+            await flash(f'No cards found for "{search_term}"', 'info')
+            return await render_template('pages/card-search.html', cards=[], search_term=search_term)
+
+        return await render_template('pages/card-search.html', **views.search_template_args(results, search_term, page))
+
+    except Exception as e:
+        await flash(f'Error searching for cards: {str(e)}', 'error')
+        return redirect(url_for('card_search'))
+
+# -------------------------------
+# JOGO INTERATIVO (ADIVINHAR A CARTA)
+# -------------------------------
+
+def load_game_state():
+    """Estado do jogo atual, com as imagens marcadas como usadas (bloqueante: rodar numa thread)."""
+    game_state = load_session_game(session, game_store)
+    game_pool.touch_game(game_state)
+    return game_state
+
+def game_image_sources(image_url):
+    """srcset das derivadas de uma imagem do jogo (ver views.game_image_sources)."""
+    return views.game_image_sources(game_pool.images.derivatives, image_url,
+                                    lambda path: url_for('static', filename=path))
+
+@app.route('/interactive-game')
+async def interactive_game():
+    """Página principal do jogo (ver main.interactive_game)."""
+    game_state = await asyncio.to_thread(load_game_state)
+    if game_state is None:
+        return await render_template('pages/interactive-game.html', game_active=False)
+
+    return await render_template('pages/interactive-game.html', **views.game_template_args(game_state, game_image_sources))
+
+@app.route('/interactive-game/new', methods=['POST'])
+async def new_game():
+    """Inicia um novo jogo com uma carta aleatória."""
+    try:
+        # Com o estoque vazio o jogo é preparado na hora (bloqueante): vai para uma thread
+        game = await asyncio.to_thread(game_pool.get_game)
+
+        if game is None:
+            await flash(views.NO_VALID_CARD, 'error')
+            return redirect(url_for('interactive_game'))
+
+        await asyncio.to_thread(reset_session_game, session, game_store)
+
+        game_state = new_game_state(game, lambda path: url_for('static', filename=path))
+        await asyncio.to_thread(save_session_game, session, game_store, game_state)
+    except Exception as e:
+        await flash(views.GAME_START_FAILED, 'error')
+
+    return redirect(url_for('interactive_game'))
+
+@app.route('/interactive-game/pool/stats')
+async def game_pool_stats():
+    """Estatísticas do estoque de jogos pré-gerados."""
+    return jsonify(game_pool.stats())
+
+@app.route('/interactive-game/guess', methods=['POST'])
+async def make_guess():
+    """Processa uma tentativa do jogador."""
+    game_state = await asyncio.to_thread(load_game_state)
+    if game_state is None or game_state['game_over']:
+        return redirect(url_for('interactive_game'))
+
+    guess = (await request.form).get('guess', '').strip()
+
+    if not guess:
+        return redirect(url_for('interactive_game'))
+
+    result = apply_guess(game_state, guess)
+
+    message = views.guess_message(result, game_state)
+    if message:
+        await flash(*message)
+
+    await asyncio.to_thread(save_session_game, session, game_store, game_state)
+    return redirect(url_for('interactive_game'))
+
+# -------------------------------
+# RECONHECIMENTO DE CARTA (OCR)
+# -------------------------------
+
+@app.route('/card-recognition', methods=['GET', 'POST'])
+async def card_recognition():
+    """
+    Página para envio de imagem. A imagem é processada em memória no
+    executor de CPU; o OCR e a busca na Scryfall são aguardados sem bloquear.
+    """
+    if request.method == 'POST':
+        file = (await request.files).get('card_image')
+        image_format, error = views.check_upload(file)
+
+        if image_format:
+            try:
+                image_bytes, analysis = await AsyncCardRecognition.process_image(file.stream, formats=[image_format])
+                identifier = await AsyncCardRecognition.identify_card_from_bytes(image_bytes, analysis)
+
+                if identifier:
+                    card_data = await AsyncScryfall.search_card(identifier)
+                    if card_data == "Not found":
+                        await flash(views.CARD_NOT_IN_SCRYFALL, 'error')
+                        return redirect(request.url)
+
+                    return await render_template('pages/card-detail.html', identifier=identifier, card=card_data)
+                else:
+                    await flash(views.CARD_NOT_IDENTIFIED, 'error')
+                    return redirect(request.url)
+
+            except Exception as e:
+                await flash(f'Error processing image: {str(e)}', 'error')
+                return redirect(request.url)
+        else:
+            await flash(error, 'error')
+            return redirect(request.url)
+
+    return await render_template('pages/card-recognition.html')
+
+@app.route('/card-recognition/jobs', methods=['POST'])
+async def create_recognition_job():
+    """Enfileira o reconhecimento no mesmo pipeline do app WSGI (HTTP 202)."""
+    file = (await request.files).get('card_image')
+    image_format, error = views.check_upload(file)
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        # O job é gravado no SQLite compartilhado: vai para uma thread
+        job = await asyncio.to_thread(recognition_pipeline.submit, file.stream.read(), formats=[image_format])
+    except QueueFullError:
+        response = jsonify({'error': views.QUEUE_FULL})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    return jsonify(views.job_created(job, url_for('recognition_job_status', job_id=job['id']))), 202
+
+@app.route('/card-recognition/batch', methods=['GET', 'POST'])
+async def card_recognition_batch():
+    """Reconhecimento em lote, respondido em streaming (NDJSON)."""
+    if request.method == 'GET':
+        return await render_template('pages/card-recognition-batch.html')
+
+    files = [file for file in (await request.files).getlist('card_images') if file.filename]
+    if not files:
+        return jsonify({'error': views.NO_FILE}), 400
+
+    uploads = [(secure_filename(file.filename), file.stream) for file in files]
+    detail_url = url_for('card_detail', card_id='CARD_ID')
+
+    async def generate():
+        async for result in iterate_in_thread(batch_recognizer.recognize_uploads(uploads)):
+            if result.get('card_id'):
+                result['detail_url'] = detail_url.replace('CARD_ID', result['card_id'])
+            yield json.dumps(result) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/card-recognition/jobs/stats')
+async def recognition_job_stats():
+    """Estatísticas do pipeline de reconhecimento (tempo médio por estágio)."""
+    return jsonify(recognition_pipeline.stats())
+
+@app.route('/card-recognition/jobs/<job_id>')
+async def recognition_job_status(job_id):
+    """Retorna o estado de um job de reconhecimento em JSON."""
+    job = await asyncio.to_thread(recognition_pipeline.get, job_id)
+    if job is None:
+        return jsonify({'error': views.JOB_NOT_FOUND}), 404
+
+    if job['status'] == 'done':
+        job['detail_url'] = url_for('card_detail', card_id=job['card_id'])
+    return jsonify(job)
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    """Métricas deste worker no formato do Prometheus (as mesmas do app WSGI)."""
+    if not metrics.ENABLED:
+        abort(404)
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import functools
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from scryfall import Scryfall
+from card_cache import CardCache
+from card_recognition import CardRecognition
+from rate_limit import async_request_with_retry, AsyncSingleFlight
+from image_utils import process_image_to_bytes
+import card_detection
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Conexões simultâneas do cliente HTTP assíncrono (todas as APIs somadas)
+MAX_CONNECTIONS = int(os.environ.get("ASYNC_MAX_CONNECTIONS", "200"))
+
+# Threads para o trabalho de CPU (imagens, detecção, hashes), fora do event loop
+CPU_WORKERS = int(os.environ.get("ASYNC_CPU_WORKERS", str(os.cpu_count() or 2)))
+
+
+# -------------------------------------------------------------------
+# RECURSOS COMPARTILHADOS (CLIENTE HTTP E EXECUTOR DE CPU)
+# -------------------------------------------------------------------
+class AsyncResources:
+    """
+    Cliente httpx.AsyncClient compartilhado (um por event loop, com pool
+    de conexões keep-alive) e o executor do trabalho de CPU (um por processo).
+    """
+
+    _client = None
+    _client_loop = None
+
+    _executor = None
+    _executor_pid = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_client():
+        """Retorna o cliente do event loop atual, criando-o se necessário."""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if AsyncResources._client is None or AsyncResources._client_loop is not loop:
+            AsyncResources._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS // 2),
+                timeout=httpx.Timeout(Scryfall.READ_TIMEOUT, connect=Scryfall.CONNECT_TIMEOUT)
+            )
+            AsyncResources._client_loop = loop
+        return AsyncResources._client
+
+    @staticmethod
+    def get_executor():
+        pid = os.getpid()
+        if AsyncResources._executor is None or AsyncResources._executor_pid != pid:
+            with AsyncResources._lock:
+                if AsyncResources._executor is None or AsyncResources._executor_pid != pid:
+                    AsyncResources._executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix='cpu')
+                    AsyncResources._executor_pid = pid
+        return AsyncResources._executor
+
+    @staticmethod
+    async def run_cpu(function, *args, **kwargs):
+        """Executa uma função de CPU (ex: image_utils) no executor e aguarda o resultado."""
+        loop = asyncio.get_running_loop()
+        # Copia o contexto: os spans medidos na thread contam para a requisição atual
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(AsyncResources.get_executor(),
+                                          functools.partial(context.run, function, *args, **kwargs))
+
+    @staticmethod
+    async def close():
+        """Fecha o cliente HTTP (no encerramento do app)."""
+        if AsyncResources._client is not None:
+            await AsyncResources._client.aclose()
+            AsyncResources._client = None
+
+
+# -------------------------------------------------------------------
+# SCRYFALL ASSÍNCRONO
+# -------------------------------------------------------------------
+class AsyncScryfall:
+    """
+    Versão assíncrona das consultas de Scryfall, com o mesmo índice local,
+    caches, limite de requisições e retentativas. Só a espera pela rede
+    muda: enquanto uma consulta aguarda a API, o processo atende outras.
+    """
+
+    _inflight = AsyncSingleFlight()
+
+    @staticmethod
+    async def _request(method, path, **kwargs):
+        """Requisição na API (ver Scryfall._request), agrupando as iguais em andamento."""
+        import httpx
+
+        key = (method, path, json.dumps(kwargs, sort_keys=True))
+        client = AsyncResources.get_client()
+
+        def send():
+            return client.request(
+                method,
+                f"{Scryfall.BASE_URL}{path}",
+                headers={**Scryfall.DEFAULT_HEADERS, **Scryfall.header},
+                **kwargs
+            )
+
+        return await AsyncScryfall._inflight.do(key, lambda: async_request_with_retry(
+            send, Scryfall.rate_limiter, connection_errors=(httpx.TransportError,)
+        ))
+
+    @staticmethod
+    async def _get(path, params=None):
+        return await AsyncScryfall._request("GET", path, params=params)
+
+    @staticmethod
+    async def _resolve_candidates(card):
+        """Candidatos de set + número (ver Scryfall._resolve_candidates)."""
+        # O cache de cartas pode estar em SQLite: as consultas e gravações vão para uma thread
+        local, pending = await asyncio.to_thread(
+            Scryfall._resolve_candidates_local, Scryfall._set_number_candidates(card))
+        if not pending:
+            return local
+
+        if len(pending) == 1:
+            candidate = pending[0]
+            response = await AsyncScryfall._get(f"/cards/{candidate['set']}/{candidate['number']}")
+            if response.status_code == 200:
+                card_data = response.json()
+                await asyncio.to_thread(Scryfall.cache.put_card, card_data,
+                                        CardCache.set_number_key(candidate['set'], candidate['number']))
+                return card_data
+            return local
+
+        response = await AsyncScryfall._request("POST", "/cards/collection", json=Scryfall._collection_payload(pending))
+        if response.status_code != 200:
+            logger.warning("Card collection request failed: HTTP %s", response.status_code)
+            return local
+        return Scryfall._pick_from_collection(pending, response.json()['data']) or local
+
+    @staticmethod
+    async def _search_exact_name(name, query_name):
+        if Scryfall.index is not None:
+            card_data = Scryfall.index.get_by_name(name)
+            if card_data is not None:
+                return card_data
+
+        cached = await asyncio.to_thread(Scryfall.cache.get_by_name, name)
+        if cached is not None:
+            return cached
+
+        response = await AsyncScryfall._get("/cards/named", params={"exact": name})
+        if response.status_code == 200:
+            card_data = response.json()
+            await asyncio.to_thread(Scryfall.cache.put_card, card_data, CardCache.name_key(query_name))
+            return card_data
+        return None
+
+    @staticmethod
+    async def get_random_card():
+        """Carta aleatória (do índice local, se houver)."""
+        if Scryfall.index is not None:
+            card_data = Scryfall.index.random_card()
+            if card_data is not None:
+                return card_data
+
+        response = await AsyncScryfall._get("/cards/random")
+        if response.status_code == 200:
+            card_data = response.json()
+            await asyncio.to_thread(Scryfall.cache.put_card, card_data)
+            return card_data
+        return "Not found"
+
+    @staticmethod
+    async def search_unique_card(card_id):
+        """Carta pelo ID único da Scryfall."""
+        if Scryfall.index is not None:
+            card_data = Scryfall.index.get_card(card_id)
+            if card_data is not None:
+                return card_data
+
+        cached = await asyncio.to_thread(Scryfall.cache.get_card, card_id)
+        if cached is not None:
+            return cached
+
+        response = await AsyncScryfall._get(f"/cards/{card_id}")
+        if response.status_code == 200:
+            card_data = response.json()
+            await asyncio.to_thread(Scryfall.cache.put_card, card_data)
+            return card_data
+        return "Not found"
+
+    @staticmethod
+    async def search_card(card):
+        """Mesma ordem de Scryfall.search_card: ID, set + número, nome exato/aproximado."""
+        if card.get('id'):
+            card_data = await AsyncScryfall.search_unique_card(card['id'])
+            if card_data != "Not found":
+                return card_data
+
+        card_data = await AsyncScryfall._resolve_candidates(card)
+        if card_data is not None:
+            return card_data
+
+        if Scryfall.index is not None:
+            card_data = Scryfall.index.get_by_name(card['name'])
+            if card_data is not None:
+                return card_data
+
+        cached = await asyncio.to_thread(Scryfall.cache.get_by_name, card['name'])
+        if cached is not None:
+            return cached
+
+        # O catálogo de nomes pode precisar ser baixado (chamada síncrona): vai para uma thread
+        matcher = await asyncio.to_thread(Scryfall.get_matcher)
+        if matcher is not None:
+            best_name = await AsyncResources.run_cpu(matcher.best, card['name'])
+            if best_name is not None:
+                card_data = await AsyncScryfall._search_exact_name(best_name, card['name'])
+                if card_data is not None:
+                    return card_data
+
+        response = await AsyncScryfall._get("/cards/named", params={"fuzzy": card['name']})
+        if response.status_code == 200:
+            card_data = response.json()
+            await asyncio.to_thread(Scryfall.cache.put_card, card_data, CardCache.name_key(card['name']))
+            return card_data
+        return "Not found"
+
+    @staticmethod
+    async def _search_api_page(query, api_page):
+        cached = await asyncio.to_thread(Scryfall.search_cache.get, query, api_page)
+        if cached is not None:
+            return cached
+
+        result = Scryfall._search_page_from_response(
+            await AsyncScryfall._get("/cards/search", params={"q": query, "page": api_page})
+        )
+        if result is not None:
+            result['fetched_at'] = time.time()
+            await asyncio.to_thread(Scryfall.search_cache.put, query, api_page, result)
+        return result
+
+    @staticmethod
+    async def search_cards(query, page=1, page_size=None):
+        """Busca paginada (ver Scryfall.search_cards)."""
+        page_size = page_size or Scryfall.SEARCH_PAGE_SIZE
+        start, end, api_page = Scryfall._search_window(page, page_size)
+
+        cards = []
+        fetched_at = 0
+        while True:
+            result = await AsyncScryfall._search_api_page(query, api_page)
+            if result is None:
+                return "Not found"
+            fetched_at = max(fetched_at, result.get('fetched_at', 0))
+            if Scryfall._take_from_api_page(cards, result, api_page, start, end):
+                break
+            api_page += 1
+
+        return {
+            'cards': cards,
+            'total_cards': result['total_cards'],
+            'page': page,
+            'page_size': page_size,
+            'has_more': end < result['total_cards'],
+            'fetched_at': fetched_at
+        }
+
+
+# -------------------------------------------------------------------
+# RECONHECIMENTO ASSÍNCRONO
+# -------------------------------------------------------------------
+class AsyncCardRecognition:
+    """
+    Reconhecimento com a mesma ordem de CardRecognition (hashes da arte,
+    OCR das regiões, OCR da imagem inteira). O processamento da imagem roda
+    no executor de CPU e o OCR remoto usa o cliente HTTP compartilhado.
+    """
+
+    @staticmethod
+    async def process_image(source, formats=None):
+        """
+        Redimensiona/comprime e analisa a imagem no executor.
+        Retorna (bytes da imagem inteira, análise ou None).
+        """
+        image_bytes = await AsyncResources.run_cpu(process_image_to_bytes, source, formats=formats)
+        try:
+            with metrics.span('detect'):
+                analysis = await AsyncResources.run_cpu(card_detection.analyze_card, image_bytes)
+        except Exception as e:
+            logger.warning("Card detection failed: %s", e)
+            analysis = None
+        return image_bytes, analysis
+
+    @staticmethod
+    async def _ocr(image_bytes):
+        with metrics.span('ocr'):
+            return await CardRecognition.backend.extract_text_async(image_bytes, AsyncResources.get_client())
+
+    @staticmethod
+    async def identify_card_from_bytes(image_bytes, analysis=None):
+        # A tabela de sets usada na extração pode precisar ser baixada (chamada síncrona): vai para uma thread
+        if Scryfall._set_codes is None:
+            await asyncio.to_thread(Scryfall.get_set_codes)
+
+        if analysis and CardRecognition.hash_index is not None:
+            identifier = await AsyncResources.run_cpu(CardRecognition._identify_from_hashes, analysis['hashes'])
+            if identifier:
+                logger.debug("Found identifier: %s", identifier)
+                return identifier
+
+        if analysis and analysis['regions']:
+            identifier = CardRecognition._identifier_from_region_text(await AsyncCardRecognition._ocr(analysis['regions']))
+            if identifier:
+                logger.debug("Found identifier: %s", identifier)
+                return identifier
+            logger.debug("Region OCR found nothing, retrying with the whole image.")
+
+        ocr_text = await AsyncCardRecognition._ocr(image_bytes)
+        if ocr_text:
+            identifier = CardRecognition._extract_identifier_from_text(ocr_text)
+            logger.debug("Found identifier: %s", identifier)
+            return identifier
+
+        logger.info("Could not get OCR text.")
+        return None
+
+    @staticmethod
+    async def identify_card(source):
+        """Processa a imagem (caminho, bytes ou arquivo) e identifica a carta."""
+        image_bytes, analysis = await AsyncCardRecognition.process_image(source)
+        return await AsyncCardRecognition.identify_card_from_bytes(image_bytes, analysis)
+
+
+async def iterate_in_thread(iterable):
+    """
+    Percorre um iterador bloqueante (ex: BatchRecognizer.recognize_uploads)
+    em uma thread, entregando cada item ao event loop assim que fica pronto.
+    """
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
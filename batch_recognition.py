@@ -0,0 +1,240 @@
+import os
+import time
+import zipfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from card_detection import process_image_for_recognition
+from card_recognition import CardRecognition
+from card_cache import CardCache
+from scryfall import Scryfall
+from upload_stream import sniff_image_format
+
+# Assinatura (magic bytes) de um arquivo .zip
+ZIP_SIGNATURE = b'PK\x03\x04'
+
+
+class BatchRecognizer:
+    """
+    Reconhece várias cartas de uma vez:
+    - processamento das imagens e análise da carta (CPU) em um pool de processos
+    - OCR e buscas na Scryfall (I/O) em um pool de threads
+    - identificadores repetidos geram uma única busca
+    Os resultados são produzidos à medida que cada carta termina.
+    """
+
+    def __init__(self, cpu_workers=None, io_workers=8, max_files=100, max_entry_bytes=20 * 1024 * 1024,
+                 max_total_bytes=200 * 1024 * 1024):
+        self.cpu_workers = cpu_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.io_workers = io_workers
+        self.max_files = max_files
+        self.max_entry_bytes = max_entry_bytes
+        # As imagens do lote ficam em memória: limite para o conteúdo extraído dos .zip
+        self.max_total_bytes = max_total_bytes
+
+        self._lock = threading.Lock()
+        self._process_pool = None
+        self._thread_pool = None
+        self._pool_pid = None
+
+    @staticmethod
+    def from_env():
+        """
+        Cria o reconhecedor a partir das variáveis de ambiente:
+        BATCH_CPU_WORKERS, BATCH_IO_WORKERS, BATCH_MAX_FILES e BATCH_MAX_TOTAL_MB.
+        """
+        cpu_workers = os.environ.get("BATCH_CPU_WORKERS")
+        return BatchRecognizer(
+            cpu_workers=int(cpu_workers) if cpu_workers else None,
+            io_workers=int(os.environ.get("BATCH_IO_WORKERS", "8")),
+            max_files=int(os.environ.get("BATCH_MAX_FILES", "100")),
+            max_total_bytes=int(os.environ.get("BATCH_MAX_TOTAL_MB", "200")) * 1024 * 1024
+        )
+
+    def _pools(self, reset=False):
+        # Pools criados sob demanda e reaproveitados entre lotes (um par por worker)
+        pid = os.getpid()
+        if self._pool_pid != pid or reset:
+            with self._lock:
+                if self._pool_pid != pid or reset:
+                    if reset and self._process_pool is not None:
+                        self._process_pool.shutdown(wait=False, cancel_futures=True)
+                    self._process_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+                    self._thread_pool = ThreadPoolExecutor(
+                        max_workers=self.io_workers,
+                        thread_name_prefix='batch-io'
+                    )
+                    self._pool_pid = pid
+        return self._process_pool, self._thread_pool
+
+    # -------------------------------
+    # ENTRADA: ARQUIVOS E ZIPS
+    # -------------------------------
+
+    @staticmethod
+    def _is_zip(stream):
+        position = stream.tell()
+        head = stream.read(len(ZIP_SIGNATURE))
+        stream.seek(position)
+        return head == ZIP_SIGNATURE
+
+    def collect_images(self, uploads):
+        """
+        Lê as imagens enviadas (arquivos soltos ou dentro de .zip) para a memória.
+        `uploads` é uma lista de (nome_do_arquivo, objeto_com_read() e seek()).
+        Imagens e .zip são reconhecidos pelos primeiros bytes, não pela extensão.
+        Retorna a lista de (nome, bytes, formato) das imagens, limitada a
+        max_files e a max_total_bytes.
+        """
+        images = []
+        total = 0
+
+        for filename, stream in uploads:
+            if len(images) >= self.max_files:
+                break
+
+            if self._is_zip(stream):
+                with zipfile.ZipFile(stream) as archive:
+                    for entry in archive.infolist():
+                        if len(images) >= self.max_files:
+                            break
+
+                        name = os.path.basename(entry.filename)
+
+                        # Ignora pastas, metadados do macOS e arquivos grandes demais
+                        if entry.is_dir() or name.startswith('.') or '__MACOSX' in entry.filename:
+                            continue
+                        if entry.file_size > self.max_entry_bytes or total + entry.file_size > self.max_total_bytes:
+                            continue
+
+                        with archive.open(entry) as source:
+                            data = source.read(self.max_entry_bytes + 1)
+                        image_format = sniff_image_format(data)
+                        if image_format and len(data) <= self.max_entry_bytes:
+                            images.append((name, data, image_format))
+                            total += len(data)
+
+            else:
+                data = stream.read()
+                image_format = sniff_image_format(data)
+                if image_format:
+                    images.append((filename, data, image_format))
+                    total += len(data)
+
+        return images
+
+    # -------------------------------
+    # EXECUÇÃO
+    # -------------------------------
+
+    @staticmethod
+    def _identifier_key(identifier):
+        return (
+            identifier.get('set', '').lower(),
+            identifier.get('number', '').lstrip('0'),
+            CardCache.normalize_name(identifier.get('name', ''))
+        )
+
+    @staticmethod
+    def _result(name, identifier, card_data):
+        if card_data == "Not found":
+            return {'file': name, 'status': 'failed', 'identifier': identifier,
+                    'error': 'Card not found in Scryfall database'}
+        return {'file': name, 'status': 'done', 'identifier': identifier,
+                'card_id': card_data['id'], 'card_name': card_data['name']}
+
+    def run(self, images):
+        """
+        Processa as imagens e gera um dict por carta assim que ela termina,
+        seguido de um resumo com a vazão (cartas por segundo).
+        """
+        process_pool, thread_pool = self._pools()
+
+        # Um processo do pool que morreu (ex: falta de memória) inutiliza o pool
+        if getattr(process_pool, '_broken', False):
+            process_pool, thread_pool = self._pools(reset=True)
+
+        started = time.perf_counter()
+
+        pending = {}            # future -> (etapa, dados)
+        waiting_lookup = set()  # identificadores com busca em andamento
+        resolved = {}           # identificador -> resultado da busca
+        waiting = {}            # identificador -> [(nome, identificador)] aguardando a busca
+        stats = {'cards': len(images), 'identified': 0, 'found': 0, 'lookups': 0}
+
+        # 1. Processamento das imagens em paralelo (pool de processos)
+        for name, data, image_format in images:
+            try:
+                future = process_pool.submit(process_image_for_recognition, data, [image_format])
+            except BrokenProcessPool:
+                process_pool, thread_pool = self._pools(reset=True)
+                future = process_pool.submit(process_image_for_recognition, data, [image_format])
+            pending[future] = ('process', name)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, data = pending.pop(future)
+
+                if stage == 'process':
+                    # 2. OCR (pool de threads)
+                    name = data
+                    if future.exception() is not None:
+                        yield {'file': name, 'status': 'failed', 'error': f'Error processing image: {future.exception()}'}
+                        continue
+                    # A carta já foi analisada (hashes e regiões de texto) no pool de processos
+                    image_bytes, analysis = future.result()
+                    ocr_future = thread_pool.submit(
+                        CardRecognition.identify_card_from_bytes, image_bytes, analysis, detect=False
+                    )
+                    pending[ocr_future] = ('ocr', name)
+
+                elif stage == 'ocr':
+                    name = data
+                    identifier = future.result() if future.exception() is None else None
+                    if not identifier:
+                        yield {'file': name, 'status': 'failed', 'error': 'Could not identify the card from the image'}
+                        continue
+
+                    stats['identified'] += 1
+
+                    # 3. Busca na Scryfall, uma só por identificador repetido
+                    key = BatchRecognizer._identifier_key(identifier)
+                    if key in resolved:
+                        result = BatchRecognizer._result(name, identifier, resolved[key])
+                        if result['status'] == 'done':
+                            stats['found'] += 1
+                        yield result
+                        continue
+
+                    waiting.setdefault(key, []).append((name, identifier))
+                    if key not in waiting_lookup:
+                        lookup_future = thread_pool.submit(Scryfall.search_card, identifier)
+                        waiting_lookup.add(key)
+                        pending[lookup_future] = ('lookup', key)
+                        stats['lookups'] += 1
+
+                elif stage == 'lookup':
+                    key = data
+                    card_data = future.result() if future.exception() is None else "Not found"
+                    resolved[key] = card_data
+                    waiting_lookup.discard(key)
+
+                    for name, identifier in waiting.pop(key, []):
+                        result = BatchRecognizer._result(name, identifier, card_data)
+                        if result['status'] == 'done':
+                            stats['found'] += 1
+                        yield result
+
+        elapsed = time.perf_counter() - started
+        stats['seconds'] = round(elapsed, 3)
+        stats['cards_per_sec'] = round(len(images) / elapsed, 2) if elapsed > 0 else 0.0
+        yield dict(stats, status='summary')
+
+    def recognize_uploads(self, uploads):
+        """
+        Atalho que lê as imagens enviadas para a memória (collect_images)
+        e executa o lote, sem gravar nada em disco.
+        """
+        yield from self.run(self.collect_images(uploads))
@@ -0,0 +1,138 @@
+"""
+Benchmark: tempo de CPU por jogo do fluxo antigo de download + blur
+(grava o JPEG baixado, relê, decodifica e recomprime a versão borrada)
+contra o fluxo com uma única decodificação (download_and_blur_image).
+
+O download é simulado (os bytes da imagem vêm da memória), então só o
+trabalho de CPU e disco do servidor entra na medição.
+
+Uso:
+    python benchmarks/bench_blur.py [imagem.jpg] [--repeat N]
+
+Sem imagem, gera uma carta sintética no tamanho "large" da Scryfall (672x936).
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image, ImageDraw, ImageFilter
+import image_utils
+
+# Escala do modo opcional de blur em resolução reduzida (BLUR_SCALE)
+REDUCED_SCALE = 0.125
+
+
+def generate_card(seed=7):
+    """Carta sintética: moldura, arte com formas e ruído, caixa de texto."""
+    random.seed(seed)
+    card = Image.new('RGB', (672, 936), (20, 20, 20))
+    draw = ImageDraw.Draw(card)
+    draw.rectangle([28, 28, 644, 908], fill=(205, 195, 175))
+
+    art = Image.merge('RGB', [Image.effect_noise((560, 410), 40) for _ in range(3)])
+    art_draw = ImageDraw.Draw(art)
+    for _ in range(30):
+        x, y = random.randrange(560), random.randrange(410)
+        art_draw.ellipse([x, y, x + random.randrange(30, 200), y + random.randrange(30, 160)],
+                         fill=tuple(random.randrange(256) for _ in range(3)))
+    card.paste(art.filter(ImageFilter.GaussianBlur(1)), (56, 105))
+    draw.rectangle([40, 530, 632, 850], fill=(232, 226, 212))
+
+    buffer = BytesIO()
+    card.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+def legacy_download_and_blur(image_url, filename, workdir):
+    """Fluxo anterior: duas decodificações, duas codificações e uma releitura do disco."""
+    original_path = os.path.join(workdir, 'original')
+    blurred_path = os.path.join(workdir, 'blurred')
+    os.makedirs(original_path, exist_ok=True)
+    os.makedirs(blurred_path, exist_ok=True)
+
+    response = image_utils.requests.get(image_url)
+    img = Image.open(BytesIO(response.content)).convert('RGB')
+    img.save(os.path.join(original_path, filename), 'JPEG')
+
+    img = Image.open(os.path.join(original_path, filename)).convert('RGB')
+    img.filter(ImageFilter.GaussianBlur(8)).save(os.path.join(blurred_path, filename), 'JPEG')
+    return True
+
+
+def fused_download_and_blur(image_url, filename, workdir, radii=(8,), scale=1.0):
+    main_radius, *extra_radii = radii
+    return image_utils.download_and_blur_image(
+        image_url, filename, main_radius, extra_radii,
+        original_path=os.path.join(workdir, 'original'),
+        blurred_path=os.path.join(workdir, 'blurred'),
+        blur_scale=scale
+    )
+
+
+def measure(function, repeat, *args, **kwargs):
+    """Melhor tempo de CPU e de relógio (ms) entre `repeat` execuções."""
+    cpu_times, wall_times = [], []
+    for _ in range(repeat):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        assert function(*args, **kwargs)
+        cpu_times.append(time.process_time() - cpu_start)
+        wall_times.append(time.perf_counter() - wall_start)
+    return min(cpu_times) * 1000, min(wall_times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image', nargs='?', help='imagem de carta (JPEG) usada como download')
+    parser.add_argument('--repeat', type=int, default=20, help='execuções por variante (usa a melhor)')
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, 'rb') as image_file:
+            content = image_file.read()
+    else:
+        content = generate_card()
+
+    workdir = tempfile.mkdtemp(prefix='bench_blur_')
+    variants = [
+        ('legacy (2 decodes, 2 encodes)', legacy_download_and_blur, {}),
+        ('fused, full-res blur', fused_download_and_blur, {'scale': 1.0}),
+        ('fused, reduced-res blur', fused_download_and_blur, {'scale': REDUCED_SCALE}),
+        ('fused, 3 levels 16/8/4 reduced', fused_download_and_blur, {'radii': (16, 8, 4), 'scale': REDUCED_SCALE}),
+    ]
+
+    # Silencia os prints das funções durante a medição
+    stdout = sys.stdout
+    results = []
+    with mock.patch.object(image_utils.requests, 'get', return_value=FakeResponse(content)):
+        for label, function, options in variants:
+            sys.stdout = open(os.devnull, 'w')
+            try:
+                results.append((label, *measure(function, args.repeat, 'https://example/card.jpg', 'card.jpg',
+                                                workdir, **options)))
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+
+    baseline = results[0][1]
+    print(f"{'variant':32} {'cpu ms/game':>12} {'wall ms':>8} {'speedup':>8}")
+    for label, cpu_ms, wall_ms in results:
+        print(f"{label:32} {cpu_ms:12.1f} {wall_ms:8.1f} {baseline / cpu_ms:7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
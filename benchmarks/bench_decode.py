@@ -0,0 +1,120 @@
+"""
+Benchmark: decodificação completa + LANCZOS (antigo) contra decodificação
+reduzida (draft/miniatura) + reducing_gap (novo), medindo tempo e pico de RSS.
+
+Cada medição roda em um subprocesso separado, já que o pico de RSS
+(ru_maxrss) só cresce durante a vida do processo.
+
+Uso:
+    python benchmarks/bench_decode.py [pasta_com_imagens]
+"""
+import os
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image, ImageDraw
+
+TARGET = (1920, 1080)
+
+
+def generate_corpus(directory, seed=7):
+    """Gera fotos sintéticas de 12 MP e 48 MP em JPEG e HEIC."""
+    import image_utils  # registra o suporte a HEIC no Pillow
+
+    random.seed(seed)
+    samples = [((4032, 3024), 'jpg'), ((8064, 6048), 'jpg'), ((4032, 3024), 'heic')]
+    paths = []
+
+    for index, (size, extension) in enumerate(samples):
+        img = Image.merge('RGB', [Image.effect_noise(size, 25) for _ in range(3)])
+        draw = ImageDraw.Draw(img)
+        for _ in range(40):
+            x, y = random.randrange(size[0]), random.randrange(size[1])
+            draw.ellipse([x, y, x + size[0] // 5, y + size[1] // 5],
+                         fill=tuple(random.randrange(256) for _ in range(3)))
+
+        path = os.path.join(directory, f"photo_{index}_{size[0]}x{size[1]}.{extension}")
+        img.save(path, quality=90)
+        paths.append(path)
+
+    return paths
+
+
+def measure(variant, path):
+    """Executado no subprocesso: decodifica e redimensiona uma vez."""
+    import image_utils
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+
+    if variant == 'legacy':
+        img = Image.open(path)
+        width, height = img.size
+        ratio = min(TARGET[0] / width, TARGET[1] / height)
+        img = img.resize((int(width * ratio), int(height * ratio)), Image.LANCZOS)
+        img = img.convert('RGB')
+    else:
+        img = image_utils.open_for_resize(path, TARGET)
+        img = image_utils.resize_image(img, TARGET)
+        img = image_utils.convert_to_rgb(img)
+
+    elapsed = time.perf_counter() - started
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'ms': elapsed * 1000, 'peak_mb': peak_rss / 1024, 'delta_mb': (peak_rss - baseline_rss) / 1024,
+            'size': list(img.size)}
+
+
+def run_in_subprocess(variant, path):
+    output = subprocess.run(
+        [sys.executable, __file__, '--measure', variant, path],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus', nargs='?', help='pasta com imagens de exemplo')
+    parser.add_argument('--measure', nargs=2, metavar=('VARIANT', 'PATH'), help=argparse.SUPPRESS)
+    parser.add_argument('--generate', metavar='DIR', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_corpus(args.generate)
+        return
+
+    if args.measure:
+        sys.stdout = open(os.devnull, 'w')
+        result = measure(*args.measure)
+        sys.stdout = sys.__stdout__
+        print(json.dumps(result))
+        return
+
+    if args.corpus:
+        corpus = [os.path.join(args.corpus, name) for name in sorted(os.listdir(args.corpus))]
+    else:
+        # Gera o corpus em outro processo: no Linux o pico de RSS do pai
+        # é herdado pelos subprocessos e contaminaria as medições
+        directory = tempfile.mkdtemp(prefix='bench_decode_')
+        subprocess.run([sys.executable, __file__, '--generate', directory], check=True)
+        corpus = [os.path.join(directory, name) for name in sorted(os.listdir(directory))]
+
+    print(f"{'image':32} {'legacy ms':>10} {'peak MB':>8} {'new ms':>8} {'peak MB':>8} {'time':>6} {'mem':>6}")
+    for path in corpus:
+        legacy = run_in_subprocess('legacy', path)
+        new = run_in_subprocess('new', path)
+        print(f"{os.path.basename(path)[:32]:32} {legacy['ms']:10.1f} {legacy['delta_mb']:8.1f} "
+              f"{new['ms']:8.1f} {new['delta_mb']:8.1f} {legacy['ms'] / new['ms']:5.1f}x "
+              f"{legacy['delta_mb'] / max(new['delta_mb'], 0.1):5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark: process_image antigo (compressão em disco, qualidade de 5 em 5)
+contra process_image_to_bytes (compressão em memória com busca binária).
+
+Uso:
+    python benchmarks/bench_process_image.py [pasta_com_imagens] [--repeat N]
+
+Sem pasta, gera um corpus sintético de fotos (ruído + gradientes) em vários tamanhos.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image, ImageDraw
+from image_utils import resize_image, convert_to_rgb, compress_to_jpeg, process_image_to_bytes
+
+MAX_BYTES = 1024 * 1024
+
+
+# -------------------------------------------------------------------
+# IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA)
+# -------------------------------------------------------------------
+def legacy_process_image(input_path, output_path, max_resolution=(1920, 1080), max_bytes=MAX_BYTES):
+    """Cópia do algoritmo antigo: até 19 gravações em disco + getsize."""
+    temp_path = output_path + ".temp"
+    img = Image.open(input_path)
+    img = resize_image(img, max_resolution)
+    img = convert_to_rgb(img)
+
+    quality = 100
+    while quality >= 10:
+        img.save(temp_path, format='JPEG', quality=quality)
+        if os.path.getsize(temp_path) <= max_bytes:
+            break
+        quality -= 5
+    os.rename(temp_path, output_path)
+
+    # O fluxo antigo relia o arquivo para o OCR
+    with open(output_path, 'rb') as processed:
+        return processed.read()
+
+
+def legacy_compress(img, output_path, max_bytes=MAX_BYTES):
+    """Só a etapa de compressão antiga (disco), para comparar com compress_to_jpeg."""
+    temp_path = output_path + ".temp"
+    quality = 100
+    while quality >= 10:
+        img.save(temp_path, format='JPEG', quality=quality)
+        if os.path.getsize(temp_path) <= max_bytes:
+            break
+        quality -= 5
+    os.rename(temp_path, output_path)
+    with open(output_path, 'rb') as processed:
+        return processed.read()
+
+
+# -------------------------------------------------------------------
+# CORPUS SINTÉTICO
+# -------------------------------------------------------------------
+def generate_corpus(directory, seed=42):
+    """
+    Gera fotos sintéticas com níveis diferentes de detalhe (ruído colorido),
+    para que a qualidade final varie de 100 até o mínimo.
+    """
+    random.seed(seed)
+    samples = [
+        ((1280, 960), 8),      # pouco detalhe: cabe em qualidade 100
+        ((3024, 4032), 20),    # foto de celular 12 MP
+        ((4032, 3024), 40),
+        ((3024, 4032), 70),    # muito detalhe: qualidade baixa
+        ((6000, 8000), 30),    # 48 MP
+    ]
+    paths = []
+
+    for index, (size, sigma) in enumerate(samples):
+        # Ruído independente em cada canal + formas para simular uma foto
+        channels = [Image.effect_noise(size, sigma) for _ in range(3)]
+        img = Image.merge('RGB', channels)
+        draw = ImageDraw.Draw(img)
+        for _ in range(60):
+            x, y = random.randrange(size[0]), random.randrange(size[1])
+            color = tuple(random.randrange(256) for _ in range(3))
+            draw.rectangle([x, y, x + size[0] // 6, y + size[1] // 10], outline=color, width=5)
+
+        path = os.path.join(directory, f"sample_{index}_{size[0]}x{size[1]}_s{sigma}.jpg")
+        img.save(path, 'JPEG', quality=95)
+        paths.append(path)
+
+    return paths
+
+
+def count_encodes(function, *args):
+    """Executa a função contando quantas vezes Image.save foi chamado."""
+    original_save = Image.Image.save
+    counter = {'saves': 0}
+
+    def counting_save(self, *save_args, **save_kwargs):
+        counter['saves'] += 1
+        return original_save(self, *save_args, **save_kwargs)
+
+    Image.Image.save = counting_save
+    try:
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+    finally:
+        Image.Image.save = original_save
+    return result, elapsed, counter['saves']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus', nargs='?', help='pasta com imagens de exemplo')
+    parser.add_argument('--repeat', type=int, default=3, help='execuções por imagem (usa a melhor)')
+    parser.add_argument('--max-bytes', type=int, default=MAX_BYTES, help='limite de tamanho do JPEG final')
+    args = parser.parse_args()
+    repeat = args.repeat
+
+    workdir = tempfile.mkdtemp(prefix='bench_process_image_')
+    if args.corpus:
+        corpus = [os.path.join(args.corpus, name) for name in sorted(os.listdir(args.corpus))]
+    else:
+        corpus = generate_corpus(workdir)
+
+    # Silencia os prints das funções durante a medição
+    stdout = sys.stdout
+    totals = {'legacy': 0.0, 'memory': 0.0}
+    print(f"{'image':40} {'legacy ms':>10} {'enc':>4} {'memory ms':>10} {'enc':>4} {'speedup':>8}")
+
+    for path in corpus:
+        legacy_times, memory_times = [], []
+        for _ in range(repeat):
+            sys.stdout = open(os.devnull, 'w')
+            try:
+                output_path = os.path.join(workdir, 'legacy_out.jpeg')
+                legacy_bytes, legacy_time, legacy_encodes = count_encodes(legacy_process_image, path, output_path, (1920, 1080), args.max_bytes)
+                memory_bytes, memory_time, memory_encodes = count_encodes(process_image_to_bytes, path, (1920, 1080), args.max_bytes)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            legacy_times.append(legacy_time)
+            memory_times.append(memory_time)
+
+        legacy_ms = min(legacy_times) * 1000
+        memory_ms = min(memory_times) * 1000
+        totals['legacy'] += legacy_ms
+        totals['memory'] += memory_ms
+        print(f"{os.path.basename(path)[:40]:40} {legacy_ms:10.1f} {legacy_encodes:4d} "
+              f"{memory_ms:10.1f} {memory_encodes:4d} {legacy_ms / memory_ms:7.2f}x")
+
+    print(f"{'TOTAL':40} {totals['legacy']:10.1f} {'':4} {totals['memory']:10.1f} {'':4} "
+          f"{totals['legacy'] / totals['memory']:7.2f}x")
+
+    # Só a etapa de compressão (imagem já redimensionada), sem o custo de decodificar
+    print(f"\nCompression stage only (max_bytes={args.max_bytes}):")
+    compress_totals = {'legacy': 0.0, 'memory': 0.0}
+    for path in corpus:
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            img = convert_to_rgb(resize_image(Image.open(path), (1920, 1080)))
+            img.load()
+            output_path = os.path.join(workdir, 'legacy_compress.jpeg')
+            legacy_time = min(count_encodes(legacy_compress, img, output_path, args.max_bytes)[1] for _ in range(repeat))
+            memory_time = min(count_encodes(compress_to_jpeg, img, args.max_bytes)[1] for _ in range(repeat))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        compress_totals['legacy'] += legacy_time * 1000
+        compress_totals['memory'] += memory_time * 1000
+        print(f"{os.path.basename(path)[:40]:40} {legacy_time * 1000:10.1f} {'':4} "
+              f"{memory_time * 1000:10.1f} {'':4} {legacy_time / memory_time:7.2f}x")
+    print(f"{'TOTAL':40} {compress_totals['legacy']:10.1f} {'':4} {compress_totals['memory']:10.1f} {'':4} "
+          f"{compress_totals['legacy'] / compress_totals['memory']:7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Corpus fixo de fotos de cartas para os benchmarks: uma carta sintética
+(ver bench_blur.generate_card) fotografada sobre uma mesa, levemente
+girada, em formatos e tamanhos que o app recebe de verdade.
+
+As imagens são geradas de forma determinística (mesma semente, mesmos
+bytes para a mesma versão do Pillow) e guardadas em disco; um manifesto
+com o SHA-256 de cada arquivo entra nos resultados, para que duas
+execuções só sejam comparadas se usaram o mesmo corpus.
+
+Uso:
+    python benchmarks/corpus.py [pasta]
+"""
+import os
+import sys
+import json
+import random
+import hashlib
+import tempfile
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from PIL import Image, ImageDraw, ImageFilter
+import image_utils  # registra o suporte a HEIC no Pillow
+from bench_blur import generate_card
+
+# Muda quando as amostras mudam (invalida o corpus já gerado)
+CORPUS_VERSION = 1
+
+DEFAULT_DIR = os.path.join(tempfile.gettempdir(), 'cardtrader_hub_bench_corpus')
+
+# (nome, tamanho da foto, formato, opções do save)
+SAMPLES = [
+    ('phone_12mp.jpg', (4032, 3024), 'JPEG', {'quality': 88}),
+    ('phone_12mp.heic', (4032, 3024), 'HEIF', {'quality': 80}),
+    ('oversized_48mp.jpg', (8064, 6048), 'JPEG', {'quality': 80}),
+    ('scan_alpha.png', (1200, 1680), 'PNG', {}),
+    ('small_800.jpg', (800, 600), 'JPEG', {'quality': 90}),
+]
+
+
+def card_photo(size, seed):
+    """Foto sintética: mesa com textura, carta girada e com sombra ocupando ~60% da altura."""
+    rng = random.Random(seed)
+    width, height = size
+
+    # Textura de baixa frequência (gerada pequena e ampliada: rápido e parecido com uma foto)
+    table = Image.merge('RGB', [Image.effect_noise((width // 16, height // 16), 18) for _ in range(3)])
+    table = table.filter(ImageFilter.GaussianBlur(1)).resize(size, Image.BILINEAR)
+    tint = Image.new('RGB', size, (110, 82, 60))
+    photo = Image.blend(table, tint, 0.6)
+
+    card = Image.open(BytesIO(generate_card(seed))).convert('RGBA')
+    scale = height * 0.6 / card.height
+    card = card.resize((int(card.width * scale), int(card.height * scale)), Image.LANCZOS)
+    card = card.rotate(rng.uniform(-8, 8), resample=Image.BICUBIC, expand=True)
+
+    x = (width - card.width) // 2 + rng.randint(-width // 20, width // 20)
+    y = (height - card.height) // 2 + rng.randint(-height // 20, height // 20)
+
+    # Sombra borrada numa cópia reduzida da máscara da carta
+    offset = max(4, width // 300)
+    shadow = card.getchannel('A').reduce(8).filter(ImageFilter.GaussianBlur(offset / 8))
+    shadow = shadow.resize(card.size, Image.BILINEAR).point(lambda value: value * 120 // 255)
+    photo.paste((0, 0, 0), (x + offset, y + offset), shadow)
+    photo.paste(card, (x, y), card)
+    return photo
+
+
+def generate(directory=DEFAULT_DIR):
+    """
+    Gera o corpus em `directory` (se ainda não existir nessa versão).
+    Retorna o manifesto: [{'name', 'path', 'bytes', 'size', 'sha256'}].
+    """
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get('version') == CORPUS_VERSION and all(os.path.exists(item['path']) for item in manifest['files']):
+            return manifest['files']
+
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for index, (name, size, image_format, options) in enumerate(SAMPLES):
+        photo = card_photo(size, seed=index + 1)
+        if image_format == 'PNG':
+            # Scan recortado com fundo transparente (exercita a conversão para RGB)
+            mask = Image.new('L', size, 0)
+            ImageDraw.Draw(mask).rounded_rectangle([size[0] // 20, size[1] // 20, size[0] * 19 // 20, size[1] * 19 // 20],
+                                                   radius=size[0] // 25, fill=255)
+            photo = photo.convert('RGBA')
+            photo.putalpha(mask)
+
+        path = os.path.join(directory, name)
+        photo.save(path, image_format, **options)
+        with open(path, 'rb') as image_file:
+            data = image_file.read()
+        files.append({'name': name, 'path': path, 'bytes': len(data), 'size': list(size),
+                      'sha256': hashlib.sha256(data).hexdigest()})
+
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump({'version': CORPUS_VERSION, 'files': files}, manifest_file, indent=2)
+    return files
+
+
+if __name__ == '__main__':
+    for item in generate(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DIR):
+        print(f"{item['name']:22} {item['size'][0]}x{item['size'][1]:<6} {item['bytes'] / 1024:9.0f} KB  {item['path']}")
@@ -0,0 +1,265 @@
+"""
+Teste de carga: app WSGI (main:app) contra app ASGI (asgi:app) em rotas
+que esperam a Scryfall. Uma Scryfall falsa local responde cada consulta
+depois de `--latency` ms, e cada requisição pede uma carta diferente
+(/card-detail/<id> sem acerto de cache), então o que se mede é quantas
+esperas de rede simultâneas cada servidor consegue sustentar.
+
+Cada servidor é um comando com {port} no lugar da porta, iniciado com
+SCRYFALL_BASE_URL apontando para a Scryfall falsa. Só usa a biblioteca
+padrão (o cliente de carga é asyncio puro).
+
+Uso:
+    python benchmarks/load_test.py [--server NOME=COMANDO ...] [--requests N]
+                                   [--concurrency C] [--latency MS]
+
+Padrão: gunicorn (4 workers, 8 threads cada) contra hypercorn (4 workers).
+Sem eles instalados, por exemplo:
+    python benchmarks/load_test.py --server "werkzeug=python -c \\"import main; main.app.run(port={port}, threaded=True)\\""
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shlex
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+DEFAULT_SERVERS = [
+    'wsgi=gunicorn -w 4 -k gthread --threads 8 -b 127.0.0.1:{port} main:app',
+    'asgi=hypercorn -w 4 -b 127.0.0.1:{port} asgi:app',
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# -------------------------------------------------------------------
+# SCRYFALL FALSA
+# -------------------------------------------------------------------
+def fake_card(card_id, base_url):
+    return {
+        'object': 'card',
+        'id': card_id,
+        'name': f'Card {card_id[:8]}',
+        'mana_cost': '{2}{U}',
+        'type_line': 'Creature — Wizard',
+        'oracle_text': 'When this creature enters, draw a card.',
+        'rarity': 'common',
+        'set': 'tst',
+        'set_name': 'Test Set',
+        'collector_number': '1',
+        'scryfall_uri': f'{base_url}/card/tst/1',
+        'image_uris': {'normal': f'{base_url}/images/{card_id}.jpg'},
+    }
+
+
+class FakeScryfall:
+    """Servidor HTTP/1.1 (keep-alive) que responde /cards/<id> depois de `latency` segundos."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.port = free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        self.requests = 0
+        self._writers = set()
+
+    async def handle(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    if name.strip().lower() == 'content-length':
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+
+                self.requests += 1
+                path = request_line.split()[1].decode().split('?')[0]
+                await asyncio.sleep(self.latency)
+
+                parts = path.strip('/').split('/')
+                if len(parts) == 2 and parts[0] == 'cards' and parts[1] != 'random':
+                    status, body = '200 OK', fake_card(parts[1], self.base_url)
+                else:
+                    # /cards/random e o resto: 404 (o estoque de jogos só tenta de novo mais tarde)
+                    status, body = '404 Not Found', {'object': 'error', 'status': 404}
+
+                payload = json.dumps(body).encode()
+                writer.write(f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                             f'Content-Length: {len(payload)}\r\n\r\n'.encode() + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', self.port, backlog=1024)
+
+    async def stop(self):
+        # Fecha as conexões keep-alive que os servidores testados deixaram abertas
+        self.server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await asyncio.sleep(0.1)
+
+
+# -------------------------------------------------------------------
+# CLIENTE DE CARGA
+# -------------------------------------------------------------------
+async def fetch(port, path):
+    """GET simples (uma conexão por requisição). Retorna o status HTTP."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def wait_until_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            await fetch(port, '/')
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError('server did not start in time')
+
+
+async def run_load(port, total, concurrency):
+    """Dispara `total` requisições com `concurrency` simultâneas. Retorna (latências, erros, duração)."""
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(f'/card-detail/{uuid.uuid4()}')
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(fetch(port, path), timeout=60)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+                status = None
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def bench_server(label, command, scryfall, args):
+    port = free_port()
+    env = dict(
+        os.environ,
+        SCRYFALL_BASE_URL=scryfall.base_url,
+        SCRYFALL_RATE_LIMIT='100000',
+        SCRYFALL_POOL_SIZE=str(args.concurrency),
+        SCRYFALL_FUZZY_CATALOG='0',
+        RATE_LIMIT_SHARED='0',
+        PYTHONUNBUFFERED='1',
+    )
+    process = subprocess.Popen(shlex.split(command.format(port=port)), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        await wait_until_ready(port, process)
+        # Aquecimento: conexões e imports preguiçosos fora da medição
+        await run_load(port, min(50, args.requests), min(10, args.concurrency))
+        upstream_before = scryfall.requests
+        latencies, errors, elapsed = await run_load(port, args.requests, args.concurrency)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    return {
+        'server': label,
+        'requests': args.requests,
+        'errors': errors,
+        'req_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95), 1),
+        'p99_ms': round(percentile(latencies, 0.99), 1),
+        'upstream_calls': scryfall.requests - upstream_before,
+    }
+
+
+async def run(args):
+    scryfall = FakeScryfall(args.latency / 1000)
+    await scryfall.start()
+
+    results = []
+    for spec in args.server or DEFAULT_SERVERS:
+        label, _, command = spec.partition('=')
+        print(f'{label}: {command}', file=sys.stderr)
+        try:
+            results.append(await bench_server(label, command, scryfall, args))
+        except (OSError, RuntimeError) as e:
+            print(f'{label}: skipped ({e})', file=sys.stderr)
+
+    await scryfall.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', action='append', help='NOME=COMANDO com {port} (repetível)')
+    parser.add_argument('--requests', type=int, default=2000, help='requisições por servidor')
+    parser.add_argument('--concurrency', type=int, default=100, help='requisições simultâneas')
+    parser.add_argument('--latency', type=float, default=150, help='latência da Scryfall falsa (ms)')
+    parser.add_argument('--json', action='store_true', help='imprime os resultados em JSON')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'server':12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for result in results:
+        print(f"{result['server']:12} {result['req_per_s']:8.1f} {result['p50_ms'] or 0:8.1f} "
+              f"{result['p95_ms']:8.1f} {result['p99_ms']:8.1f} {result['errors']:7}")
+
+
+if __name__ == '__main__':
+    main()
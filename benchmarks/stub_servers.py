@@ -0,0 +1,201 @@
+"""
+Servidores locais que imitam a Scryfall e o OCR.space nos benchmarks,
+com latência configurável. Respondem no formato das APIs reais o
+suficiente para o app seguir o caminho completo (busca, carta por
+set/número, carta aleatória, download da imagem, OCR).
+
+Uso dentro de um benchmark:
+    scryfall = StubScryfall(latency=0.08).start()
+    os.environ['SCRYFALL_BASE_URL'] = scryfall.base_url
+"""
+import json
+import time
+import random
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Nomes usados nas cartas falsas (sem palavras de 3 letras maiúsculas, que
+# o reconhecimento confundiria com um código de set)
+CARD_NAMES = [
+    'Lightning Bolt', 'Counterspell', 'Llanowar Elves', 'Serra Angel', 'Dark Ritual',
+    'Giant Growth', 'Shivan Dragon', 'Wrath of God', 'Swords to Plowshares', 'Birds of Paradise',
+]
+
+SET_CODE = 'TST'
+SET_SIZE = 350
+
+# Resultados por página da busca da Scryfall
+SEARCH_PAGE_SIZE = 175
+
+
+def fake_card(card_id, base_url, name=None, number=None):
+    """Carta no formato da Scryfall, com as imagens servidas pelo próprio stub."""
+    number = number or str(sum(map(ord, card_id)) % SET_SIZE + 1)
+    name = name or CARD_NAMES[int(number) % len(CARD_NAMES)]
+    return {
+        'object': 'card',
+        'id': card_id,
+        'name': name,
+        'mana_cost': '{2}{U}',
+        'type_line': 'Creature — Wizard',
+        'oracle_text': 'When this creature enters, draw a card.',
+        'rarity': 'common',
+        'set': SET_CODE.lower(),
+        'set_name': 'Test Set',
+        'collector_number': number,
+        'scryfall_uri': f'{base_url}/card/{SET_CODE.lower()}/{number}',
+        'image_uris': {
+            'small': f'{base_url}/images/{card_id}.jpg',
+            'normal': f'{base_url}/images/{card_id}.jpg',
+            'large': f'{base_url}/images/{card_id}.jpg',
+        },
+        'prices': {'usd': '1.50', 'usd_foil': None, 'eur': '1.20', 'tix': '0.03'},
+    }
+
+
+class _StubServer:
+    """Base: servidor HTTP/1.1 com threads, em segundo plano, que espera `latency` s por resposta."""
+
+    def __init__(self, latency=0.0, seed=7):
+        self.latency = latency
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Cabeçalhos e corpo saem em escritas separadas: sem isso o Nagle soma ~40 ms por resposta
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, content_type, payload = stub.respond(self.command, urlparse(self.path), body)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _handle
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._server.request_queue_size = 1024
+        threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @staticmethod
+    def _json(status, data):
+        return status, 'application/json', json.dumps(data).encode()
+
+
+class StubScryfall(_StubServer):
+    """
+    Scryfall falsa: /cards/<id>, /cards/<set>/<número>, /cards/named,
+    /cards/random, /cards/search (paginada), POST /cards/collection (por ID
+    ou set + número), /sets e as imagens.
+    Buscas que começam com "zzz" não encontram nada.
+    """
+
+    def __init__(self, latency=0.0, seed=7, search_total=412, image=None):
+        super().__init__(latency, seed)
+        self.search_total = search_total
+        self.image = image or _default_card_image()
+
+    def _card_id(self):
+        with self._lock:
+            return '%032x' % self._random.getrandbits(128)
+
+    def respond(self, method, url, body):
+        parts = url.path.strip('/').split('/')
+        query = parse_qs(url.query)
+
+        if parts[0] == 'images':
+            return 200, 'image/jpeg', self.image
+
+        if parts[0] == 'sets':
+            return self._json(200, {'object': 'list', 'has_more': False,
+                                    'data': [{'object': 'set', 'code': SET_CODE.lower(), 'card_count': SET_SIZE}]})
+
+        if parts[0] != 'cards' or len(parts) < 2:
+            return self._json(404, {'object': 'error', 'status': 404})
+
+        if method == 'POST' and parts[1] == 'collection':
+            identifiers = json.loads(body or b'{}').get('identifiers', [])
+            cards = []
+            for item in identifiers:
+                if 'id' in item:
+                    cards.append(fake_card(item['id'], self.base_url))
+                elif item.get('set', '').upper() == SET_CODE and int(item.get('collector_number') or 0) <= SET_SIZE:
+                    number = item['collector_number']
+                    cards.append(fake_card(f"{item['set']}-{number}".ljust(32, '0'), self.base_url, number=number))
+            return self._json(200, {'object': 'list', 'not_found': [], 'data': cards})
+
+        if parts[1] == 'random':
+            return self._json(200, fake_card(self._card_id(), self.base_url))
+
+        if parts[1] == 'named':
+            name = (query.get('exact') or query.get('fuzzy') or [''])[0]
+            return self._json(200, fake_card(self._card_id(), self.base_url, name=name.title()))
+
+        if parts[1] == 'search':
+            return self._search((query.get('q') or [''])[0], int((query.get('page') or ['1'])[0]))
+
+        if len(parts) == 3:
+            set_code, number = parts[1], parts[2]
+            return self._json(200, fake_card(f'{set_code}-{number}'.ljust(32, '0'), self.base_url, number=number))
+
+        return self._json(200, fake_card(parts[1], self.base_url))
+
+    def _search(self, query, page):
+        if query.lower().startswith('zzz'):
+            return self._json(404, {'object': 'error', 'status': 404})
+
+        start = (page - 1) * SEARCH_PAGE_SIZE
+        end = min(start + SEARCH_PAGE_SIZE, self.search_total)
+        cards = [fake_card(f'{query}-{index}'.ljust(32, '0'), self.base_url,
+                           name=f'{CARD_NAMES[index % len(CARD_NAMES)]} {query}', number=str(index + 1))
+                 for index in range(start, end)]
+        return self._json(200, {'object': 'list', 'total_cards': self.search_total,
+                                'has_more': end < self.search_total, 'data': cards})
+
+
+class StubOCRSpace(_StubServer):
+    """
+    OCR.space falso: cada chamada devolve o texto de uma carta diferente
+    (nome e "TST nnn/350"), então cada reconhecimento gera uma busca nova.
+    """
+
+    def respond(self, method, url, body):
+        with self._lock:
+            number = self._random.randrange(1, SET_SIZE + 1)
+        text = f"{CARD_NAMES[number % len(CARD_NAMES)]}\n{SET_CODE} {number:03d}/{SET_SIZE}"
+        return self._json(200, {'ParsedResults': [{'ParsedText': text}], 'IsErroredOnProcessing': False})
+
+
+def _default_card_image():
+    """JPEG de uma carta sintética no tamanho "large" da Scryfall (imagem dos jogos)."""
+    from bench_blur import generate_card
+    return generate_card()
@@ -0,0 +1,428 @@
+"""
+Suíte de benchmarks reproduzível: processamento de imagem, reconhecimento
+(upload único e em lote), criação de jogo, busca e consultas à Scryfall,
+com a Scryfall e o OCR.space substituídos por servidores locais com
+latência configurável (ver stub_servers.py) e um corpus fixo de fotos
+(JPEG de 12 e 48 MP, HEIC, PNG com transparência; ver corpus.py).
+
+Cada cenário roda em um subprocesso próprio (o pico de RSS, ru_maxrss,
+só cresce durante a vida do processo) e informa vazão, latência
+p50/p95/p99 e pico de memória. Os resultados são gravados em JSON,
+com o commit, o ambiente e o SHA-256 do corpus, e podem ser comparados
+com uma execução anterior.
+
+Uso:
+    python benchmarks/suite.py [--scenarios a,b] [--iterations N] [--concurrency C]
+                               [--scryfall-latency MS] [--ocr-latency MS]
+                               [--output resultados.json] [--compare anterior.json]
+
+Cenários: process_image, identifier_parse, scryfall_lookup, search,
+single_upload, batch_upload, game_creation.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import resource
+import argparse
+import tempfile
+import statistics
+import subprocess
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+# Textos de OCR reais (com ruído) para o cenário identifier_parse
+OCR_TEXTS = [
+    "Lightning Bolt\nInstant\nLightning Bolt deals 3 damage to any target.\n146/249 C\nM10 • EN",
+    "Counterspell\n{U}{U}\nInstant\nCounter target spell.\nC 0054\nMH2 EN",
+    "Llanowar Elves 1/1\nCreature — Elf Druid\n{T}: Add {G}.\n2019 Wizards\nDOM 168/269",
+    "Serra Angel\nFlying, vigilance\n4/4\nR 0033\nMEE",
+    "Wrath of God\nSorcery\nDestroy all creatures. They can't be regenerated.",
+]
+
+
+# -------------------------------------------------------------------
+# MEDIÇÃO
+# -------------------------------------------------------------------
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # No Linux, ru_maxrss do próprio processo herda o pico do processo pai
+    # (é mantido no exec); VmHWM é só deste processo
+    if who == resource.RUSAGE_SELF and os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def timed_calls(function, inputs, concurrency=1):
+    """
+    Executa function(entrada) para cada entrada (com `concurrency` threads).
+    Cada chamada retorna quantos itens processou (0 = erro).
+    Retorna (latências em s, itens, erros, duração total).
+    """
+    def call(value):
+        started = time.perf_counter()
+        try:
+            items = function(value)
+        except Exception as e:
+            print(f"error: {e!r}", file=sys.stderr)
+            items = 0
+        return time.perf_counter() - started, items
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(call, inputs))
+    else:
+        results = [call(value) for value in inputs]
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, items in results if items]
+    return latencies, sum(items for _, items in results), sum(1 for _, items in results if not items), elapsed
+
+
+# -------------------------------------------------------------------
+# CENÁRIOS (executados no subprocesso)
+# -------------------------------------------------------------------
+def read_corpus(corpus):
+    files = []
+    for item in corpus:
+        with open(item['path'], 'rb') as image_file:
+            files.append((item['name'], image_file.read()))
+    return files
+
+
+def scenario_process_image(args, corpus):
+    """image_utils.process_image_to_bytes em cada foto do corpus (com detalhamento por foto)."""
+    import image_utils
+
+    files = read_corpus(corpus)
+    by_input = {name: [] for name, _ in files}
+
+    def run(index):
+        name, data = files[index % len(files)]
+        started = time.perf_counter()
+        image_utils.process_image_to_bytes(data)
+        by_input[name].append(time.perf_counter() - started)
+        return 1
+
+    timed_calls(run, range(len(files) * args.warmup))
+    for timings in by_input.values():
+        timings.clear()
+    result = timed_calls(run, range(len(files) * args.iterations), args.concurrency)
+    breakdown = {name: {'p50_ms': round(statistics.median(timings) * 1000, 2)} for name, timings in by_input.items() if timings}
+    return result, breakdown
+
+
+def scenario_identifier_parse(args, corpus):
+    """CardRecognition._extract_identifier_from_text em textos de OCR típicos."""
+    from card_recognition import CardRecognition
+
+    def run(index):
+        CardRecognition._extract_identifier_from_text(OCR_TEXTS[index % len(OCR_TEXTS)])
+        return 1
+
+    timed_calls(run, range(100 * args.warmup))
+    return timed_calls(run, range(200 * args.iterations)), None
+
+
+def scenario_scryfall_lookup(args, corpus):
+    """Scryfall.search_card sem acerto de cache: por set + número e, alternando, por nome."""
+    from scryfall import Scryfall
+
+    def run(index):
+        if index % 2:
+            identifier = {'set': 'TST', 'number': str(index), 'name': ''}
+        else:
+            identifier = {'set': '', 'number': '', 'name': f'Bench Card {index}'}
+        return 0 if Scryfall.search_card(identifier) == "Not found" else 1
+
+    timed_calls(run, range(-args.warmup * 2, 0))
+    return timed_calls(run, range(args.iterations * 5), args.concurrency), None
+
+
+def scenario_search(args, corpus):
+    """GET /card-search: cada termo em 3 páginas (a 1ª baixa a página da API, as outras vêm do cache)."""
+    import main
+    from scryfall import Scryfall
+
+    def run(index):
+        client = main.app.test_client()
+        response = client.get(f'/card-search?q=bench{index // 3}&page={index % 3 + 1}')
+        return 1 if response.status_code == 200 else 0
+
+    timed_calls(run, range(-3 * args.warmup, 0))
+    result = timed_calls(run, range(args.iterations * 3), args.concurrency)
+    return result, {'search_cache': Scryfall.search_cache.stats()}
+
+
+def scenario_single_upload(args, corpus):
+    """POST /card-recognition com uma foto do corpus: processamento, detecção, OCR e Scryfall."""
+    import main
+
+    files = read_corpus(corpus)
+
+    def run(index):
+        name, data = files[index % len(files)]
+        client = main.app.test_client()
+        response = client.post('/card-recognition', data={'card_image': (BytesIO(data), name)},
+                               content_type='multipart/form-data')
+        # Sucesso renderiza a carta (200); falhas redirecionam de volta com uma mensagem
+        return 1 if response.status_code == 200 else 0
+
+    timed_calls(run, range(len(files) * args.warmup))
+    return timed_calls(run, range(len(files) * args.iterations), args.concurrency), None
+
+
+def scenario_batch_upload(args, corpus):
+    """POST /card-recognition/batch com o corpus inteiro, lendo o NDJSON até o resumo."""
+    import main
+
+    files = read_corpus(corpus)
+
+    def run(index):
+        client = main.app.test_client()
+        response = client.post(
+            '/card-recognition/batch',
+            data={'card_images': [(BytesIO(data), f'{index}_{name}') for name, data in files]},
+            content_type='multipart/form-data'
+        )
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+        return sum(1 for line in lines if line.get('card_id'))
+
+    timed_calls(run, range(args.warmup))
+    return timed_calls(run, range(args.iterations)), None
+
+
+def scenario_game_creation(args, corpus):
+    """GamePool.prepare_game: carta aleatória, download da imagem, níveis de blur e derivadas."""
+    from game_pool import GamePool
+    from game_images import GameImageStore
+    from image_derivatives import ImageDerivatives
+
+    workdir = tempfile.mkdtemp(prefix='bench_games_')
+    try:
+        derivatives = ImageDerivatives.from_env(workdir) if os.environ.get("IMAGE_DERIVATIVES", "1") != "0" else None
+        images = GameImageStore(root=os.path.join(workdir, 'game_images'), derivatives=derivatives)
+        pool = GamePool(low_watermark=0, high_watermark=0, images=images)
+
+        def run(index):
+            return 0 if pool.prepare_game() is None else 1
+
+        timed_calls(run, range(args.warmup))
+        return timed_calls(run, range(args.iterations), args.concurrency), None
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+SCENARIOS = {
+    'process_image': scenario_process_image,
+    'identifier_parse': scenario_identifier_parse,
+    'scryfall_lookup': scenario_scryfall_lookup,
+    'search': scenario_search,
+    'single_upload': scenario_single_upload,
+    'batch_upload': scenario_batch_upload,
+    'game_creation': scenario_game_creation,
+}
+
+
+def run_child(args):
+    """Executa um cenário neste processo e imprime o resultado em JSON."""
+    with open(args.corpus_manifest) as manifest_file:
+        corpus = json.load(manifest_file)['files']
+
+    baseline_rss = peak_rss_mb()
+    (latencies, items, errors, elapsed), details = SCENARIOS[args.child](args, corpus)
+
+    result = {
+        'calls': len(latencies) + errors,
+        'items': items,
+        'errors': errors,
+        'throughput_per_s': round(items / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_growth_mb': round(peak_rss_mb() - baseline_rss, 1),
+        'peak_children_rss_mb': round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+    }
+    if details:
+        result['details'] = details
+    print(json.dumps(result))
+
+
+# -------------------------------------------------------------------
+# EXECUÇÃO (PROCESSO PRINCIPAL)
+# -------------------------------------------------------------------
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def child_env(scryfall, ocr, args):
+    env = {key: value for key, value in os.environ.items()
+           if key not in ('CARD_CACHE_DB', 'SCRYFALL_INDEX_PATH', 'CARD_HASH_INDEX_PATH',
+                          'GAME_STORE_DB', 'GAME_STORE_REDIS_URL', 'PRICE_DB', 'RECOGNITION_JOBS_DB')}
+    env.update(
+        SCRYFALL_BASE_URL=scryfall.base_url,
+        OCR_BACKEND='ocrspace',
+        OCR_API_URL=f'{ocr.base_url}/parse/image',
+        OCR_API_KEY='benchmark',
+        # Limites reais ficam fora da medição (a latência dos stubs faz o papel da rede)
+        SCRYFALL_RATE_LIMIT='100000',
+        OCR_RATE_LIMIT='100000',
+        OCR_RATE_BURST='100000',
+        RATE_LIMIT_SHARED='0',
+        SCRYFALL_FUZZY_CATALOG='0',
+        GAME_POOL_LOW='0',
+        GAME_POOL_HIGH='0',
+        LOG_LEVEL='WARNING',
+        METRICS_ENABLED='0' if args.no_metrics else '1',
+    )
+    return env
+
+
+def run_scenario(name, args, manifest_path, env):
+    command = [sys.executable, os.path.abspath(__file__), '--child', name, '--corpus-manifest', manifest_path,
+               '--iterations', str(args.iterations), '--warmup', str(args.warmup),
+               '--concurrency', str(args.concurrency)]
+    process = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    lines = process.stdout.strip().splitlines()
+    if process.returncode != 0 or not lines:
+        print(f"{name}: failed (exit {process.returncode})\n{process.stderr[-2000:]}", file=sys.stderr)
+        return {'failed': True, 'exit_code': process.returncode}
+    return json.loads(lines[-1])
+
+
+def print_table(results, previous=None):
+    columns = ('throughput_per_s', 'p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb')
+    print(f"{'scenario':18} {'items/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8} {'errors':>6}")
+    for name, result in results.items():
+        if result.get('failed'):
+            print(f"{name:18} failed")
+            continue
+        values = ' '.join(f"{result[column] if result[column] is not None else '-':>{8 if column == 'peak_rss_mb' else 9}}"
+                          for column in columns)
+        print(f"{name:18} {values} {result['errors']:6}")
+
+        old = (previous or {}).get(name)
+        if old and not old.get('failed'):
+            changes = []
+            for column in columns:
+                if old.get(column) and result.get(column) is not None:
+                    changes.append(f"{(result[column] / old[column] - 1) * 100:+.0f}%")
+                else:
+                    changes.append('-')
+            print(f"{'  vs previous':18} " + ' '.join(f"{change:>{8 if column == 'peak_rss_mb' else 9}}"
+                                                    for change, column in zip(changes, columns)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='cenários separados por vírgula')
+    parser.add_argument('--iterations', type=int, default=10, help='repetições medidas (por foto do corpus, quando se aplica)')
+    parser.add_argument('--warmup', type=int, default=1, help='repetições de aquecimento (não medidas)')
+    parser.add_argument('--concurrency', type=int, default=1, help='chamadas simultâneas nos cenários que aceitam')
+    parser.add_argument('--scryfall-latency', type=float, default=50, help='latência da Scryfall falsa (ms)')
+    parser.add_argument('--ocr-latency', type=float, default=400, help='latência do OCR.space falso (ms)')
+    parser.add_argument('--corpus-dir', default=None, help='pasta do corpus (padrão: pasta temporária)')
+    parser.add_argument('--no-metrics', action='store_true', help='roda com METRICS_ENABLED=0')
+    parser.add_argument('--output', help='arquivo JSON dos resultados (padrão: benchmarks/results/<data>.json)')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--corpus-manifest', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    import corpus
+    from stub_servers import StubScryfall, StubOCRSpace
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    corpus_dir = args.corpus_dir or corpus.DEFAULT_DIR
+    print(f"Corpus: {corpus_dir}", file=sys.stderr)
+    files = corpus.generate(corpus_dir)
+    manifest_path = os.path.join(corpus_dir, 'manifest.json')
+
+    scryfall = StubScryfall(latency=args.scryfall_latency / 1000).start()
+    ocr = StubOCRSpace(latency=args.ocr_latency / 1000).start()
+    env = child_env(scryfall, ocr, args)
+
+    results = {}
+    try:
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = run_scenario(name, args, manifest_path, env)
+    finally:
+        scryfall.stop()
+        ocr.stop()
+
+    import PIL
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pillow': PIL.__version__,
+        },
+        'parameters': {
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'concurrency': args.concurrency,
+            'scryfall_latency_ms': args.scryfall_latency,
+            'ocr_latency_ms': args.ocr_latency,
+            'metrics_enabled': not args.no_metrics,
+        },
+        'corpus': [{'name': item['name'], 'bytes': item['bytes'], 'sha256': item['sha256']} for item in files],
+        'scenarios': results,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous_report = json.load(previous_file)
+        if previous_report.get('corpus') != report['corpus']:
+            print("Warning: the previous run used a different corpus", file=sys.stderr)
+        if previous_report.get('parameters') != report['parameters']:
+            print("Warning: the previous run used different parameters", file=sys.stderr)
+        previous = previous_report.get('scenarios')
+
+    print_table(results, previous)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results saved to {output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Chaves por carta na camada em memória (ID, set + número e nome)
+KEYS_PER_CARD = 3
+
+
+class CardCache:
+    """
+    Cache de cartas da Scryfall com duas camadas:
+    1. LRU em memória (por processo), com TTL e limite de entradas
+    2. SQLite opcional em disco, compartilhado entre workers e persistente entre reinícios
+
+    As cartas são indexadas pelo ID da Scryfall; chaves alternativas
+    (set + número, nome normalizado) apontam para esse ID. `max_entries`
+    conta cartas: a memória guarda até max_entries * KEYS_PER_CARD chaves.
+    """
+
+    def __init__(self, max_entries=1024, ttl=24 * 60 * 60, db_path=None, db_max_entries=50000):
+        self.max_entries = max_entries
+        self.max_keys = max_entries * KEYS_PER_CARD
+        self.ttl = ttl
+        self.db_path = db_path
+        self.db_max_entries = db_max_entries
+
+        # chave -> (expira_em, carta)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Conexões SQLite são por thread (e recriadas após fork)
+        self._local = threading.local()
+        self._writes = 0
+
+        # Contadores de acerto/erro
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            self._init_db()
+
+    @staticmethod
+    def from_env():
+        """
+        Cria o cache a partir das variáveis de ambiente:
+        CARD_CACHE_SIZE (cartas em memória), CARD_CACHE_TTL, CARD_CACHE_DB
+        e CARD_CACHE_DB_SIZE (cartas no SQLite).
+        """
+        return CardCache(
+            max_entries=int(os.environ.get("CARD_CACHE_SIZE", "1024")),
+            ttl=int(os.environ.get("CARD_CACHE_TTL", str(24 * 60 * 60))),
+            db_path=os.environ.get("CARD_CACHE_DB") or None,
+            db_max_entries=int(os.environ.get("CARD_CACHE_DB_SIZE", "50000"))
+        )
+
+    # -------------------------------
+    # CHAVES
+    # -------------------------------
+
+    @staticmethod
+    def normalize_name(name):
+        """Nome em minúsculas, sem acentos e com espaços normalizados."""
+        name = unicodedata.normalize('NFKD', name or '')
+        name = ''.join(c for c in name if not unicodedata.combining(c))
+        return ' '.join(name.casefold().split())
+
+    @staticmethod
+    def id_key(card_id):
+        return f"id:{str(card_id).lower()}"
+
+    @staticmethod
+    def set_number_key(set_code, number):
+        # '051' e '51' representam o mesmo número de coleção
+        number = str(number).lower().lstrip('0') or '0'
+        return f"set:{str(set_code).lower()}/{number}"
+
+    @staticmethod
+    def name_key(name):
+        return f"name:{CardCache.normalize_name(name)}"
+
+    # -------------------------------
+    # LEITURA
+    # -------------------------------
+
+    def get(self, key):
+        """Retorna a carta associada à chave ou None."""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, card = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return card
+                del self._memory[key]
+
+        entry = self._db_get(key, now) if self.db_path else None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+
+        # Promove para a memória (com a validade do disco: é a mesma versão da carta)
+        expires, card = entry
+        self._memory_set(key, card, now, expires)
+        return card
+
+    def get_card(self, card_id):
+        return self.get(CardCache.id_key(card_id))
+
+    def get_by_set_number(self, set_code, number):
+        return self.get(CardCache.set_number_key(set_code, number))
+
+    def get_by_name(self, name):
+        return self.get(CardCache.name_key(name))
+
+    def fetched_at(self, card_id):
+        """
+        Quando a carta guardada (na memória) foi buscada na API, ou None.
+        Serve de versão da carta (ex: ETag) sem serializá-la.
+        """
+        with self._lock:
+            entry = self._memory.get(CardCache.id_key(card_id))
+        return entry[0] - self.ttl if entry is not None else None
+
+    # -------------------------------
+    # ESCRITA
+    # -------------------------------
+
+    def put_card(self, card, *extra_keys):
+        """
+        Guarda uma carta sob o seu ID, set + número, nome
+        e quaisquer chaves extras (ex: o nome pesquisado via fuzzy).
+        """
+        if not isinstance(card, dict) or 'id' not in card:
+            return
+
+        keys = [CardCache.id_key(card['id'])]
+        if card.get('set') and card.get('collector_number'):
+            keys.append(CardCache.set_number_key(card['set'], card['collector_number']))
+        if card.get('name'):
+            keys.append(CardCache.name_key(card['name']))
+        keys.extend(k for k in extra_keys if k not in keys)
+
+        now = time.time()
+        for key in keys:
+            self._memory_set(key, card, now)
+
+        if self.db_path:
+            self._db_put(card, keys, now)
+
+    def _memory_set(self, key, card, now, expires=None):
+        with self._lock:
+            self._memory[key] = (expires or now + self.ttl, card)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_keys:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        """Esvazia as duas camadas do cache."""
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            conn = self._db()
+            with conn:
+                conn.execute("DELETE FROM card_keys")
+                conn.execute("DELETE FROM cards")
+
+    def stats(self):
+        """Contadores de uso do cache."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._memory),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
+
+    # -------------------------------
+    # CAMADA EM DISCO (SQLITE)
+    # -------------------------------
+
+    def _db(self):
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != pid:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cards (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS card_keys (
+                    key TEXT PRIMARY KEY,
+                    card_id TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cards_accessed ON cards (accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_card_keys_card ON card_keys (card_id)")
+
+    def _db_get(self, key, now):
+        try:
+            conn = self._db()
+            row = conn.execute("""
+                SELECT c.id, c.data, c.expires FROM card_keys k
+                JOIN cards c ON c.id = k.card_id
+                WHERE k.key = ? AND c.expires > ?
+            """, (key, now)).fetchone()
+            if row is None:
+                return None
+
+            with conn:
+                conn.execute("UPDATE cards SET accessed = ? WHERE id = ?", (now, row[0]))
+            return row[2], json.loads(row[1])
+        except sqlite3.Error as e:
+            logger.warning("Card cache read error: %s", e)
+            return None
+
+    def _db_put(self, card, keys, now):
+        try:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cards (id, data, expires, accessed) VALUES (?, ?, ?, ?)",
+                    (str(card['id']).lower(), json.dumps(card, separators=(',', ':')), now + self.ttl, now)
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO card_keys (key, card_id) VALUES (?, ?)",
+                    [(key, str(card['id']).lower()) for key in keys]
+                )
+
+            # Limpeza periódica (a cada 100 escritas deste processo)
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % 100 == 0
+            if prune:
+                self._db_prune(now)
+        except sqlite3.Error as e:
+            logger.warning("Card cache write error: %s", e)
+
+    def _db_prune(self, now):
+        """Remove cartas expiradas e as menos acessadas acima do limite."""
+        conn = self._db()
+        with conn:
+            conn.execute("DELETE FROM cards WHERE expires <= ?", (now,))
+            conn.execute("""
+                DELETE FROM cards WHERE id IN (
+                    SELECT id FROM cards ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.db_max_entries,))
+            conn.execute("DELETE FROM card_keys WHERE card_id NOT IN (SELECT id FROM cards)")
+
+
+class SearchCache:
+    """
+    Cache em memória (por processo) das páginas de resultado de /cards/search,
+    com TTL e limite de entradas (LRU). A chave é a consulta normalizada e o
+    número da página da Scryfall, então "Sol  Ring" e "sol ring" compartilham
+    as mesmas páginas. Guarda só as cartas resumidas (ver Scryfall.slim_card).
+    """
+
+    def __init__(self, max_entries=256, ttl=60 * 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # chave -> (expira_em, página)
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def from_env():
+        """
+        Cria o cache a partir das variáveis de ambiente:
+        SEARCH_CACHE_SIZE e SEARCH_CACHE_TTL.
+        """
+        return SearchCache(
+            max_entries=int(os.environ.get("SEARCH_CACHE_SIZE", "256")),
+            ttl=int(os.environ.get("SEARCH_CACHE_TTL", str(60 * 60)))
+        )
+
+    @staticmethod
+    def normalize_query(query):
+        """Consulta em minúsculas e com espaços normalizados (a Scryfall ignora a caixa)."""
+        return ' '.join((query or '').casefold().split())
+
+    @staticmethod
+    def page_key(query, page):
+        return f"{SearchCache.normalize_query(query)}|{page}"
+
+    def get(self, query, page):
+        """Retorna a página guardada ou None."""
+        key = SearchCache.page_key(query, page)
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > time.time():
+                    self._pages.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._pages[key]
+            self.misses += 1
+            return None
+
+    def put(self, query, page, result):
+        key = SearchCache.page_key(query, page)
+        with self._lock:
+            self._pages[key] = (time.time() + self.ttl, result)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        """Contadores de uso do cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._pages),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,277 @@
+import os
+import logging
+from io import BytesIO
+from PIL import Image, ImageFilter, ImageOps, ImageStat
+from image_utils import compress_to_jpeg, convert_to_rgb, process_image_to_bytes
+from card_hashing import ART_REGION, image_hashes
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Proporção de uma carta de Magic (63 x 88 mm)
+CARD_ASPECT = 63 / 88
+
+# Tamanho da carta após a correção de perspectiva (mesmo da imagem "large" da Scryfall)
+CARD_SIZE = (672, 936)
+
+# Maior lado da cópia reduzida usada para encontrar a carta na foto
+DETECTION_SIZE = 256
+
+# Regiões com texto, em frações da carta já corrigida (esquerda, topo, direita, base)
+TITLE_REGION = (0.03, 0.025, 0.97, 0.12)      # barra do nome
+COLLECTOR_REGION = (0.02, 0.905, 0.62, 0.985)  # código do set e número de colecionador
+
+# Ampliação das regiões antes do OCR (o texto do rodapé é pequeno)
+REGION_SCALE = 2
+
+# Limite de tamanho do JPEG enviado ao OCR com as regiões recortadas
+REGIONS_MAX_BYTES = 256 * 1024
+
+# Liga/desliga o OCR por regiões (OCR_REGIONS=0 volta a enviar a imagem inteira)
+OCR_REGIONS_ENABLED = os.environ.get("OCR_REGIONS", "1") != "0"
+
+
+# -------------------------------------------------------------------
+# 1. DETECÇÃO DA CARTA (BORDAS + MAIOR COMPONENTE CONECTADO)
+# -------------------------------------------------------------------
+def _edge_mask(img: Image.Image) -> Image.Image:
+    """
+    Máscara binária das bordas da imagem (255 = borda), com pequenas
+    falhas do contorno fechadas por dilatação.
+    """
+    gray = img.convert('L').filter(ImageFilter.GaussianBlur(1))
+    edges = gray.filter(ImageFilter.FIND_EDGES)
+
+    # Limiar adaptativo: ignora o ruído fraco de fundos lisos
+    stat = ImageStat.Stat(edges)
+    threshold = max(24, stat.mean[0] + stat.stddev[0])
+    mask = edges.point(lambda value: 255 if value > threshold else 0)
+
+    return mask.filter(ImageFilter.MaxFilter(5)).filter(ImageFilter.MinFilter(5))
+
+
+def _largest_component_corners(mask: Image.Image):
+    """
+    Encontra o maior componente conectado da máscara e retorna seus
+    4 cantos extremos (superior esquerdo, inferior esquerdo,
+    inferior direito, superior direito), além da quantidade de pixels.
+    Os cantos são os pontos que minimizam/maximizam x+y e x-y.
+    """
+    width, height = mask.size
+    pixels = bytearray(mask.tobytes())
+    best_count, best_corners = 0, None
+
+    for start in range(len(pixels)):
+        if not pixels[start]:
+            continue
+
+        # Busca em profundidade iterativa, marcando os pixels visitados com 0
+        pixels[start] = 0
+        stack = [start]
+        count = 0
+        top_left = bottom_right = top_right = bottom_left = None
+        min_sum, max_sum, min_diff, max_diff = float('inf'), -1, float('inf'), -float('inf')
+
+        while stack:
+            index = stack.pop()
+            count += 1
+            y, x = divmod(index, width)
+
+            total, diff = x + y, x - y
+            if total < min_sum:
+                min_sum, top_left = total, (x, y)
+            if total > max_sum:
+                max_sum, bottom_right = total, (x, y)
+            if diff > max_diff:
+                max_diff, top_right = diff, (x, y)
+            if diff < min_diff:
+                min_diff, bottom_left = diff, (x, y)
+
+            if x > 0 and pixels[index - 1]:
+                pixels[index - 1] = 0
+                stack.append(index - 1)
+            if x < width - 1 and pixels[index + 1]:
+                pixels[index + 1] = 0
+                stack.append(index + 1)
+            if y > 0 and pixels[index - width]:
+                pixels[index - width] = 0
+                stack.append(index - width)
+            if y < height - 1 and pixels[index + width]:
+                pixels[index + width] = 0
+                stack.append(index + width)
+
+        if count > best_count:
+            best_count = count
+            best_corners = (top_left, bottom_left, bottom_right, top_right)
+
+    return best_corners, best_count
+
+
+def _quad_area(corners):
+    """Área do quadrilátero (fórmula do laço)."""
+    area = 0
+    for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]):
+        area += x1 * y2 - x2 * y1
+    return abs(area) / 2
+
+
+def _distance(a, b):
+    return ((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5
+
+
+def _whole_image_card(img: Image.Image, aspect_tolerance):
+    """
+    Imagens escaneadas ou recortadas (a carta ocupa a foto inteira) não têm
+    contorno visível: se a própria imagem tem a proporção de uma carta, usa-a toda.
+    """
+    width, height = img.size
+    if abs(width / height - CARD_ASPECT) > aspect_tolerance / 2:
+        return None
+    return ((0, 0), (0, height), (width, height), (width, 0))
+
+
+def detect_card(img: Image.Image, min_area=0.15, aspect_tolerance=0.2):
+    """
+    Localiza a carta na foto e retorna os 4 cantos em coordenadas da imagem
+    original (superior esquerdo, inferior esquerdo, inferior direito,
+    superior direito), ou None se nada parecido com uma carta for encontrado.
+    """
+    scale = DETECTION_SIZE / max(img.size)
+    small = img if scale >= 1 else img.resize(
+        (max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.BILINEAR, reducing_gap=2.0
+    )
+    scale = small.width / img.width
+
+    corners, _ = _largest_component_corners(_edge_mask(small))
+    if corners is None:
+        return _whole_image_card(img, aspect_tolerance)
+
+    # A carta precisa ocupar parte razoável da foto...
+    if _quad_area(list(corners)) < min_area * small.width * small.height:
+        return _whole_image_card(img, aspect_tolerance)
+
+    # ...e ter a proporção de uma carta em pé
+    top_left, bottom_left, bottom_right, top_right = corners
+    card_width = (_distance(top_left, top_right) + _distance(bottom_left, bottom_right)) / 2
+    card_height = (_distance(top_left, bottom_left) + _distance(top_right, bottom_right)) / 2
+    if not card_height or abs(card_width / card_height - CARD_ASPECT) > aspect_tolerance:
+        return _whole_image_card(img, aspect_tolerance)
+
+    # Volta para a escala da imagem original (centro do pixel reduzido)
+    return tuple(((x + 0.5) / scale, (y + 0.5) / scale) for x, y in corners)
+
+
+# -------------------------------------------------------------------
+# 2. CORREÇÃO DE PERSPECTIVA E RECORTE DAS REGIÕES DE TEXTO
+# -------------------------------------------------------------------
+def warp_card(img: Image.Image, corners, size=CARD_SIZE) -> Image.Image:
+    """
+    Corrige a perspectiva: mapeia o quadrilátero da carta (ou de uma
+    região dela) para um retângulo do tamanho pedido.
+    """
+    quad = [coordinate for corner in corners for coordinate in corner]
+    return img.transform(size, Image.QUAD, quad, Image.BICUBIC)
+
+
+def region_quad(corners, region):
+    """
+    Cantos (na foto) de uma região da carta dada em frações da carta
+    corrigida, por interpolação bilinear dos 4 cantos da carta.
+    """
+    top_left, bottom_left, bottom_right, top_right = corners
+
+    def point(u, v):
+        top = (top_left[0] + (top_right[0] - top_left[0]) * u, top_left[1] + (top_right[1] - top_left[1]) * u)
+        bottom = (bottom_left[0] + (bottom_right[0] - bottom_left[0]) * u,
+                  bottom_left[1] + (bottom_right[1] - bottom_left[1]) * u)
+        return (top[0] + (bottom[0] - top[0]) * v, top[1] + (bottom[1] - top[1]) * v)
+
+    left, top, right, bottom = region
+    return (point(left, top), point(left, bottom), point(right, bottom), point(right, top))
+
+
+def text_regions_image(img: Image.Image, corners) -> Image.Image:
+    """
+    Monta uma única imagem com a barra do nome em cima e o rodapé embaixo,
+    em tons de cinza e ampliada. O nome continua sendo a primeira linha
+    do texto, como esperado por CardRecognition._extract_identifier_from_text.
+    Só as duas regiões passam pela correção de perspectiva, não a carta toda.
+    """
+    gray = img.convert('L')
+    regions = []
+    for region in (TITLE_REGION, COLLECTOR_REGION):
+        left, top, right, bottom = region
+        size = (int((right - left) * CARD_SIZE[0] * REGION_SCALE), int((bottom - top) * CARD_SIZE[1] * REGION_SCALE))
+        regions.append(ImageOps.autocontrast(warp_card(gray, region_quad(corners, region), size)))
+
+    gap = 16 * REGION_SCALE
+    width = max(region.width for region in regions)
+    height = sum(region.height for region in regions) + gap
+
+    # Fundo branco entre as regiões para o OCR separar as linhas
+    sheet = Image.new('L', (width, height), 255)
+    sheet.paste(regions[0], (0, 0))
+    sheet.paste(regions[1], (0, regions[0].height + gap))
+    return sheet
+
+
+# -------------------------------------------------------------------
+# 3. ARTE DA CARTA (HASHES PERCEPTUAIS)
+# -------------------------------------------------------------------
+def art_hashes(img: Image.Image, corners):
+    """
+    (pHash, dHash) da arte da carta, recortada com a mesma região usada
+    no índice de hashes (card_hashing.ART_REGION).
+    """
+    left, top, right, bottom = ART_REGION
+    size = (int((right - left) * CARD_SIZE[0] / 2), int((bottom - top) * CARD_SIZE[1] / 2))
+    return image_hashes(warp_card(img, region_quad(corners, ART_REGION), size))
+
+
+# -------------------------------------------------------------------
+# 4. ANÁLISE COMPLETA PARA O RECONHECIMENTO
+# -------------------------------------------------------------------
+def analyze_card(image_bytes, max_bytes=REGIONS_MAX_BYTES):
+    """
+    Detecta a carta na imagem (JPEG em memória) e extrai o que o
+    reconhecimento usa dela:
+    - 'hashes': (pHash, dHash) da arte, para a busca por imagem
+    - 'regions': JPEG pequeno só com a barra do nome e o rodapé, para o OCR
+      (None com OCR_REGIONS=0)
+    Retorna None se a carta não for encontrada (o OCR usa a imagem inteira).
+    """
+    with Image.open(BytesIO(image_bytes)) as img:
+        img = convert_to_rgb(img)
+        corners = detect_card(img)
+        if corners is None:
+            logger.debug("-> Carta não detectada, OCR usará a imagem inteira.")
+            return None
+
+        hashes = art_hashes(img, corners)
+        sheet = text_regions_image(img, corners) if OCR_REGIONS_ENABLED else None
+
+    regions = None
+    if sheet is not None:
+        regions, _ = compress_to_jpeg(sheet, max_bytes)
+        logger.debug("-> Regiões de texto recortadas: %.0f KB (imagem inteira: %.0f KB)",
+                     len(regions) / 1024, len(image_bytes) / 1024)
+
+    return {'hashes': hashes, 'regions': regions}
+
+
+def process_image_for_recognition(source, formats=None):
+    """
+    Etapa de CPU completa para o reconhecimento: processa a imagem
+    (image_utils.process_image_to_bytes) e analisa a carta (analyze_card).
+    `formats` é repassado ao Pillow (ex: o formato vindo de sniff_image_format).
+    Retorna (bytes da imagem inteira, análise ou None). Uma falha na
+    detecção não derruba o reconhecimento: o OCR usa a imagem inteira.
+    """
+    image_bytes = process_image_to_bytes(source, formats=formats)
+    try:
+        with metrics.span('detect'):
+            analysis = analyze_card(image_bytes)
+    except Exception as e:
+        logger.warning("Card detection failed: %s", e)
+        analysis = None
+    return image_bytes, analysis
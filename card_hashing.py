@@ -0,0 +1,318 @@
+import os
+import math
+import itertools
+import uuid
+import pickle
+import logging
+import threading
+from io import BytesIO
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato do arquivo de snapshot dos hashes
+SNAPSHOT_VERSION = 1
+
+# Região da arte, em frações da carta corrigida (esquerda, topo, direita, base).
+# Um pouco para dentro da moldura, tolerando erro na detecção dos cantos
+ART_REGION = (0.12, 0.14, 0.88, 0.52)
+
+# O pHash usa os 8x8 coeficientes de mais baixa frequência de uma DCT 32x32
+HASH_SIZE = 8
+DCT_SIZE = 32
+HASH_BITS = 2 * HASH_SIZE * HASH_SIZE  # pHash + dHash
+
+# Tabela de cossenos da DCT (só as frequências usadas no hash)
+_DCT_COS = [
+    [math.cos(math.pi * (2 * x + 1) * u / (2 * DCT_SIZE)) for x in range(DCT_SIZE)]
+    for u in range(HASH_SIZE)
+]
+
+
+# -------------------------------------------------------------------
+# HASHES PERCEPTUAIS
+# -------------------------------------------------------------------
+def dhash(img: Image.Image) -> int:
+    """
+    Hash de diferença: cada bit diz se um pixel é mais claro que o vizinho
+    da direita, numa miniatura 9x8 em tons de cinza.
+    """
+    gray = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = gray.tobytes()
+    value = 0
+    for y in range(HASH_SIZE):
+        row = pixels[y * (HASH_SIZE + 1):(y + 1) * (HASH_SIZE + 1)]
+        for x in range(HASH_SIZE):
+            value = (value << 1) | (row[x] < row[x + 1])
+    return value
+
+
+def phash(img: Image.Image) -> int:
+    """
+    Hash perceptual: DCT 2D de uma miniatura 32x32 em tons de cinza;
+    cada bit diz se um dos 8x8 coeficientes de baixa frequência está
+    acima da mediana. A DCT é separável (linhas, depois colunas) e só
+    calcula as frequências usadas.
+    """
+    gray = img.convert('L').resize((DCT_SIZE, DCT_SIZE), Image.LANCZOS)
+    pixels = gray.tobytes()
+
+    # DCT de cada linha (apenas as HASH_SIZE primeiras frequências)
+    rows = []
+    for y in range(DCT_SIZE):
+        row = pixels[y * DCT_SIZE:(y + 1) * DCT_SIZE]
+        rows.append([sum(c * p for c, p in zip(cosines, row)) for cosines in _DCT_COS])
+
+    # DCT das colunas do resultado
+    coefficients = [
+        sum(_DCT_COS[v][y] * rows[y][u] for y in range(DCT_SIZE))
+        for v in range(HASH_SIZE) for u in range(HASH_SIZE)
+    ]
+
+    # A mediana ignora o coeficiente DC (brilho médio da imagem)
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]
+
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def image_hashes(art: Image.Image):
+    """Retorna (pHash, dHash) da arte de uma carta."""
+    return phash(art), dhash(art)
+
+
+def art_from_card_image(img: Image.Image) -> Image.Image:
+    """Recorta a arte de uma imagem da carta inteira e reta (ex: imagens da Scryfall)."""
+    left, top, right, bottom = ART_REGION
+    width, height = img.size
+    return img.crop((int(left * width), int(top * height), int(right * width), int(bottom * height)))
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+# -------------------------------------------------------------------
+# ÍNDICE DE HASHES (BUSCA MULTI-ÍNDICE POR DISTÂNCIA DE HAMMING)
+# -------------------------------------------------------------------
+class CardHashIndex:
+    """
+    Índice dos hashes das imagens das cartas da Scryfall.
+
+    O pHash de 64 bits é dividido em 4 blocos de 16 bits, cada um com sua
+    tabela bloco -> posições. Pelo princípio da casa dos pombos, um hash a
+    distância <= 4 * (raio + 1) - 1 da consulta tem algum bloco a no máximo
+    `raio` bits de diferença; basta consultar nas tabelas os valores vizinhos
+    de cada bloco e comparar só esses candidatos.
+    A distância final soma pHash e dHash (128 bits).
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self, chunk_radius=2, max_distance=None, min_margin=None):
+        self.chunk_radius = chunk_radius
+        self.max_distance = max_distance or int(os.environ.get("CARD_HASH_MAX_DISTANCE", "28"))
+        self.min_margin = min_margin or int(os.environ.get("CARD_HASH_MIN_MARGIN", "8"))
+
+        self._ids = []              # 16 bytes do UUID de cada carta
+        self._cards = []            # (nome, set, número) de cada carta
+        self._phashes = array('Q')
+        self._dhashes = array('Q')
+        self._tables = [{} for _ in range(self.CHUNKS)]
+        self._positions = {}        # UUID -> posição (para atualizações)
+        self._lock = threading.Lock()
+
+        # Máscaras com até chunk_radius bits ligados, para consultar os vizinhos de um bloco
+        flips = {0}
+        for _ in range(chunk_radius):
+            flips |= {flip | (1 << bit) for flip in flips for bit in range(self.CHUNK_BITS)}
+        self._flips = sorted(flips)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _chunks(self, value):
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(value >> (self.CHUNK_BITS * index)) & mask for index in range(self.CHUNKS)]
+
+    def add(self, card_id, name, set_code, number, phash_value, dhash_value):
+        """Adiciona (ou substitui) os hashes de uma carta."""
+        key = uuid.UUID(str(card_id)).bytes
+        with self._lock:
+            position = self._positions.get(key)
+            if position is not None:
+                # Hash alterado: remove a posição antiga das tabelas
+                for table, chunk in zip(self._tables, self._chunks(self._phashes[position])):
+                    table[chunk].remove(position)
+                self._cards[position] = (name, set_code, number)
+                self._phashes[position] = phash_value
+                self._dhashes[position] = dhash_value
+            else:
+                position = len(self._ids)
+                self._positions[key] = position
+                self._ids.append(key)
+                self._cards.append((name, set_code, number))
+                self._phashes.append(phash_value)
+                self._dhashes.append(dhash_value)
+
+            for table, chunk in zip(self._tables, self._chunks(phash_value)):
+                table.setdefault(chunk, array('I')).append(position)
+
+    def __contains__(self, card_id):
+        return uuid.UUID(str(card_id)).bytes in self._positions
+
+    def search(self, phash_value, dhash_value, limit=5):
+        """
+        Retorna até `limit` cartas mais próximas como
+        (distância, id, nome, set, número), da mais próxima para a mais distante.
+        """
+        candidates = set()
+        for table, chunk in zip(self._tables, self._chunks(phash_value)):
+            for flip in self._flips:
+                positions = table.get(chunk ^ flip)
+                if positions:
+                    candidates.update(positions)
+
+        scored = sorted(
+            (hamming(self._phashes[position], phash_value) + hamming(self._dhashes[position], dhash_value), position)
+            for position in candidates
+        )
+        return [
+            (distance, str(uuid.UUID(bytes=self._ids[position])), *self._cards[position])
+            for distance, position in scored[:limit]
+        ]
+
+    def match(self, phash_value, dhash_value):
+        """
+        Melhor carta para os hashes, se a correspondência for confiável:
+        distância <= max_distance e pelo menos min_margin bits à frente da
+        melhor carta com outro nome (reimpressões com a mesma arte não contam).
+        Retorna (distância, id, nome, set, número) ou None.
+        """
+        results = self.search(phash_value, dhash_value, limit=16)
+        if not results:
+            return None
+
+        best = results[0]
+        if best[0] > self.max_distance:
+            return None
+
+        rival = next((result[0] for result in results[1:] if result[2] != best[2]), HASH_BITS)
+        if rival - best[0] < self.min_margin:
+            logger.debug("Hash match too ambiguous: %s (%d bits) vs %d bits", best[2], best[0], rival)
+            return None
+        return best
+
+    # -------------------------------
+    # SNAPSHOT EM DISCO
+    # -------------------------------
+
+    def save(self, path):
+        """Salva o índice em disco para carregamento rápido."""
+        temp_path = path + ".temp"
+        with open(temp_path, 'wb') as output:
+            pickle.dump({
+                'version': SNAPSHOT_VERSION,
+                'ids': self._ids,
+                'cards': self._cards,
+                'phashes': self._phashes,
+                'dhashes': self._dhashes
+            }, output, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path, **options):
+        """Carrega um índice salvo com save(), recriando as tabelas de busca."""
+        with open(path, 'rb') as snapshot_file:
+            data = pickle.load(snapshot_file)
+
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported card hash snapshot version: {data.get('version')}")
+
+        index = CardHashIndex(**options)
+        for key, card, phash_value, dhash_value in zip(data['ids'], data['cards'], data['phashes'], data['dhashes']):
+            index.add(uuid.UUID(bytes=key), *card, phash_value, dhash_value)
+        return index
+
+
+# -------------------------------------------------------------------
+# CONSTRUÇÃO A PARTIR DAS IMAGENS DA SCRYFALL
+# -------------------------------------------------------------------
+def _card_image_url(card, image_size):
+    """URL da imagem da frente da carta (cartas de duas faces usam a primeira face)."""
+    image_uris = card.get('image_uris') or (card.get('card_faces') or [{}])[0].get('image_uris') or {}
+    return image_uris.get(image_size)
+
+
+def build_from_bulk_file(bulk_path, index=None, image_size='small', workers=8):
+    """
+    Baixa a imagem de cada carta do arquivo bulk e adiciona seus hashes ao índice.
+    Cartas já presentes no índice são puladas (atualização incremental).
+    """
+    from card_index import iter_bulk_cards
+    from scryfall import Scryfall
+
+    index = index or CardHashIndex()
+    session = Scryfall.get_session()
+
+    def hash_card(card):
+        url = _card_image_url(card, image_size)
+        if not url:
+            return None
+        try:
+            response = session.get(url, timeout=(Scryfall.CONNECT_TIMEOUT, Scryfall.READ_TIMEOUT))
+            response.raise_for_status()
+            with Image.open(BytesIO(response.content)) as img:
+                hashes = image_hashes(art_from_card_image(img.convert('RGB')))
+        except Exception as e:
+            logger.warning("Error hashing %s: %s", card.get('name'), e)
+            return None
+        return card, hashes
+
+    def pending_cards():
+        for card in iter_bulk_cards(bulk_path):
+            if card.get('id') and card['id'] not in index:
+                yield card
+
+    added = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Em lotes: executor.map consumiria o arquivo bulk inteiro de uma vez
+        cards = pending_cards()
+        while batch := list(itertools.islice(cards, workers * 32)):
+            for result in executor.map(hash_card, batch):
+                if result is None:
+                    continue
+                card, (phash_value, dhash_value) = result
+                index.add(card['id'], card.get('name', ''), card.get('set', ''), card.get('collector_number', ''),
+                          phash_value, dhash_value)
+                added += 1
+                if added % 1000 == 0:
+                    logger.info("Hashed %d card images...", added)
+
+    return index
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Uso: python card_hashing.py <bulk.json> <hashes.pkl> [--size small|normal|large]
+    if len(sys.argv) < 3:
+        print("Usage: python card_hashing.py <bulk.json> <hashes.pkl> [--size small|normal|large]")
+        sys.exit(1)
+
+    bulk_path, hashes_path = sys.argv[1], sys.argv[2]
+    size = sys.argv[sys.argv.index('--size') + 1] if '--size' in sys.argv else 'small'
+
+    # Atualiza incrementalmente se já existir um snapshot
+    hash_index = CardHashIndex.load(hashes_path) if os.path.exists(hashes_path) else None
+    hash_index = build_from_bulk_file(bulk_path, hash_index, image_size=size)
+
+    hash_index.save(hashes_path)
+    print(f"Indexed {len(hash_index)} card image hashes into {hashes_path}")
@@ -0,0 +1,316 @@
+import os
+import json
+import uuid
+import zlib
+import pickle
+import logging
+import random
+import threading
+from array import array
+from card_cache import CardCache
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato do arquivo de snapshot do índice
+SNAPSHOT_VERSION = 1
+
+
+# -------------------------------------------------------------------
+# LEITURA EM STREAMING DO ARQUIVO BULK DA SCRYFALL
+# -------------------------------------------------------------------
+def iter_bulk_cards(path, chunk_size=1024 * 1024):
+    """
+    Lê um arquivo bulk da Scryfall (um array JSON gigante) carta por carta,
+    sem carregar o arquivo inteiro na memória.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    with open(path, 'r', encoding='utf-8') as bulk_file:
+        while True:
+            # Pula espaços, vírgulas e a abertura do array
+            while position < len(buffer) and buffer[position] in ' \t\r\n,[':
+                if buffer[position] == '[':
+                    started = True
+                position += 1
+
+            if position < len(buffer) and buffer[position] == ']':
+                return
+
+            if position < len(buffer) and started:
+                try:
+                    card, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # Objeto incompleto no buffer: precisa ler mais
+                    if eof:
+                        raise
+                else:
+                    yield card
+                    position = end
+                    continue
+
+            if eof:
+                return
+
+            # Descarta o que já foi consumido e lê o próximo pedaço
+            chunk = bulk_file.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+def download_bulk_file(path, bulk_type='default_cards'):
+    """
+    Baixa o arquivo bulk mais recente da Scryfall para o caminho informado.
+    """
+    from scryfall import Scryfall
+
+    session = Scryfall.get_session()
+    info = Scryfall._get(f"/bulk-data/{bulk_type}")
+    info.raise_for_status()
+
+    temp_path = path + ".temp"
+    with session.get(info.json()['download_uri'], stream=True, timeout=(Scryfall.CONNECT_TIMEOUT, 300)) as response:
+        response.raise_for_status()
+        with open(temp_path, 'wb') as output:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                output.write(chunk)
+
+    os.replace(temp_path, path)
+    return path
+
+
+# -------------------------------------------------------------------
+# ÍNDICE LOCAL DE CARTAS
+# -------------------------------------------------------------------
+class CardIndex:
+    """
+    Índice compacto em memória das cartas de um arquivo bulk da Scryfall.
+
+    Cada carta é guardada como JSON minificado e comprimido (zlib),
+    ocupando uma fração do espaço de um dict Python. Os índices guardam
+    apenas a posição da carta na lista:
+    - ID da Scryfall (16 bytes do UUID) -> posição
+    - 'set/número' -> posição
+    - nome normalizado -> posição da impressão mais recente
+    """
+
+    def __init__(self):
+        self._records = []          # JSON comprimido de cada carta
+        self._checksums = array('L')
+        self._by_id = {}
+        self._by_set_number = {}
+        self._by_name = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    # -------------------------------
+    # CONSTRUÇÃO
+    # -------------------------------
+
+    @staticmethod
+    def from_bulk_file(path):
+        """Cria um índice a partir de um arquivo bulk JSON."""
+        index = CardIndex()
+        index.refresh(path)
+        return index
+
+    def refresh(self, path):
+        """
+        Atualiza o índice com um arquivo bulk mais novo.
+        Cartas sem alteração reaproveitam o registro já comprimido;
+        cartas ausentes no novo arquivo são removidas.
+        Retorna um dict com o número de cartas adicionadas, alteradas e removidas.
+        """
+        records = []
+        checksums = array('L')
+        by_id = {}
+        by_set_number = {}
+        by_name = {}
+        released = {}               # nome -> data da impressão indexada
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+
+        old_records = self._records
+        old_checksums = self._checksums
+        old_by_id = self._by_id
+
+        for card in iter_bulk_cards(path):
+            if 'id' not in card:
+                continue
+
+            raw = json.dumps(card, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+            checksum = zlib.crc32(raw)
+            key = uuid.UUID(card['id']).bytes
+
+            old_row = old_by_id.get(key)
+            if old_row is not None and old_checksums[old_row] == checksum:
+                record = old_records[old_row]
+                stats['unchanged'] += 1
+            else:
+                record = zlib.compress(raw, 6)
+                stats['updated' if old_row is not None else 'added'] += 1
+
+            row = len(records)
+            records.append(record)
+            checksums.append(checksum)
+            by_id[key] = row
+
+            if card.get('set') and card.get('collector_number'):
+                by_set_number[CardCache.set_number_key(card['set'], card['collector_number'])] = row
+
+            # Nome completo e nomes das faces (ex: 'Fire // Ice')
+            names = [card.get('name', '')]
+            names.extend(face.get('name', '') for face in card.get('card_faces', []))
+            released_at = card.get('released_at', '')
+            for name in names:
+                name = CardCache.normalize_name(name)
+                if name and released_at >= released.get(name, ''):
+                    by_name[name] = row
+                    released[name] = released_at
+
+        stats['removed'] = len(old_by_id) - stats['updated'] - stats['unchanged']
+
+        # Troca atômica das estruturas (leituras concorrentes continuam válidas)
+        with self._lock:
+            self._records = records
+            self._checksums = checksums
+            self._by_id = by_id
+            self._by_set_number = by_set_number
+            self._by_name = by_name
+
+        logger.info("Card index refreshed: %s", stats)
+        return stats
+
+    # -------------------------------
+    # CONSULTAS
+    # -------------------------------
+
+    def _load(self, table, key):
+        # Lê posição e registro sob o lock para não misturar estruturas de um refresh
+        with self._lock:
+            row = getattr(self, table).get(key)
+            record = self._records[row] if row is not None else None
+
+        if record is None:
+            return None
+        return json.loads(zlib.decompress(record))
+
+    def get_card(self, card_id):
+        """Busca uma carta pelo ID da Scryfall."""
+        try:
+            key = uuid.UUID(str(card_id)).bytes
+        except ValueError:
+            return None
+        return self._load('_by_id', key)
+
+    def checksum(self, card_id):
+        """CRC32 do JSON da carta no índice (muda quando a carta muda) ou None."""
+        try:
+            key = uuid.UUID(str(card_id)).bytes
+        except ValueError:
+            return None
+        with self._lock:
+            row = self._by_id.get(key)
+            return self._checksums[row] if row is not None else None
+
+    def get_by_set_number(self, set_code, number):
+        """Busca uma carta pelo código do set e número de coleção."""
+        return self._load('_by_set_number', CardCache.set_number_key(set_code, number))
+
+    def get_by_name(self, name):
+        """Busca a impressão mais recente de uma carta pelo nome exato (normalizado)."""
+        return self._load('_by_name', CardCache.normalize_name(name))
+
+    def names(self):
+        """Lista de nomes normalizados presentes no índice."""
+        return list(self._by_name.keys())
+
+    def set_sizes(self):
+        """Número de cartas indexadas por código de set (ex: {'mh2': 303})."""
+        sizes = {}
+        for key in list(self._by_set_number):
+            set_code = key[len('set:'):].split('/', 1)[0]
+            sizes[set_code] = sizes.get(set_code, 0) + 1
+        return sizes
+
+    def random_card(self):
+        """Retorna uma carta aleatória do índice."""
+        records = self._records
+        if not records:
+            return None
+        return json.loads(zlib.decompress(random.choice(records)))
+
+    # -------------------------------
+    # SNAPSHOT EM DISCO
+    # -------------------------------
+
+    def save(self, path):
+        """Salva o índice em disco para carregamento rápido."""
+        temp_path = path + ".temp"
+        with open(temp_path, 'wb') as output:
+            pickle.dump({
+                'version': SNAPSHOT_VERSION,
+                'records': self._records,
+                'checksums': self._checksums,
+                'by_id': self._by_id,
+                'by_set_number': self._by_set_number,
+                'by_name': self._by_name
+            }, output, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path):
+        """
+        Carrega um índice salvo com save() ou, se for um arquivo .json,
+        constrói o índice a partir do arquivo bulk.
+        """
+        if path.endswith('.json'):
+            return CardIndex.from_bulk_file(path)
+
+        with open(path, 'rb') as snapshot_file:
+            data = pickle.load(snapshot_file)
+
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported card index snapshot version: {data.get('version')}")
+
+        index = CardIndex()
+        index._records = data['records']
+        index._checksums = data['checksums']
+        index._by_id = data['by_id']
+        index._by_set_number = data['by_set_number']
+        index._by_name = data['by_name']
+        return index
+
+
+# -------------------------------------------------------------------
+# EXECUÇÃO DIRETA DO SCRIPT
+# -------------------------------------------------------------------
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Uso: python card_index.py <bulk.json> <index.pkl> [--download]
+    if len(sys.argv) < 3:
+        print("Usage: python card_index.py <bulk.json> <index.pkl> [--download]")
+        sys.exit(1)
+
+    bulk_path, index_path = sys.argv[1], sys.argv[2]
+    if '--download' in sys.argv:
+        download_bulk_file(bulk_path)
+
+    # Atualiza incrementalmente se já existir um snapshot
+    if os.path.exists(index_path):
+        card_index = CardIndex.load(index_path)
+        card_index.refresh(bulk_path)
+    else:
+        card_index = CardIndex.from_bulk_file(bulk_path)
+
+    card_index.save(index_path)
+    print(f"Indexed {len(card_index)} cards into {index_path}")
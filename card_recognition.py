@@ -1,113 +1,221 @@
-import requests
-import base64
-import re
 import os
+import re
+import logging
+import metrics
+from ocr_backends import backend_from_env
+from card_hashing import CardHashIndex
+from scryfall import Scryfall
+import card_detection
+
+logger = logging.getLogger(__name__)
 
 class CardRecognition:
-    # URL da API do OCR.space
-    OCR_API_URL = "https://api.ocr.space/parse/image"
-    
-    # Cabeçalhos enviados na requisição, incluindo a API KEY (lida da variável de ambiente)
-    HEADERS = {
-        'apikey': os.environ.get("OCR_API_KEY")  # Sua API KEY deve estar definida na variável de ambiente
-    }
+    # Código de set impresso no rodapé (ex: KHM, MH2, PLST)
+    SET_CODE_PATTERN = re.compile(r'\b[A-Z][A-Z0-9]{2,4}\b')
+
+    # Palavras do rodapé que parecem códigos de set
+    NOT_SET_CODES = {'MEE', 'LLC', 'ZHS', 'ZHT'}
+
+    # Candidatos de set + número devolvidos pela extração
+    MAX_CANDIDATES = 5
+
+    # Motor de OCR em uso (OCR_BACKEND: 'ocrspace' por padrão, ou 'tesseract')
+    backend = backend_from_env()
+
+    # Índice opcional de hashes das imagens da Scryfall (reconhecimento sem OCR)
+    hash_index = None
 
     @staticmethod
-    def _get_ocr_text(file_path):
+    def use_backend(backend):
         """
-        Método privado que envia uma imagem para o OCR.space e retorna o texto extraído.
+        Troca o motor de OCR (qualquer objeto com extract_text(image_bytes)).
         """
-        print(f"Sending image to OCR API: {file_path}")
-        try:
-            # Abre o arquivo da imagem em modo binário
-            with open(file_path, 'rb') as image_file:
-                # Converte o conteúdo da imagem em Base64
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-
-            # Payload requerido pela API do OCR.space
-            payload = {
-                'isOverlayRequired': False,  # Desabilita overlay visual no retorno
-                'OCREngine': 2,              # Usa engine OCR mais precisa
-                'language': 'auto',          # Detecta idioma automaticamente
-                'base64Image': f"data:image/jpeg;base64,{base64_image}"  # Imagem codificada
-            }
+        CardRecognition.backend = backend
 
-            print("Payload prepared, making API request...")
+    @staticmethod
+    def use_hash_index(hash_index):
+        """
+        Define o índice de hashes consultado antes do OCR (None desativa).
+        """
+        CardRecognition.hash_index = hash_index
 
-            # Faz a requisição POST para a API
-            response = requests.post(
-                CardRecognition.OCR_API_URL,
-                headers=CardRecognition.HEADERS,
-                data=payload
-            )
+    @staticmethod
+    def _get_ocr_text_from_bytes(image_bytes):
+        """
+        Envia os bytes de uma imagem para o motor de OCR e retorna o texto extraído.
+        """
+        with metrics.span('ocr'):
+            return CardRecognition.backend.extract_text(image_bytes)
 
-            print("API request completed.")
+    @staticmethod
+    def _set_code_candidates(lines, number_lines, set_codes):
+        """
+        Códigos de set encontrados no texto: (código, pontuação de 0 a 1, linhas).
+        Com a tabela de sets, só valem códigos que existem; perto do número
+        de coleção e no rodapé (últimas linhas) a pontuação sobe. Sem a
+        tabela, só valem palavras perto do número ou no rodapé, onde o
+        código é impresso, e com pontuação menor (podem ser palavras quaisquer).
+        """
+        scores = {}
+        found_on = {}
+        for line_index, line in enumerate(lines):
+            near_number = any(abs(line_index - number_line) <= 1 for number_line in number_lines)
+            in_footer = line_index >= len(lines) - 3
+            if set_codes is None and not (near_number or in_footer):
+                continue
 
-            # Lança exceção se o status não for 200
-            response.raise_for_status()
-            
-            # Converte a resposta em JSON
-            json_response = response.json()
+            for match in CardRecognition.SET_CODE_PATTERN.finditer(line):
+                code = match.group(0)
+                if code in CardRecognition.NOT_SET_CODES:
+                    continue
+                if set_codes is not None and code not in set_codes:
+                    continue
 
-            # Verifica se houve erro de processamento
-            if not json_response.get('IsErroredOnProcessing'):
-                # Retorna o texto extraído
-                return json_response['ParsedResults'][0]['ParsedText']
-            else:
-                print(f"OCR Error: {json_response.get('ErrorMessage')}")
-                return None
+                score = 0.7 if set_codes is not None else 0.2
+                if near_number:
+                    score += 0.2
+                if in_footer:
+                    score += 0.1
+                scores[code] = max(scores.get(code, 0), min(score, 1.0))
+                found_on.setdefault(code, set()).add(line_index)
+        return [(code, score, found_on[code]) for code, score in sorted(scores.items(), key=lambda item: -item[1])]
 
-        # Caso o arquivo não exista
-        except FileNotFoundError:
-            print(f"Error: File not found at path: {file_path}")
-            return None
-        
-        # Erros relacionados à requisição HTTP
-        except requests.exceptions.RequestException as e:
-            print(f"An API request error occurred: {e}")
-            return None
+    @staticmethod
+    def _number_candidates(lines):
+        """
+        Números de coleção encontrados no texto: (número, pontuação, linha).
+        'XXX/YYY' vale mais que o formato 'raridade XXXX' das cartas novas.
+        """
+        numbers = {}
+        for line_index, line in enumerate(lines):
+            for match in re.finditer(r'\b(\d{3,4})/(\d{3,4})\b', line):
+                number, total = int(match.group(1)), int(match.group(2))
+                # Números acima do total existem (cartas bônus), mas são menos comuns
+                score = 0.9 if number <= total else 0.7
+                numbers.setdefault(str(number), (score, line_index))
+
+            for match in re.finditer(r'\b[ucrm]\s+(\d{3,4})\b', line, re.IGNORECASE):
+                numbers.setdefault(str(int(match.group(1))), (0.8, line_index))
+
+        # A ordem no texto desempata (o primeiro número costuma ser o do rodapé)
+        return [(number, score - 0.05 * rank, line_index)
+                for rank, (number, (score, line_index)) in enumerate(numbers.items())]
+
+    @staticmethod
+    def _name_candidates(lines):
+        """Nome da carta: a primeira linha com texto (ou a segunda), sem números e símbolos de mana."""
+        names = []
+        for line, score in zip(lines[:2], (0.6, 0.3)):
+            # Tira força/resistência (ex: 1/1), outros números e símbolos de mana
+            name = re.sub(r'\d+\s*/\s*\d+|[0-9{}]', '', line)
+            name = ' '.join(name.split()).strip(" .,:;|-—")
+            if sum(character.isalpha() for character in name) >= 3:
+                names.append((name, score))
+        return names
+
+    @staticmethod
+    def _extract_candidates_from_text(ocr_text, set_codes=None):
+        """
+        Candidatos {'set', 'number', 'name', 'confidence'}, do mais provável
+        para o menos: cada código de set combinado com cada número de coleção
+        (confiança = set x número) e, por último, só o nome.
+        `set_codes` é a tabela de sets (set_codes.SetCodeTable) ou None.
+        Retorna (candidatos, códigos de set pontuados, números pontuados).
+        """
+        lines = [line.strip() for line in ocr_text.split('\n') if line.strip()]
+
+        numbers = CardRecognition._number_candidates(lines)
+        sets = CardRecognition._set_code_candidates(lines, [line for _, _, line in numbers], set_codes)
+        names = CardRecognition._name_candidates(lines)
+        name, name_score = names[0] if names else ("", 0.0)
+
+        candidates = []
+        for set_code, set_score, set_lines in sets:
+            for number, number_score, number_line in numbers:
+                confidence = set_score * number_score
+                # Set e número na mesma linha do rodapé desempatam a favor do par
+                if number_line in set_lines:
+                    confidence = min(confidence * 1.1, 1.0)
+                # Número maior que o tamanho do set: possível (promos), mas improvável
+                if set_codes is not None and int(number) > set_codes.card_count(set_code) > 0:
+                    confidence *= 0.7
+                candidates.append({"set": set_code, "number": number, "name": name,
+                                   "confidence": round(confidence, 3)})
+
+        candidates.sort(key=lambda candidate: -candidate["confidence"])
+        candidates = candidates[:CardRecognition.MAX_CANDIDATES]
+
+        if name:
+            candidates.append({"set": "", "number": "", "name": name, "confidence": round(name_score * 0.5, 3)})
+        return candidates, sets, numbers
 
     @staticmethod
     def _extract_identifier_from_text(ocr_text):
-        print(f"Extracting identifier from OCR text:\n{ocr_text}")
         """
         Método privado que extrai informações relevantes da carta a partir do texto.
+        Retorna o candidato mais provável (set, número e nome, com 'confidence')
+        e a lista ordenada de todos em 'candidates' (resolvidos de uma vez por
+        Scryfall.search_card).
         """
+        logger.debug("Extracting identifier from OCR text:\n%s", ocr_text)
         if not ocr_text:
             return None
-        
-        # Estrutura básica contendo set, número e nome da carta
-        card = {"set": "", "number": "", "name": ""}
-
-        # 1. Procura um código de SET com 3 caracteres (ex: KHM, MH2)
-        # Regex: palavra com 3 caracteres (letras ou números), ignorando "MEE"
-        match_set_code = re.search(r'\b(?!MEE\b)[A-Z][A-Z0-9]{2}\b', ocr_text)
-        if match_set_code:
-            card["set"] = match_set_code.group(0)
-        
-        # 2. Procura formato de número 'XXX/XXX'
-        match_slash = re.search(r'\b\d{3}/\d{3}\b', ocr_text)
-        if match_slash:
-            # Retorna apenas o número antes da barra
-            card["number"] = match_slash.group(0).split('/')[0]
-
-        # 3. Procura formato 'u/c/m/r XXXX' caso o número não tenha sido encontrado
-        if card['number'] == "":
-            match_rarity_code = re.search(r'\b[ucrm]\s+\d{3,4}\b', ocr_text, re.IGNORECASE)
-            print(f"Rarity code match: {match_rarity_code}")
-            if match_rarity_code:
-                # Retorna apenas o número associado
-                card["number"] = str(int(match_rarity_code.group(0).split()[-1]))
-
-        # 4. Caso não encontre nada, usa a primeira linha como nome da carta
-        first_line = ocr_text.split('\n')[0].strip()
-
-        # Remove números que possam vir na linha (ex: power/toughness, custo, etc.)
-        card["name"] = re.sub(r'[0-9]', '', first_line).strip()
-
-        print(card)
+
+        candidates, sets, numbers = CardRecognition._extract_candidates_from_text(ocr_text, Scryfall.get_set_codes())
+
+        if candidates and candidates[0]["set"]:
+            card = dict(candidates[0])
+        else:
+            # Sem par set + número: guarda o que houver de cada um
+            card = {
+                "set": sets[0][0] if sets else "",
+                "number": numbers[0][0] if numbers else "",
+                "name": candidates[0]["name"] if candidates else "",
+                "confidence": candidates[0]["confidence"] if candidates else 0.0,
+            }
+        card["candidates"] = candidates
+
+        logger.debug("Identifier: %s", card)
         return card
 
+    @staticmethod
+    def _identify_from_hashes(hashes):
+        """
+        Busca a arte da carta no índice de hashes.
+        Retorna o identificador (com o 'id' da Scryfall) ou None se a
+        correspondência não for confiável.
+        """
+        with metrics.span('hash_match'):
+            match = CardRecognition.hash_index.match(*hashes)
+        if match is None:
+            return None
+
+        distance, card_id, name, set_code, number = match
+        logger.debug("Hash match: %s (%s %s), distance %s", name, set_code, number, distance)
+        return {"set": set_code.upper(), "number": number, "name": name, "id": card_id}
+
+    @staticmethod
+    def _identifier_from_region_text(ocr_text):
+        """
+        Identificador extraído do texto das regiões, ou None se o texto
+        não trouxer nome nem número.
+        """
+        if not ocr_text:
+            return None
+
+        identifier = CardRecognition._extract_identifier_from_text(ocr_text)
+        if identifier and (identifier['name'] or identifier['number']):
+            return identifier
+        return None
+
+    @staticmethod
+    def _identify_from_regions(regions):
+        """
+        OCR apenas da barra do nome e do rodapé (ver card_detection).
+        Retorna o identificador ou None se o texto não trouxer nome nem número.
+        """
+        return CardRecognition._identifier_from_region_text(CardRecognition._get_ocr_text_from_bytes(regions))
+
     @staticmethod
     def identify_card_from_image(file_path):
         """
@@ -116,20 +224,68 @@ class CardRecognition:
         2. Extrai o texto com OCR
         3. Analisa o texto para extrair nome/set/número
         """
-        print(f"Processing image: {file_path}")
+        logger.debug("Processing image: %s", file_path)
+
+        try:
+            # Abre o arquivo da imagem em modo binário
+            with open(file_path, 'rb') as image_file:
+                image_bytes = image_file.read()
+
+        # Caso o arquivo não exista
+        except FileNotFoundError:
+            logger.error("Error: File not found at path: %s", file_path)
+            return None
+
+        return CardRecognition.identify_card_from_bytes(image_bytes)
+
+    @staticmethod
+    def identify_card_from_bytes(image_bytes, analysis=None, detect=True):
+        """
+        Igual a identify_card_from_image, mas recebe o JPEG já em memória
+        (ex: saída de image_utils.process_image_to_bytes), sem tocar no disco.
+        Usa a análise da carta (`analysis`, ou feita aqui se detect; ver
+        card_detection.analyze_card) em ordem:
+        1. Hashes da arte no índice de hashes (sem OCR)
+        2. OCR só das regiões de texto
+        3. OCR da imagem inteira
+        """
+        logger.debug("Processing image from memory: %d bytes", len(image_bytes))
+
+        if analysis is None and detect:
+            try:
+                with metrics.span('detect'):
+                    analysis = card_detection.analyze_card(image_bytes)
+            except Exception as e:
+                logger.warning("Card detection failed: %s", e)
 
-        # Obtém texto do OCR
-        ocr_text = CardRecognition._get_ocr_text(file_path)
+        if analysis and CardRecognition.hash_index is not None:
+            identifier = CardRecognition._identify_from_hashes(analysis['hashes'])
+            if identifier:
+                logger.debug("Found identifier: %s", identifier)
+                return identifier
+
+        if analysis and analysis['regions']:
+            identifier = CardRecognition._identify_from_regions(analysis['regions'])
+            if identifier:
+                logger.debug("Found identifier: %s", identifier)
+                return identifier
+            logger.debug("Region OCR found nothing, retrying with the whole image.")
+
+        ocr_text = CardRecognition._get_ocr_text_from_bytes(image_bytes)
 
-        # Se recebeu texto, extrai os dados identificadores
         if ocr_text:
             identifier = CardRecognition._extract_identifier_from_text(ocr_text)
-            print(f"Found identifier: {identifier}")
+            logger.debug("Found identifier: %s", identifier)
             return identifier
         else:
-            print("Could not get OCR text.")
+            logger.info("Could not get OCR text.")
             return None
-        
+
+
+# Carrega o índice de hashes das imagens, se configurado (gerado por card_hashing.py)
+if os.environ.get("CARD_HASH_INDEX_PATH"):
+    CardRecognition.use_hash_index(CardHashIndex.load(os.environ["CARD_HASH_INDEX_PATH"]))
+
 
 if __name__ == '__main__':
     # Exemplo de uso: alterar o caminho da imagem
@@ -0,0 +1,176 @@
+import re
+import heapq
+from array import array
+from collections import Counter
+from card_cache import CardCache
+
+# Confusões comuns do OCR, aplicadas tanto nos nomes quanto na consulta
+OCR_CONFUSIONS = [
+    ('rn', 'm'),
+    ('vv', 'w'),
+    ('0', 'o'),
+    ('1', 'l'),
+    ('|', 'l'),
+    ('!', 'l'),
+    ('i', 'l'),
+    ('5', 's'),
+    ('8', 'b'),
+]
+
+
+def ocr_normalize(text):
+    """
+    Normaliza um texto para comparação tolerante a erros de OCR:
+    minúsculas, sem acentos, confusões comuns unificadas e só letras/espaços.
+    """
+    text = CardCache.normalize_name(text)
+    for wrong, right in OCR_CONFUSIONS:
+        text = text.replace(wrong, right)
+    text = re.sub(r'[^a-z ]', '', text)
+    return ' '.join(text.split())
+
+
+def levenshtein(a, b):
+    """
+    Distância de edição entre duas strings.
+    Usa o algoritmo bit-paralelo de Myers/Hyyrö: cada caractere de `b`
+    é processado com poucas operações sobre inteiros, em vez de uma linha
+    inteira da matriz de programação dinâmica.
+    """
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+
+    # Máscara de posições de cada caractere em `a`
+    peq = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    all_ones = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    pv, mv, score = all_ones, 0, len(a)
+
+    for char in b:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & all_ones
+        mh = pv & xh
+
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+
+        ph = ((ph << 1) | 1) & all_ones
+        mh = (mh << 1) & all_ones
+        pv = (mh | ~(xv | ph)) & all_ones
+        mv = ph & xv
+
+    return score
+
+
+class FuzzyMatcher:
+    """
+    Busca aproximada de nomes de cartas com índice de trigramas.
+
+    1. Os trigramas da consulta selecionam candidatos (coeficiente de Dice)
+    2. Os melhores candidatos são reordenados pela distância de edição
+    """
+
+    def __init__(self, names, rerank=8, scan_budget=1000):
+        self.names = list(names)
+        self.rerank = rerank
+        self.scan_budget = scan_budget
+        self._normalized = [ocr_normalize(name) for name in self.names]
+        self._trigram_counts = array('H')
+
+        postings = {}
+        for position, name in enumerate(self._normalized):
+            trigrams = FuzzyMatcher._trigrams(name)
+            self._trigram_counts.append(min(len(trigrams), 65535))
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(position)
+
+        # Listas compactas de posições (array de inteiros sem sinal)
+        self._postings = {trigram: array('I', rows) for trigram, rows in postings.items()}
+
+        # Nomes normalizados idênticos resolvem sem cálculo
+        self._exact = {}
+        for position, name in enumerate(self._normalized):
+            self._exact.setdefault(name, position)
+
+    @staticmethod
+    def from_index(card_index):
+        """Cria o matcher com todos os nomes de um CardIndex."""
+        return FuzzyMatcher(card_index.names())
+
+    @staticmethod
+    def _trigrams(text):
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def match(self, query, limit=5):
+        """
+        Retorna até `limit` candidatos como lista de (nome, score),
+        ordenada do mais provável para o menos provável. Score vai de 0 a 1.
+        """
+        normalized = ocr_normalize(query)
+        if not normalized:
+            return []
+
+        exact = self._exact.get(normalized)
+        if exact is not None:
+            return [(self.names[exact], 1.0)]
+
+        trigrams = FuzzyMatcher._trigrams(normalized)
+        postings = sorted(
+            (self._postings[trigram] for trigram in trigrams if trigram in self._postings),
+            key=len
+        )
+
+        # Trigramas comuns (ex: ' th') pouco discriminam e custam caro:
+        # usa os mais raros primeiro e para quando já há evidência suficiente
+        minimum = max(3, len(postings) // 2)
+        counts = Counter()
+        scanned = 0
+        for used, rows in enumerate(postings):
+            if used >= minimum and scanned + len(rows) > self.scan_budget:
+                break
+            counts.update(rows)
+            scanned += len(rows)
+
+        if not counts:
+            return []
+
+        # Pré-seleção: mais trigramas em comum, depois coeficiente de Dice
+        query_size = len(trigrams)
+        trigram_counts = self._trigram_counts
+        shortlist = heapq.nlargest(
+            max(self.rerank, limit),
+            counts.most_common(max(self.rerank, limit) * 8),
+            key=lambda item: 2 * item[1] / (query_size + trigram_counts[item[0]])
+        )
+
+        # Reordenação pela distância de edição
+        results = []
+        for position, _ in shortlist:
+            candidate = self._normalized[position]
+            longest = max(len(candidate), len(normalized))
+            distance = levenshtein(normalized, candidate)
+            score = max(0.0, 1 - distance / longest)
+            results.append((self.names[position], score))
+
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:limit]
+
+    def best(self, query, min_score=0.75):
+        """
+        Retorna o nome mais provável ou None se nenhum candidato
+        for bom o suficiente.
+        """
+        candidates = self.match(query, limit=2)
+        if not candidates or candidates[0][1] < min_score:
+            return None
+        return candidates[0][0]
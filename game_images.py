@@ -0,0 +1,262 @@
+import os
+import hmac
+import time
+import uuid
+import fcntl
+import logging
+import hashlib
+import secrets
+from scryfall import Scryfall
+from game_store import GAME_TTL
+from image_utils import write_game_images
+from image_derivatives import ImageDerivatives
+
+logger = logging.getLogger(__name__)
+
+
+class GameImageStore:
+    """
+    Imagens do jogo endereçadas pelo conteúdo: o arquivo é definido pela
+    carta (e pelo raio do blur), então uma carta sorteada de novo reaproveita
+    as imagens já geradas.
+
+        static/game_images/original/<ab>/<chave>.jpg
+        static/game_images/blurred/<ab>/<chave>_<raio>.jpg
+        static/game_images/derived/<ab>/...   (tamanhos e formatos menores; ver image_derivatives)
+
+    A chave é um HMAC do ID da carta na Scryfall com um segredo do servidor:
+    a URL da imagem borrada não revela a carta (o ID levaria direto à resposta
+    do jogo). <ab> são os dois primeiros caracteres da chave, para nenhuma
+    pasta acumular dezenas de milhares de arquivos. A data de modificação marca o último
+    uso; a coleta de lixo (collect) apaga o que passou da idade máxima ou,
+    se o total passar do limite, o que foi usado há mais tempo.
+    """
+
+    def __init__(self, root='./static/game_images', static_prefix='game_images',
+                 max_bytes=500 * 1024 * 1024, max_age=3 * 24 * 3600, min_age=3600, gc_interval=600,
+                 derivatives=None, secret=None):
+        self.root = root
+        self.static_prefix = static_prefix
+        # Segredo dos nomes dos arquivos (o mesmo em todos os workers para reaproveitar as imagens)
+        self.secret = secret if secret is not None else secrets.token_bytes(32)
+        # Derivadas para srcset (None desativa)
+        self.derivatives = derivatives
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_age = min_age          # uso recente: pode ser de um jogo em andamento
+        self.gc_interval = gc_interval
+        self._last_gc = 0
+
+    @staticmethod
+    def from_env():
+        """
+        Cria o armazenamento a partir das variáveis de ambiente:
+        GAME_IMAGES_MAX_MB, GAME_IMAGES_MAX_AGE_HOURS, GAME_IMAGES_MIN_AGE_MINUTES
+        e GAME_IMAGES_SECRET (segredo dos nomes; sem ele, um segredo aleatório
+        é criado em GAME_IMAGES_SECRET_FILE, fora de static/).
+        A idade mínima nunca fica abaixo de GAME_TTL: um jogo salvo em qualquer
+        worker renova as imagens ao ser carregado (touch) e vive no máximo isso
+        sem atividade, então as imagens de um jogo em andamento não são apagadas.
+        """
+        secret = os.environ.get("GAME_IMAGES_SECRET")
+        return GameImageStore(
+            max_bytes=int(os.environ.get("GAME_IMAGES_MAX_MB", "500")) * 1024 * 1024,
+            max_age=float(os.environ.get("GAME_IMAGES_MAX_AGE_HOURS", "72")) * 3600,
+            min_age=max(float(os.environ.get("GAME_IMAGES_MIN_AGE_MINUTES", "60")) * 60, GAME_TTL),
+            derivatives=ImageDerivatives.from_env() if os.environ.get("IMAGE_DERIVATIVES", "1") != "0" else None,
+            secret=secret.encode() if secret else load_secret(
+                os.environ.get("GAME_IMAGES_SECRET_FILE", "./instance/game_images.key"))
+        )
+
+    # -------------------------------
+    # CAMINHOS
+    # -------------------------------
+
+    def _key(self, card_id):
+        # Valida e normaliza o ID; o nome do arquivo é o HMAC dele (não dá para voltar ao ID)
+        card_id = str(uuid.UUID(str(card_id)))
+        return hmac.new(self.secret, card_id.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def _relative_paths(self, card_id, radii):
+        key = self._key(card_id)
+        shard = key[:2]
+        original = f"original/{shard}/{key}.jpg"
+        blurred = {radius: f"blurred/{shard}/{key}_{radius}.jpg" for radius in radii}
+        return original, blurred
+
+    def _absolute(self, relative):
+        return os.path.join(self.root, *relative.split('/'))
+
+    def _static(self, relative):
+        return f"{self.static_prefix}/{relative}"
+
+    # -------------------------------
+    # USO
+    # -------------------------------
+
+    def ensure(self, card_id, image_url, radii):
+        """
+        Garante que as imagens da carta existem (baixando e borrando só se
+        faltar alguma) e marca o uso. Retorna os caminhos relativos a static/:
+        {'original': ..., 'blurred': [um por raio, na ordem de radii]}.
+        """
+        original, blurred = self._relative_paths(card_id, radii)
+        files = [self._absolute(original)] + [self._absolute(path) for path in blurred.values()]
+
+        if all(os.path.exists(path) for path in files):
+            self._touch(files)
+        else:
+            write_game_images(
+                Scryfall.download_image(image_url), files[0],
+                {radius: self._absolute(path) for radius, path in blurred.items()}
+            )
+
+        if self.derivatives is not None:
+            self._ensure_derivatives([original] + list(blurred.values()))
+
+        return {
+            'original': self._static(original),
+            'blurred': [self._static(blurred[radius]) for radius in radii]
+        }
+
+    def _ensure_derivatives(self, relatives):
+        """Gera as derivadas que faltam (imagens de antes delas ou apagadas pela coleta) e marca o uso das outras."""
+        for relative in relatives:
+            static_path = self._static(relative)
+            self.derivatives.forget(static_path)
+            files = self.derivatives.files(static_path)
+            if files:
+                self._touch(files)
+            else:
+                self.derivatives.generate(static_path)
+
+    def touch(self, card_id, radii):
+        """Marca as imagens de uma carta como usadas agora (ex: jogo iniciado)."""
+        original, blurred = self._relative_paths(card_id, radii)
+        relatives = [original] + list(blurred.values())
+        files = [self._absolute(path) for path in relatives]
+        if self.derivatives is not None:
+            for relative in relatives:
+                files.extend(self.derivatives.files(self._static(relative)))
+        self._touch(files)
+
+    @staticmethod
+    def _touch(files):
+        for path in files:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+
+    # -------------------------------
+    # COLETA DE LIXO
+    # -------------------------------
+
+    def _scan(self):
+        """Lista (último uso, tamanho, caminho) de todas as imagens."""
+        entries = []
+        stack = [os.path.join(self.root, folder) for folder in ('original', 'blurred', 'derived')]
+        while stack:
+            try:
+                iterator = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with iterator:
+                for entry in iterator:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    @staticmethod
+    def _card_key(path):
+        # <chave>.jpg, <chave>_<raio>.jpg ou derivadas <chave>[_<raio>].<hash>.<largura>.<ext>
+        return os.path.basename(path).split('_')[0].split('.')[0]
+
+    def collect(self, referenced=()):
+        """
+        Apaga imagens não referenciadas:
+        - sem uso há mais de max_age
+        - as de uso mais antigo, enquanto o total passar de max_bytes
+        Imagens de `referenced` (IDs de cartas) ou usadas há menos de
+        min_age nunca são apagadas. Só um processo coleta por vez.
+        Retorna {'deleted': arquivos, 'freed_bytes': ..., 'remaining_bytes': ...}.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '.gc.lock'), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None  # Outro worker já está coletando
+
+            now = time.time()
+            referenced = {self._key(card_id) for card_id in referenced}
+            entries = sorted(self._scan())
+            total = sum(size for _, size, _ in entries)
+            deleted, freed = 0, 0
+
+            for mtime, size, path in entries:
+                expired = now - mtime > self.max_age
+                if not expired and total - freed <= self.max_bytes:
+                    break  # Ordenado por último uso: o resto é mais recente
+                if now - mtime < self.min_age or GameImageStore._card_key(path) in referenced:
+                    continue
+
+                try:
+                    # Pode ter sido reutilizada depois da varredura
+                    if now - os.stat(path).st_mtime < self.min_age:
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                deleted += 1
+                freed += size
+
+            self._last_gc = now
+
+        if deleted:
+            logger.info("Game images GC: deleted %d files, freed %.1f MB", deleted, freed / (1024*1024))
+        return {'deleted': deleted, 'freed_bytes': freed, 'remaining_bytes': total - freed}
+
+    def maybe_collect(self, referenced=()):
+        """Executa collect() se já passou gc_interval desde a última coleta."""
+        if time.time() - self._last_gc >= self.gc_interval:
+            return self.collect(referenced)
+        return None
+
+    def stats(self):
+        """Quantidade de arquivos e espaço ocupado pelas imagens."""
+        entries = self._scan()
+        return {'files': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes}
+
+
+def load_secret(path):
+    """
+    Lê o segredo dos nomes das imagens em `path`, criando um aleatório na
+    primeira vez. A criação é atômica (link de um temporário): workers que
+    sobem juntos acabam todos com o mesmo segredo.
+    """
+    try:
+        with open(path, 'rb') as secret_file:
+            secret = secret_file.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.temp"
+    with open(os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as temp_file:
+        temp_file.write(secrets.token_hex(32).encode())
+    try:
+        os.link(temp_path, path)
+    except FileExistsError:
+        pass  # Outro worker criou primeiro: vale o dele
+    finally:
+        os.remove(temp_path)
+
+    with open(path, 'rb') as secret_file:
+        return secret_file.read().strip()
@@ -0,0 +1,186 @@
+import os
+import logging
+import time
+import threading
+from collections import deque
+from scryfall import Scryfall
+from game_images import GameImageStore
+
+logger = logging.getLogger(__name__)
+
+
+class GamePool:
+    """
+    Mantém um estoque de jogos prontos (carta sorteada + imagens original
+    e borrada já salvas em static/), reabastecido por uma thread em segundo
+    plano. Iniciar um jogo vira só retirar um item do estoque, sem chamadas
+    remotas na requisição.
+
+    A thread repõe o estoque até high_watermark sempre que ele cai abaixo
+    de low_watermark e, de tempos em tempos, apaga imagens antigas
+    (GameImageStore.collect).
+    """
+
+    # Raios de blur, do mais forte ao mais fraco: cada palpite errado revela
+    # o próximo nível (GAME_BLUR_LEVELS=16,8,4 por exemplo)
+    BLUR_LEVELS = [int(radius) for radius in os.environ.get("GAME_BLUR_LEVELS", "8").split(',')]
+
+    def __init__(self, low_watermark=2, high_watermark=6, images=None):
+        self.low_watermark = low_watermark
+        self.high_watermark = max(high_watermark, low_watermark)
+        self.images = images or GameImageStore()
+
+        self._games = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+
+        self._stats = {'served_from_pool': 0, 'served_on_demand': 0, 'prepared': 0, 'failed': 0}
+
+    @staticmethod
+    def from_env():
+        """
+        Cria o estoque a partir das variáveis de ambiente:
+        GAME_POOL_LOW e GAME_POOL_HIGH (e as de GameImageStore.from_env).
+        """
+        return GamePool(
+            low_watermark=int(os.environ.get("GAME_POOL_LOW", "2")),
+            high_watermark=int(os.environ.get("GAME_POOL_HIGH", "6")),
+            images=GameImageStore.from_env()
+        )
+
+    def prepare_game(self):
+        """
+        Sorteia uma carta e gera (ou reaproveita) suas imagens original e borradas.
+        Retorna o jogo (nome da carta e caminhos relativos a static/) ou None.
+        """
+        card_data = Scryfall.get_random_card()
+
+        if card_data == "Not found" or 'image_uris' not in card_data:
+            return None
+
+        try:
+            paths = self.images.ensure(card_data['id'], card_data['image_uris']['large'], GamePool.BLUR_LEVELS)
+        except Exception as e:
+            logger.warning("Error processing game image: %s", e)
+            return None
+
+        return {
+            # Usado para jogos (nome antes da vírgula)
+            'card_name': card_data['name'].split(',')[0].strip(),
+            'card_id': card_data['id'],
+            'image_path': paths['blurred'][0],
+            'image_paths': paths['blurred'],
+            'image_path_original': paths['original']
+        }
+
+    # -------------------------------
+    # THREAD DE REABASTECIMENTO
+    # -------------------------------
+
+    def start(self):
+        """Inicia a thread de reabastecimento (uma por processo/worker do gunicorn)."""
+        pid = os.getpid()
+        if self._thread_pid == pid:
+            return
+
+        with self._lock:
+            if self._thread_pid != pid:
+                # Jogos herdados de outro processo continuam válidos (arquivos em disco)
+                self._wake = threading.Event()
+                self._thread = threading.Thread(target=self._refill_loop, name='game-pool', daemon=True)
+                self._thread_pid = pid
+                self._thread.start()
+                self._wake.set()
+
+    def _refill_loop(self):
+        failures = 0
+        while True:
+            self._wake.wait(timeout=self.images.gc_interval)
+            self._wake.clear()
+
+            while len(self._games) < self.high_watermark:
+                try:
+                    game = self.prepare_game()
+                except Exception as e:
+                    logger.warning("Error preparing game: %s", e)
+                    game = None
+
+                with self._lock:
+                    if game is None:
+                        self._stats['failed'] += 1
+                    else:
+                        self._stats['prepared'] += 1
+                        self._games.append(game)
+
+                if game is None:
+                    # Scryfall fora do ar: espera cada vez mais antes de tentar de novo
+                    failures += 1
+                    time.sleep(min(60, 2 ** failures))
+                else:
+                    failures = 0
+
+            # Jogos no estoque ainda vão ser servidos: suas imagens não podem sair
+            try:
+                self.images.maybe_collect(self.card_ids())
+            except Exception as e:
+                logger.warning("Error collecting game images: %s", e)
+
+    # -------------------------------
+    # USO
+    # -------------------------------
+
+    def pop(self):
+        """
+        Retira um jogo pronto do estoque (ou None se estiver vazio)
+        e acorda a thread se o estoque ficou abaixo do mínimo.
+        """
+        self.start()
+
+        with self._lock:
+            game = self._games.popleft() if self._games else None
+            if game is not None:
+                self._stats['served_from_pool'] += 1
+            remaining = len(self._games)
+
+        if remaining < self.low_watermark:
+            self._wake.set()
+        if game is not None:
+            # Marca o uso: o jogo começa agora, as imagens não podem ser coletadas
+            self.images.touch(game['card_id'], GamePool.BLUR_LEVELS)
+        return game
+
+    def get_game(self):
+        """
+        Jogo pronto do estoque; se estiver vazio, prepara um na hora.
+        """
+        game = self.pop()
+        if game is None:
+            game = self.prepare_game()
+            if game is not None:
+                with self._lock:
+                    self._stats['served_on_demand'] += 1
+        return game
+
+    def touch_game(self, game_state):
+        """
+        Marca as imagens de um jogo salvo como usadas agora. Chamado sempre
+        que o jogo é carregado, em qualquer worker: enquanto o jogo existir no
+        estoque de estado (GAME_TTL sem atividade), a coleta não apaga as imagens.
+        """
+        if game_state is not None and game_state.get('card_id'):
+            self.images.touch(game_state['card_id'], GamePool.BLUR_LEVELS)
+
+    def card_ids(self):
+        """IDs das cartas dos jogos no estoque."""
+        with self._lock:
+            return [game['card_id'] for game in self._games]
+
+    def stats(self):
+        """Tamanho atual do estoque, contadores neste processo e uso de disco das imagens."""
+        with self._lock:
+            stats = dict(self._stats, ready=len(self._games),
+                         low_watermark=self.low_watermark, high_watermark=self.high_watermark)
+        stats['images'] = self.images.stats()
+        return stats
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+# Tempo sem atividade até um jogo expirar (renovado a cada jogada)
+GAME_TTL = float(os.environ.get("GAME_TTL_HOURS", "24")) * 3600
+
+
+# -------------------------------------------------------------------
+# ARMAZENAMENTO DO ESTADO DOS JOGOS
+# -------------------------------------------------------------------
+class MemoryGameStore:
+    """
+    Guarda os jogos em memória (válido só para o processo que os criou).
+    """
+
+    def __init__(self, ttl=GAME_TTL):
+        self.ttl = ttl
+        self._games = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, game_id):
+        with self._lock:
+            entry = self._games.get(game_id)
+            if entry is None:
+                return None
+            expires, data = entry
+            if expires < time.time():
+                del self._games[game_id]
+                return None
+            return json.loads(data)
+
+    def save(self, game_id, state):
+        with self._lock:
+            # Serializado: quem lê recebe uma cópia independente
+            self._games[game_id] = (time.time() + self.ttl, json.dumps(state))
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune()
+
+    def delete(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def _prune(self):
+        now = time.time()
+        for game_id in [game_id for game_id, (expires, _) in self._games.items() if expires < now]:
+            del self._games[game_id]
+
+
+class SQLiteGameStore:
+    """
+    Guarda os jogos em um arquivo SQLite, compartilhado por todos os
+    workers do gunicorn da mesma máquina.
+    """
+
+    def __init__(self, db_path, ttl=GAME_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        conn = self._db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS games (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS games_expires_at ON games (expires_at)")
+
+    def _db(self):
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != pid:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def get(self, game_id):
+        row = self._db().execute(
+            "SELECT data FROM games WHERE id = ? AND expires_at >= ?", (game_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, game_id, state):
+        conn = self._db()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO games (id, data, expires_at) VALUES (?, ?, ?)",
+                (game_id, json.dumps(state), time.time() + self.ttl)
+            )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % 100 == 0
+            if prune:
+                conn.execute("DELETE FROM games WHERE expires_at < ?", (time.time(),))
+
+    def delete(self, game_id):
+        conn = self._db()
+        with conn:
+            conn.execute("DELETE FROM games WHERE id = ?", (game_id,))
+
+
+class RedisGameStore:
+    """
+    Guarda os jogos no Redis (ou em qualquer servidor compatível), com a
+    expiração feita pelo próprio servidor. Requer o pacote `redis`.
+    """
+
+    def __init__(self, url, ttl=GAME_TTL, prefix='game:'):
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        # O cliente mantém um pool de conexões próprio (seguro entre threads)
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, game_id):
+        data = self._client.get(self.prefix + game_id)
+        return json.loads(data) if data else None
+
+    def save(self, game_id, state):
+        self._client.set(self.prefix + game_id, json.dumps(state), ex=int(self.ttl))
+
+    def delete(self, game_id):
+        self._client.delete(self.prefix + game_id)
+
+
+def store_from_env(default_db_path='games.db'):
+    """
+    Cria o armazenamento definido pelas variáveis de ambiente:
+    GAME_STORE_REDIS_URL (Redis), senão SQLite em GAME_STORE_DB (padrão:
+    `default_db_path`), visível para todos os workers da máquina.
+    GAME_STORE=memory guarda os jogos só no processo (um único worker).
+    """
+    if os.environ.get("GAME_STORE_REDIS_URL"):
+        return RedisGameStore(os.environ["GAME_STORE_REDIS_URL"])
+    if os.environ.get("GAME_STORE", "sqlite") == "memory":
+        return MemoryGameStore()
+    return SQLiteGameStore(os.environ.get("GAME_STORE_DB") or default_db_path)
+
+
+# -------------------------------------------------------------------
+# REGRAS DO JOGO (compartilhadas pelas páginas e pela API JSON)
+# -------------------------------------------------------------------
+def new_game_state(game, static_url, max_attempts=5):
+    """
+    Estado inicial de um jogo preparado pelo GamePool.
+    `static_url` converte um caminho relativo a static/ em URL.
+    """
+    return {
+        'card_name': game['card_name'],
+        'card_id': game['card_id'],  # Só no servidor: renova as imagens (GamePool.touch_game)
+        'word_length': len(game['card_name']),
+        'image_url': static_url(game['image_path']),
+        'image_urls': [static_url(path) for path in game['image_paths']],
+        'image_url_original': static_url(game['image_path_original']),
+        'attempts': 0,
+        'max_attempts': max_attempts,
+        'guesses': [],
+        'game_over': False,
+        'win': False
+    }
+
+
+def apply_guess(game_state, guess):
+    """
+    Registra um palpite no estado do jogo.
+    Retorna 'win', 'lose' (acabaram as tentativas) ou 'wrong'.
+    """
+    game_state['guesses'].append(guess)
+    game_state['attempts'] += 1
+
+    if guess.lower() == game_state['card_name'].lower():
+        game_state['win'] = True
+        game_state['game_over'] = True
+        return 'win'
+
+    if game_state['attempts'] >= game_state['max_attempts']:
+        game_state['game_over'] = True
+        return 'lose'
+    return 'wrong'
+
+
+def load_session_game(session, store):
+    """
+    Estado do jogo da sessão (cookie), guardado no servidor: o cookie só leva o ID.
+    Jogos antigos, que ficavam inteiros no cookie, são migrados uma única vez.
+    Funciona com a sessão do Flask e a do Quart.
+    """
+    if 'game_state' in session:
+        game_state = session.pop('game_state')
+
+        # Compatibilidade com versões anteriores
+        if 'word_length' not in game_state:
+            game_state['word_length'] = len(game_state['card_name'])
+
+        # Compatibilidade para imagem original
+        if 'image_url_original' not in game_state:
+            game_state['image_url_original'] = game_state['image_url'].replace('blurred', 'original')
+
+        save_session_game(session, store, game_state)
+        return game_state
+
+    game_id = session.get('game_id')
+    return store.get(game_id) if game_id else None
+
+
+def save_session_game(session, store, game_state):
+    """Grava o estado do jogo, criando um ID opaco para o cookie se necessário."""
+    if 'game_id' not in session:
+        session['game_id'] = uuid.uuid4().hex
+    store.save(session['game_id'], game_state)
+
+
+def reset_session_game(session, store):
+    """Descarta o jogo atual da sessão (o próximo ganha um novo ID)."""
+    session.pop('game_state', None)
+    if 'game_id' in session:
+        store.delete(session.pop('game_id'))
+
+
+def current_blur_level(game_state):
+    """
+    Imagem borrada a exibir: com vários níveis de blur, cada palpite
+    errado revela o próximo nível (menos borrado).
+    """
+    image_urls = game_state.get('image_urls')
+    if not image_urls:
+        return game_state['image_url']
+    return image_urls[min(game_state['attempts'], len(image_urls) - 1)]
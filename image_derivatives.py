@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from PIL import Image, features
+from image_utils import convert_to_rgb, _write_atomic
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Codificadores por formato: (formato do Pillow, tipo MIME, extensão, opções do save)
+ENCODERS = {
+    'avif': ('AVIF', 'image/avif', 'avif', {'quality': 60, 'speed': 8}),
+    'webp': ('WEBP', 'image/webp', 'webp', {'quality': 80, 'method': 2}),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg', {'quality': 80, 'progressive': True, 'optimize': True}),
+}
+
+# Nome das derivadas: <nome da origem>.<hash do conteúdo>.<largura>.<extensão>
+DERIVED_NAME = re.compile(r'\.[0-9a-f]{16}\.\d+\.(?:avif|webp|jpg)$')
+
+# Cache-Control das derivadas: a URL muda quando o conteúdo muda
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class ImageDerivatives:
+    """
+    Versões menores das imagens servidas em static/ (miniatura e média, além
+    da largura original) em AVIF, WebP e JPEG progressivo, para srcset e
+    <picture>. Cada derivada leva o hash do conteúdo da origem no nome, então
+    pode ser servida com cache imutável (ou por uma CDN, IMAGE_CDN_URL):
+
+        static/game_images/blurred/ab/<chave>_8.jpg              (origem)
+        static/game_images/derived/ab/<chave>_8.<hash>.488.webp  (derivada)
+        static/game_images/derived/ab/<chave>_8.json             (manifesto)
+
+    O manifesto lista as derivadas de cada origem; as páginas o consultam
+    (com cache em memória) para montar os srcset.
+    """
+
+    def __init__(self, static_root='./static', folder='game_images/derived', widths=(244, 488),
+                 formats=('avif', 'webp', 'jpeg'), cdn_url='', cache_size=1024):
+        self.static_root = static_root
+        self.folder = folder
+        self.widths = tuple(sorted(widths))
+        # Formatos sem suporte no Pillow instalado (ex: AVIF) são ignorados
+        self.formats = [name for name in formats if name == 'jpeg' or features.check(name)]
+        self.cdn_url = cdn_url.rstrip('/')
+        self.cache_size = cache_size
+        self._manifests = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_env(static_root='./static'):
+        """
+        Cria o serviço (para as imagens em `static_root`) a partir das variáveis de ambiente:
+        IMAGE_DERIVATIVE_WIDTHS (ex: 244,488), IMAGE_DERIVATIVE_FORMATS
+        (ex: avif,webp,jpeg) e IMAGE_CDN_URL (host das derivadas, opcional).
+        """
+        return ImageDerivatives(
+            static_root=static_root,
+            widths=[int(width) for width in os.environ.get("IMAGE_DERIVATIVE_WIDTHS", "244,488").split(',')],
+            formats=[name.strip().lower() for name in os.environ.get("IMAGE_DERIVATIVE_FORMATS", "avif,webp,jpeg").split(',')],
+            cdn_url=os.environ.get("IMAGE_CDN_URL", "")
+        )
+
+    # -------------------------------
+    # CAMINHOS
+    # -------------------------------
+
+    def _absolute(self, relative):
+        return os.path.join(self.static_root, *relative.split('/'))
+
+    def _derived_base(self, relative):
+        # Mesma subpasta (shard) e nome da origem, sem a extensão: a derivada
+        # não revela mais que a origem (ex: a chave HMAC das imagens do jogo)
+        parts = relative.split('/')
+        name = os.path.splitext(parts[-1])[0]
+        return '/'.join([self.folder] + parts[-2:-1] + [name])
+
+    def _manifest_path(self, relative):
+        return self._absolute(self._derived_base(relative) + '.json')
+
+    @staticmethod
+    def is_derived(path):
+        """Se o caminho/URL é de uma derivada (com hash do conteúdo: pode ter cache imutável)."""
+        return DERIVED_NAME.search(path) is not None
+
+    # -------------------------------
+    # GERAÇÃO
+    # -------------------------------
+
+    def generate(self, relative):
+        """
+        Gera as derivadas da imagem em static/<relative> e grava o manifesto.
+        Larguras maiores que a original são puladas; a original entra sempre.
+        Retorna o manifesto: {'width', 'height', 'variants': {formato: [[largura, caminho], ...]}}.
+        """
+        with open(self._absolute(relative), 'rb') as source_file:
+            content = source_file.read()
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        base = self._derived_base(relative)
+
+        with metrics.span('derivatives'):
+            with Image.open(BytesIO(content)) as source:
+                img = convert_to_rgb(source)
+                width, height = img.size
+                widths = [target for target in self.widths if target < width] + [width]
+
+                variants = {name: [] for name in self.formats}
+                bytes_out = 0
+                for target in widths:
+                    resized = img if target == width else img.resize(
+                        (target, max(1, round(height * target / width))), Image.LANCZOS)
+                    for name in self.formats:
+                        image_format, _, extension, options = ENCODERS[name]
+                        path = f"{base}.{digest}.{target}.{extension}"
+                        buffer = BytesIO()
+                        resized.save(buffer, image_format, **options)
+                        absolute = self._absolute(path)
+                        os.makedirs(os.path.dirname(absolute), exist_ok=True)
+                        _write_atomic(absolute, buffer.getvalue())
+                        bytes_out += buffer.tell()
+                        variants[name].append([target, path])
+
+        manifest = {'source': relative, 'hash': digest, 'width': width, 'height': height, 'variants': variants}
+        _write_atomic(self._manifest_path(relative), json.dumps(manifest).encode())
+        metrics.count_image_bytes('derivatives', len(content), bytes_out)
+        logger.debug("Derivatives of %s: %d files, %.0f KB", relative,
+                     sum(len(paths) for paths in variants.values()), bytes_out / 1024)
+
+        with self._lock:
+            self._manifests[relative] = manifest
+            self._manifests.move_to_end(relative)
+            while len(self._manifests) > self.cache_size:
+                self._manifests.popitem(last=False)
+        return manifest
+
+    # -------------------------------
+    # CONSULTA
+    # -------------------------------
+
+    def manifest(self, relative):
+        """Manifesto das derivadas de static/<relative> (ou None se ainda não foram geradas)."""
+        with self._lock:
+            manifest = self._manifests.get(relative)
+            if manifest is not None:
+                self._manifests.move_to_end(relative)
+                return manifest
+
+        try:
+            with open(self._manifest_path(relative)) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # Derivadas apagadas pela coleta de lixo: o manifesto não vale mais
+        if not all(os.path.exists(self._absolute(path))
+                   for variants in manifest['variants'].values() for _, path in variants):
+            return None
+
+        with self._lock:
+            self._manifests[relative] = manifest
+            while len(self._manifests) > self.cache_size:
+                self._manifests.popitem(last=False)
+        return manifest
+
+    def files(self, relative):
+        """Caminhos absolutos do manifesto e das derivadas (para marcar uso)."""
+        manifest = self.manifest(relative)
+        if manifest is None:
+            return []
+        return [self._manifest_path(relative)] + [self._absolute(path) for variants in manifest['variants'].values()
+                                                  for _, path in variants]
+
+    def forget(self, relative):
+        """Descarta o manifesto em cache (ex: derivadas apagadas)."""
+        with self._lock:
+            self._manifests.pop(relative, None)
+
+    def sources(self, relative, static_url):
+        """
+        Dados para um <picture>: {'src', 'width', 'height', 'sources': [{'type', 'srcset'}]},
+        com o JPEG progressivo na largura original como src de fallback.
+        `static_url` converte um caminho relativo a static/ em URL (ex: url_for).
+        Retorna None se as derivadas ainda não existem.
+        """
+        manifest = self.manifest(relative)
+        if manifest is None:
+            return None
+
+        def url(path):
+            return f"{self.cdn_url}/{path}" if self.cdn_url else static_url(path)
+
+        sources = []
+        for name, variants in manifest['variants'].items():
+            sources.append({
+                'type': ENCODERS[name][1],
+                'srcset': ', '.join(f"{url(path)} {width}w" for width, path in variants)
+            })
+
+        fallback = manifest['variants'].get('jpeg') or next(iter(manifest['variants'].values()))
+        return {'src': url(fallback[-1][1]), 'width': manifest['width'], 'height': manifest['height'],
+                'sources': sources}
+
+    def sources_for_url(self, url, static_url):
+        """
+        Igual a sources(), a partir da URL da imagem de origem (ex: a guardada
+        no estado do jogo). Retorna None se a URL não for de static/.
+        """
+        prefix = static_url('')
+        if not url or not url.startswith(prefix):
+            return None
+        return self.sources(url[len(prefix):], static_url)
@@ -1,94 +1,118 @@
 import requests
 from PIL import Image, ImageFilter
 import os
+import threading
 from io import BytesIO
 from pillow_heif import register_heif_opener
-import uuid
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
 
 # Permite que o Pillow abra arquivos HEIC/HEIF (iPhone)
 register_heif_opener()
 
 # -------------------------------------------------------------------
-# FUNÇÃO PARA BAIXAR IMAGEM DE UMA URL E SALVAR LOCALMENTE
+# FUNÇÃO QUE BAIXA UMA IMAGEM E JÁ APLICA BLUR (UMA ÚNICA DECODIFICAÇÃO)
 # -------------------------------------------------------------------
-def download_image(image_url, filename, download_path='./static/game_images/original/'):
-    try:
-        # Faz o download da imagem
-        response = requests.get(image_url)
-        response.raise_for_status()
 
-        # Abre a imagem baixada em memória
-        img = Image.open(BytesIO(response.content))
+# Menor escala usada para borrar (1 = sempre na resolução original, o padrão).
+# Modo opcional: o blur remove os detalhes finos, então borrar uma cópia
+# reduzida (ex: BLUR_SCALE=0.125) e ampliar de volta dá quase o mesmo
+# resultado por uma fração do custo, com um leve serrilhado nas bordas
+BLUR_SCALE = float(os.environ.get("BLUR_SCALE", "1"))
 
-        # Converte para RGB caso tenha transparência (ex.: PNG, HEIC)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
 
-        # Gera um UUID (não está sendo usado na prática)
-        card_save = uuid.uuid4()
+def blur_levels(img: Image.Image, radii, scale=BLUR_SCALE):
+    """
+    Gera uma versão borrada da imagem para cada raio, todas a partir da
+    mesma imagem já decodificada. Retorna {raio: imagem}.
+    Cada nível é borrado numa cópia reduzida por um fator inteiro, escolhido
+    para que o raio na cópia ainda seja de pelo menos 2 pixels.
+    """
+    max_factor = max(1, int(1 / scale))
+    reduced = {1: img}
+    levels = {}
+    for radius in radii:
+        factor = max(1, min(max_factor, int(radius // 2)))
+        if factor not in reduced:
+            # reduce() tira a média de blocos factor x factor (rápido e sem serrilhado)
+            reduced[factor] = img.reduce(factor)
+
+        blurred = reduced[factor].filter(ImageFilter.GaussianBlur(radius / factor))
+        if factor > 1:
+            # A imagem já está borrada: a interpolação bilinear basta para ampliar
+            blurred = blurred.resize(img.size, Image.BILINEAR)
+        levels[radius] = blurred
+    return levels
+
+
+def _write_atomic(path, data):
+    # Grava em um temporário e renomeia: quem lê nunca vê um arquivo pela metade
+    temp_path = path + ".temp"
+    with open(temp_path, 'wb') as output_file:
+        output_file.write(data)
+    os.replace(temp_path, path)
+
+
+def write_game_images(content, original_file, blurred_files, blur_scale=BLUR_SCALE):
+    """
+    Decodifica a imagem baixada (`content`) uma única vez e grava o original
+    em original_file e cada nível de blur em blurred_files ({raio: caminho}).
+    O original usa os próprios bytes baixados quando já é JPEG (sem recomprimir).
+    """
+    img = Image.open(BytesIO(content))
+    is_jpeg = img.format == 'JPEG'
+    img = convert_to_rgb(img)
 
-        # Garante que o diretório existe
-        os.makedirs(download_path, exist_ok=True)
+    # Original: os próprios bytes baixados quando já é JPEG
+    if is_jpeg:
+        outputs = {original_file: content}
+    else:
+        buffer = BytesIO()
+        img.save(buffer, 'JPEG')
+        outputs = {original_file: buffer.getvalue()}
 
-        # Caminho final para salvar a imagem original
-        full_path = os.path.join(download_path, filename)
+    for radius, blurred_img in blur_levels(img, list(blurred_files), blur_scale).items():
+        buffer = BytesIO()
+        blurred_img.save(buffer, 'JPEG')
+        outputs[blurred_files[radius]] = buffer.getvalue()
 
-        # Salva a imagem como JPEG
-        img.save(full_path, 'JPEG')
+    for path, data in outputs.items():
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        _write_atomic(path, data)
 
-        return True
-    except Exception as e:
-        print(f"Error downloading image: {e}")
-        return False
+    metrics.count_image_bytes('game_images', len(content), sum(len(data) for data in outputs.values()))
 
 
-# -------------------------------------------------------------------
-# FUNÇÃO PARA APLICAR BLUR EM UMA IMAGEM LOCAL
-# -------------------------------------------------------------------
-def blur_image(filename, blur_radius, image_path='./static/game_images/original/', output_path='./static/game_images/blurred/'):
+def download_and_blur_image(image_url, filename, blur_radius=8, extra_radii=(),
+                            original_path='./static/game_images/original/',
+                            blurred_path='./static/game_images/blurred/',
+                            blur_scale=BLUR_SCALE):
+    """
+    Baixa uma imagem, aplica desfoque e salva no diretório correto.
+    A imagem é decodificada uma única vez (ver write_game_images).
+    O blur principal vai para blurred_path/filename e cada raio extra
+    (ex: níveis para revelar a carta aos poucos) para
+    blurred_path/<nome>_<raio>.jpg.
+    """
     try:
-        # Caminho completo do arquivo de entrada
-        input_full_path = os.path.join(image_path, filename)
-
-        # Abre a imagem
-        img = Image.open(input_full_path)
-
-        # Garante que a imagem está em RGB para salvar como JPEG
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-
-        # Aplica o filtro de desfoque Gaussiano
-        blurred_img = img.filter(ImageFilter.GaussianBlur(blur_radius))
-
-        # Garante que o diretório de saída existe
-        os.makedirs(output_path, exist_ok=True)
-
-        # Caminho completo do arquivo de saída
-        output_full_path = os.path.join(output_path, filename)
+        # Faz o download da imagem
+        response = requests.get(image_url, timeout=(3.05, 15))
+        response.raise_for_status()
 
-        # Salva imagem borrada
-        blurred_img.save(output_full_path, 'JPEG')
+        stem = os.path.splitext(filename)[0]
+        blurred_files = {blur_radius: os.path.join(blurred_path, filename)}
+        for radius in extra_radii:
+            blurred_files[radius] = os.path.join(blurred_path, f"{stem}_{radius}.jpg")
 
+        write_game_images(response.content, os.path.join(original_path, filename), blurred_files, blur_scale)
         return True
     except Exception as e:
-        print(f"Error processing image: {e}")
+        logger.warning("Error processing image: %s", e)
         return False
 
 
-# -------------------------------------------------------------------
-# FUNÇÃO QUE BAIXA UMA IMAGEM E JÁ APLICA BLUR
-# -------------------------------------------------------------------
-def download_and_blur_image(image_url, filename, blur_radius=8):
-    """
-    Baixa uma imagem, aplica desfoque e salva no diretório correto.
-    """
-    if download_image(image_url, filename=filename):
-        if blur_image(filename, blur_radius):
-            return True
-    
-    return False
-
-
 # -------------------------------------------------------------------
 # 1. FUNÇÃO: REDIMENSIONAMENTO DE IMAGEM (RESIZE)
 # -------------------------------------------------------------------
@@ -107,15 +131,89 @@ def resize_image(img: Image.Image, max_resolution: tuple[int, int]) -> Image.Ima
         new_width = int(original_width * ratio)
         new_height = int(original_height * ratio)
 
-        # Redimensionamento de alta qualidade
-        img = img.resize((new_width, new_height), Image.LANCZOS)  # type: ignore
-        print(f"-> Redimensionado para: {img.size}")
+        # Redimensionamento de alta qualidade. O reducing_gap faz uma redução
+        # inteira (rápida) antes do LANCZOS quando a imagem é bem maior que o alvo
+        img = img.resize((new_width, new_height), Image.LANCZOS, reducing_gap=3.0)  # type: ignore
+        logger.debug("-> Redimensionado para: %s", img.size)
     else:
-        print("-> Imagem já está dentro da resolução máxima, sem redimensionamento.")
+        logger.debug("-> Imagem já está dentro da resolução máxima, sem redimensionamento.")
 
     return img
 
 
+# -------------------------------------------------------------------
+# 1.1 DECODIFICAÇÃO REDUZIDA E LIMITE DE MEMÓRIA
+# -------------------------------------------------------------------
+
+# Máximo de memória (bytes de pixels) que uma única imagem pode ocupar decodificada
+MAX_DECODE_BYTES = int(os.environ.get("MAX_DECODE_BYTES", str(192 * 1024 * 1024)))
+
+# Orçamento total de memória para decodificações simultâneas neste processo
+DECODE_BUDGET_BYTES = int(os.environ.get("DECODE_BUDGET_BYTES", str(384 * 1024 * 1024)))
+
+
+class ImageTooLargeError(ValueError):
+    """Lançada quando a imagem decodificada passaria do limite de memória."""
+
+
+class DecodeBudget:
+    """
+    Semáforo por quantidade de bytes: várias threads decodificando ao mesmo
+    tempo esperam até haver memória livre no orçamento, em vez de todas
+    alocarem imagens enormes de uma vez.
+    """
+
+    def __init__(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.available = total_bytes
+        self._condition = threading.Condition()
+
+    def acquire(self, amount, timeout=30):
+        amount = min(amount, self.total_bytes)
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.available >= amount, timeout=timeout):
+                raise ImageTooLargeError("Timed out waiting for image decode memory")
+            self.available -= amount
+        return amount
+
+    def release(self, amount):
+        with self._condition:
+            self.available += amount
+            self._condition.notify_all()
+
+
+decode_budget = DecodeBudget(DECODE_BUDGET_BYTES)
+
+
+def open_for_resize(source, max_resolution: tuple[int, int], formats=None) -> Image.Image:
+    """
+    Abre a imagem sem decodificar e, quando o alvo é bem menor que o original,
+    pede uma decodificação reduzida:
+    - JPEG: modo draft (o decodificador já entrega 1/2, 1/4 ou 1/8 da resolução)
+    - HEIC: usa uma miniatura embutida se ela for grande o suficiente
+    `formats` (ex: ['JPEG'], já identificado pelos magic bytes) evita testar os outros formatos.
+    """
+    img = Image.open(source, formats=formats)
+    original_width, original_height = img.size
+    target_width, target_height = max_resolution
+    ratio = min(target_width / original_width, target_height / original_height)
+
+    if ratio < 1:
+        requested = (max(1, int(original_width * ratio)), max(1, int(original_height * ratio)))
+        # O draft escolhe a menor escala que ainda seja >= ao tamanho pedido
+        img.draft('RGB', requested)
+        if img.size != (original_width, original_height):
+            logger.debug("-> Decodificação reduzida: %dx%d -> %s", original_width, original_height, img.size)
+
+    return img
+
+
+def estimate_decode_bytes(img: Image.Image) -> int:
+    """Memória aproximada da imagem decodificada (antes de qualquer conversão)."""
+    width, height = img.size
+    return width * height * max(len(img.getbands()), 3)
+
+
 # -------------------------------------------------------------------
 # 2. FUNÇÃO: CONVERSÃO PARA RGB (IMPORTANTE PARA JPEG)
 # -------------------------------------------------------------------
@@ -125,12 +223,134 @@ def convert_to_rgb(img: Image.Image) -> Image.Image:
     """
     if img.mode != 'RGB':
         img = img.convert('RGB')
-        print("-> Convertido para modo RGB (removendo transparência se houver).")
+        logger.debug("-> Convertido para modo RGB (removendo transparência se houver).")
     return img
 
 
 # -------------------------------------------------------------------
-# 3. FUNÇÃO PRINCIPAL: PROCESSAMENTO + COMPRESSÃO FINAL
+# 3. FUNÇÃO: COMPRESSÃO EM MEMÓRIA (BUSCA BINÁRIA DA QUALIDADE)
+# -------------------------------------------------------------------
+
+# Qualidades testadas, da maior para a menor (mesma escala de antes: 100 a 10, de 5 em 5)
+JPEG_QUALITIES = list(range(100, 9, -5))
+
+# Buffer reaproveitado por thread para as tentativas de compressão
+_buffers = threading.local()
+
+
+def _get_buffer() -> BytesIO:
+    buffer = getattr(_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = _buffers.buffer = BytesIO()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return buffer
+
+
+def compress_to_jpeg(img: Image.Image, max_bytes: int) -> tuple[bytes, int]:
+    """
+    Codifica a imagem como JPEG com a maior qualidade que caiba em max_bytes.
+    Testa primeiro a qualidade 95 (e, se couber, a 100) e senão faz busca
+    binária nas menores, em vez de testar todas as qualidades em sequência:
+    2 codificações no caso comum e no máximo 6.
+    Retorna (bytes do JPEG, qualidade usada).
+    """
+    def encode(quality):
+        buffer = _get_buffer()
+        img.save(buffer, format='JPEG', quality=quality)
+        return buffer.getvalue()
+
+    # Caso comum (fotos já reduzidas para 1920x1080): 95 cabe; falta só saber se 100 também
+    data = encode(JPEG_QUALITIES[1])
+    if len(data) <= max_bytes:
+        best = encode(JPEG_QUALITIES[0])
+        if len(best) <= max_bytes:
+            return best, JPEG_QUALITIES[0]
+        return data, JPEG_QUALITIES[1]
+
+    # Busca binária pela maior qualidade que cabe (tamanho decresce com a qualidade)
+    best = None
+    smallest = None
+    low, high = 2, len(JPEG_QUALITIES) - 1
+    while low <= high:
+        middle = (low + high) // 2
+        candidate = encode(JPEG_QUALITIES[middle])
+        if len(candidate) <= max_bytes:
+            best = (candidate, JPEG_QUALITIES[middle])
+            high = middle - 1
+        else:
+            # Sem nenhuma qualidade que caiba, a última tentativa é a de menor qualidade
+            smallest = (candidate, JPEG_QUALITIES[middle])
+            low = middle + 1
+
+    # Nem a menor qualidade coube: devolve a menor mesmo assim (já codificada)
+    return best if best is not None else smallest
+
+
+def _source_size(source) -> int:
+    """Tamanho em bytes da imagem de entrada (caminho, bytes ou objeto de arquivo)."""
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    # Sem fileno(): num SpooledTemporaryFile ele grava o upload em disco
+    try:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return 0
+
+
+def process_image_to_bytes(source, max_resolution: tuple[int, int] = (1920, 1080),
+                           max_bytes: int = 1024 * 1024, formats=None) -> bytes:
+    """
+    Redimensiona, converte e comprime uma imagem inteiramente em memória.
+    `source` pode ser um caminho, bytes ou um objeto de arquivo; `formats`
+    restringe os formatos que o Pillow tenta (ver upload_stream.sniff_image_format).
+    Retorna os bytes do JPEG final (sem gravar nada em disco).
+    """
+    bytes_in = _source_size(source) if metrics.ENABLED else 0
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    with open_for_resize(source, max_resolution, formats) as original:
+        logger.debug("Arquivo Original: %s, Dimensões: %s", original.format, original.size)
+
+        # Recusa imagens que estourariam o limite de memória por requisição
+        needed = estimate_decode_bytes(original)
+        if needed > MAX_DECODE_BYTES:
+            raise ImageTooLargeError(
+                f"Image needs {needed / (1024*1024):.0f} MB to decode (limit {MAX_DECODE_BYTES / (1024*1024):.0f} MB)"
+            )
+
+        reserved = decode_budget.acquire(needed)
+        try:
+            with metrics.span('decode'):
+                # 1. Redimensiona se necessário
+                img = resize_image(original, max_resolution)
+
+                # 2. Converte para RGB
+                img = convert_to_rgb(img)
+        finally:
+            decode_budget.release(reserved)
+
+        # 3. Compressão até caber no limite
+        with metrics.span('compress'):
+            data, quality = compress_to_jpeg(img, max_bytes)
+
+    metrics.count_image_bytes('process_image', bytes_in, len(data))
+    if len(data) <= max_bytes:
+        logger.debug("✅ SUCESSO! JPEG, Qualidade %d. Tamanho final: %.2f MB.", quality, len(data) / (1024*1024))
+    else:
+        logger.warning("⚠️ AVISO: Não foi possível atingir %.2f MB. Final: %.2f MB.",
+                       max_bytes / (1024*1024), len(data) / (1024*1024))
+    return data
+
+
+# -------------------------------------------------------------------
+# 4. FUNÇÃO PRINCIPAL: PROCESSAMENTO + COMPRESSÃO FINAL
 # -------------------------------------------------------------------
 def process_image(input_path: str, output_path: str, 
                   max_resolution: tuple[int, int] = (1920, 1080), 
@@ -138,50 +358,27 @@ def process_image(input_path: str, output_path: str,
     """
     Redimensiona, converte e comprime uma imagem para caber em até 1MB
     salvando como JPEG com a melhor qualidade possível.
+    A compressão acontece em memória; o disco é usado uma única vez.
     """
 
-    # Arquivo temporário para iterar a compressão
+    # Arquivo temporário para a gravação atômica do resultado
     temp_path = output_path + ".temp"
 
     try:
-        # 0. Abre imagem original
-        img = Image.open(input_path)
-        print(f"Arquivo Original: {img.format}, Tamanho: {os.path.getsize(input_path) / (1024*1024):.2f} MB")
-
-        # 1. Redimensiona se necessário
-        img = resize_image(img, max_resolution)
-
-        # 2. Converte para RGB
-        img = convert_to_rgb(img)
-
-        # 3. Processo iterativo de compressão (reduz qualidade até atingir < 1MB)
-        quality = 100
-        print(f"Iniciando compressão para <= {max_bytes / (1024*1024):.2f} MB...")
-
-        while quality >= 10:
-            img.save(temp_path, format='JPEG', quality=quality)
-            current_size = os.path.getsize(temp_path)
-
-            if current_size <= max_bytes:
-                # Sucesso: substitui pelo final
-                os.rename(temp_path, output_path)
-                print(f"✅ SUCESSO! JPEG, Qualidade {quality}. Tamanho final: {current_size / (1024*1024):.2f} MB.")
-                return
-
-            quality -= 5  # Reduz qualidade e tenta de novo
+        data = process_image_to_bytes(input_path, max_resolution, max_bytes)
 
-        # Caso não consiga chegar ao limite, salva mesmo assim
-        os.rename(temp_path, output_path)
-        print(f"⚠️ AVISO: Não foi possível atingir 1MB. Final: {os.path.getsize(output_path) / (1024*1024):.2f} MB.")
+        with open(temp_path, 'wb') as output_file:
+            output_file.write(data)
+        os.replace(temp_path, output_path)
 
     except FileNotFoundError:
-        print(f"❌ Erro: Arquivo não encontrado em {input_path}")
+        logger.error("❌ Erro: Arquivo não encontrado em %s", input_path)
 
     except Exception as e:
         # Remove o temporário em caso de erro
         if os.path.exists(temp_path):
             os.remove(temp_path)
-        print(f"❌ Ocorreu um erro: {e}")
+        logger.error("❌ Ocorreu um erro: %s", e)
 
 
 # -------------------------------------------------------------------
@@ -201,4 +398,5 @@ if __name__ == "__main__":
     # )
 
     # Exemplo: aplica blur
-    blur_image("isshin.jpg", 8, image_path="./cards/")
+    with Image.open("./cards/isshin.jpg") as img:
+        blur_levels(img.convert('RGB'), [8])[8].save(output_file, 'JPEG')
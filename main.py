@@ -1,15 +1,31 @@
 import os
+import logging
 from dotenv import load_dotenv
 
 # Carrega variáveis do arquivo .env para o ambiente
 load_dotenv()
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+# Logs com nível (LOG_LEVEL=DEBUG mostra o passo a passo do processamento das imagens e do OCR)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+from flask import Flask, Request, render_template, request, redirect, url_for, flash, session, jsonify, abort, Response, stream_with_context, g
 from werkzeug.utils import secure_filename
 from scryfall import Scryfall                 # Classe personalizada para acessar a API Scryfall
 from card_recognition import CardRecognition  # Classe que usa OCR para identificar cartas MTG
-from image_utils import download_and_blur_image, process_image
-import uuid
+from image_utils import process_image_to_bytes
+from upload_stream import SpooledUpload
+from recognition_jobs import RecognitionPipeline, QueueFullError
+from batch_recognition import BatchRecognizer
+from game_pool import GamePool
+from game_store import (store_from_env, new_game_state, apply_guess,
+                        load_session_game, save_session_game, reset_session_game)
+from price_tracking import PriceTracker
+from api import create_api
+import metrics
+import views
+from views import ALLOWED_EXTENSIONS, MAX_FILE_SIZE, MAX_BATCH_SIZE
+import json
 
 # (provavelmente um erro do autor, load_dotenv não está sendo chamado aqui)
 load_dotenv
@@ -18,21 +34,109 @@ load_dotenv
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Necessário para sessões e flash messages
 
-# Configurações de upload
+# Configurações de upload (limites em views.py, os mesmos do app ASGI)
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'heic'}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # Tamanho máximo: 5MB
 
 # Adiciona configurações ao app
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+app.config['MAX_CONTENT_LENGTH'] = MAX_BATCH_SIZE
+app.config['ALLOWED_EXTENSIONS'] = ALLOWED_EXTENSIONS
 
 # Cria pasta de uploads se não existir
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-def allowed_file(filename):
-    """Verifica se o arquivo possui extensão permitida."""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+class UploadRequest(Request):
+    """
+    Requisição cujos arquivos enviados ficam em memória (SpooledUpload) em vez
+    de irem para um arquivo temporário a partir de 500 KB, com limite por arquivo.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledUpload(views.upload_limit(self.endpoint))
+
+app.request_class = UploadRequest
+
+# Arquivos locais do app (ex: SQLite dos jobs e dos jogos, compartilhados pelos workers)
+os.makedirs(app.instance_path, exist_ok=True)
+
+# Pipeline assíncrono de reconhecimento (pool de threads com fila limitada)
+recognition_pipeline = RecognitionPipeline.from_env(os.path.join(app.instance_path, 'recognition_jobs.db'))
+
+# Reconhecimento em lote (pool de processos + pool de threads)
+batch_recognizer = BatchRecognizer.from_env()
+
+# Estoque de jogos pré-gerados, reabastecido em segundo plano (thread iniciada na primeira requisição)
+game_pool = GamePool.from_env()
+
+# Estado dos jogos no servidor (SQLite por padrão, Redis ou memória); o cookie guarda só o ID
+game_store = store_from_env(os.path.join(app.instance_path, 'games.db'))
+
+# Histórico de preços (só com PRICE_DB definido), com snapshot diário em segundo plano
+price_tracker = PriceTracker.from_env()
+
+# API JSON versionada (/api/v1), com os mesmos objetos das páginas
+app.register_blueprint(create_api(recognition_pipeline, game_pool, game_store, price_tracker))
+
+# Métricas lidas na hora da coleta (/metrics), a partir dos contadores que já existem
+def cache_lookups():
+    card, search = Scryfall.cache.stats(), Scryfall.search_cache.stats()
+    return {
+        ('card', 'hit'): card['hits'], ('card', 'disk_hit'): card['disk_hits'], ('card', 'miss'): card['misses'],
+        ('search', 'hit'): search['hits'], ('search', 'miss'): search['misses']
+    }
+
+metrics.register_collector('cardtrader_cache_lookups_total', 'Cache lookups by result', 'counter',
+                           ('cache', 'result'), cache_lookups)
+metrics.register_collector('cardtrader_cache_hit_ratio', 'Cache hit ratio since startup', 'gauge', ('cache',),
+                           lambda: {('card',): Scryfall.cache.stats()['hit_ratio'],
+                                    ('search',): Scryfall.search_cache.stats()['hit_ratio']})
+def coalesced_requests():
+    counts = {('scryfall',): Scryfall._inflight.coalesced}
+    inflight = getattr(CardRecognition.backend, '_inflight', None)
+    if inflight is not None:
+        counts[('ocrspace',)] = inflight.coalesced
+    return counts
+
+metrics.register_collector('cardtrader_coalesced_requests_total', 'Upstream requests served by an identical one in flight',
+                           'counter', ('upstream',), coalesced_requests)
+metrics.register_collector('cardtrader_recognition_jobs', 'Recognition jobs queued or running', 'gauge', (),
+                           lambda: {(): recognition_pipeline.stats()['in_flight']})
+
+def start_background_threads():
+    """
+    Inicia as threads do estoque de jogos e dos snapshots de preço no processo
+    atual. Chamado a cada requisição (não na importação: importar main em
+    testes, scripts ou no master do gunicorn não dispara nada); depois da
+    primeira vez é só uma comparação de PID.
+    """
+    game_pool.start()
+    if price_tracker is not None:
+        price_tracker.start()
+
+@app.before_request
+def start_workers():
+    start_background_threads()
+
+@app.before_request
+def start_request_metrics():
+    """Marca o início da requisição (latência por rota em /metrics)."""
+    g.metrics_started = metrics.request_started()
+
+@app.after_request
+def record_request_metrics(response):
+    """Registra a latência pelo padrão da rota (não pela URL, que varia com os IDs)."""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    return metrics.request_finished(g.get('metrics_started'), route, request.method, response)
+
+@app.before_request
+def limit_upload_size():
+    """Só as rotas de lote aceitam uploads acima de MAX_FILE_SIZE."""
+    views.limit_upload_size(request.endpoint, request.content_length)
+
+@app.after_request
+def cache_derived_images(response):
+    """Derivadas levam o hash do conteúdo na URL: navegador e CDN guardam sem revalidar."""
+    return views.cache_derived_images(request.endpoint, request.path, response)
 
 # -------------------------------
 # ROTAS PRINCIPAIS
@@ -50,7 +154,7 @@ def card_detail(card_id):
     if card_data != "Not found":
         return render_template('pages/card-detail.html', card=card_data)
     else:
-        flash('Card not found', 'error')
+        flash(views.CARD_NOT_FOUND, 'error')
         return redirect(url_for('home'))
 
 @app.route('/random-card')
@@ -72,111 +176,94 @@ def random_card():
 
 @app.route('/card-search', methods=['GET', 'POST'])
 def card_search():
-    """Busca cartas por nome ou termo na Scryfall."""
+    """
+    Busca cartas por nome ou termo na Scryfall, uma página por vez
+    (/card-search?q=...&page=N). O POST do formulário antigo redireciona para o GET.
+    """
     if request.method == 'POST':
-        search_term = request.form.get('search_term').strip()
-        
+        search_term = request.form.get('search_term', '').strip()
         if not search_term:
-            flash('Please enter a search term', 'error')
+            flash(views.EMPTY_SEARCH, 'error')
             return redirect(url_for('card_search'))
-        
-        try:
-            cards = Scryfall.search_card_by_query(search_term)
-
-            # Se não encontrou nada
-            if cards == "Not found" or len(cards) == 0:
-                flash(f'No cards found for "{search_term}"', 'info')
-                return render_template('pages/card-search.html', cards=[], search_term=search_term)
-            
-            # Limita a 30 resultados
-            cards = cards[:30]
-            return render_template('pages/card-search.html', cards=cards, search_term=search_term)
-                
-        except Exception as e:
-            flash(f'Error searching for cards: {str(e)}', 'error')
-            return redirect(url_for('card_search'))
-    
-    return render_template('pages/card-search.html')
+        return redirect(url_for('card_search', q=search_term))
+
+    search_term = request.args.get('q', '').strip()
+    if not search_term:
+        return render_template('pages/card-search.html')
+
+    page = max(request.args.get('page', 1, type=int), 1)
+
+    try:
+        results = Scryfall.search_cards(search_term, page=page)
+
+        # Se não encontrou nada
+        if results == "Not found" or not results['cards']:
+            flash(f'No cards found for "{search_term}"', 'info')
+            return render_template('pages/card-search.html', cards=[], search_term=search_term)
+
+        return render_template('pages/card-search.html', **views.search_template_args(results, search_term, page))
+
+    except Exception as e:
+        flash(f'Error searching for cards: {str(e)}', 'error')
+        return redirect(url_for('card_search'))
 
 # -------------------------------
 # JOGO INTERATIVO (ADIVINHAR A CARTA)
 # -------------------------------
 
+def load_game_state():
+    """Estado do jogo atual, guardado no servidor (o cookie só leva o ID)."""
+    game_state = load_session_game(session, game_store)
+    game_pool.touch_game(game_state)
+    return game_state
+
+def save_game_state(game_state):
+    """Grava o estado do jogo, criando um ID opaco para o cookie se necessário."""
+    save_session_game(session, game_store, game_state)
+
+def game_image_sources(image_url):
+    """srcset das derivadas de uma imagem do jogo (None: a página usa a imagem original)."""
+    return views.game_image_sources(game_pool.images.derivatives, image_url,
+                                    lambda path: url_for('static', filename=path))
+
 @app.route('/interactive-game')
 def interactive_game():
     """
     Página principal do jogo.
-    Verifica estado no session e exibe o jogo ativo ou parado.
+    Verifica estado no servidor e exibe o jogo ativo ou parado.
     """
-    if 'game_state' not in session:
+    game_state = load_game_state()
+    if game_state is None:
         return render_template('pages/interactive-game.html', game_active=False)
-    
-    # Compatibilidade com versões anteriores
-    if 'word_length' not in session['game_state']:
-        session['game_state']['word_length'] = len(session['game_state']['card_name'])
-        session.modified = True
-
-    # Compatibilidade para imagem original
-    if 'image_url_original' not in session['game_state']:
-        session['game_state']['image_url_original'] = session['game_state']['image_url'].replace('blurred', 'original')
-        session.modified = True
 
     # Renderiza jogo ativo
-    return render_template(
-        'pages/interactive-game.html',
-        game_active=True,
-        image_url=session['game_state']['image_url'],
-        image_url_original=session['game_state']['image_url_original'],
-        attempts=session['game_state']['attempts'],
-        max_attempts=session['game_state']['max_attempts'],
-        guesses=session['game_state']['guesses'],
-        game_over=session['game_state']['game_over'],
-        win=session['game_state']['win'],
-        correct_card_name=session['game_state'].get('card_name') if session['game_state']['game_over'] else None,
-        word_length=session['game_state'].get('word_length'),
-        target_word=session['game_state'].get('card_name')
-    )
+    return render_template('pages/interactive-game.html', **views.game_template_args(game_state, game_image_sources))
 
 @app.route('/interactive-game/new', methods=['POST'])
 def new_game():
     """Inicia um novo jogo com uma carta aleatória."""
     try:
-        card_data = Scryfall.get_random_card()
+        # Jogo pré-gerado pela thread do estoque (preparado na hora se estiver vazio)
+        game = game_pool.get_game()
 
-        if card_data == "Not found" or 'image_uris' not in card_data:
-            flash('Could not fetch a valid card.', 'error')
+        if game is None:
+            flash(views.NO_VALID_CARD, 'error')
             return redirect(url_for('interactive_game'))
-            
-        image_url = card_data['image_uris']['large']
-        full_card_name = card_data['name']
-
-        # Usado para jogos (nome antes da vírgula)
-        card_name = full_card_name.split(',')[0].strip()
-
-        # Gera nome único para imagem
-        filename = f"{uuid.uuid4()}.jpg"
-        filepath = os.path.join('static', 'game_images', filename)
-
-        # Download and blur
-        if download_and_blur_image(image_url, filename):
-            session['game_state'] = {
-                'card_name': card_name,
-                'word_length': len(card_name),
-                'image_url': url_for('static', filename=f'game_images/blurred/{filename}'),
-                'image_url_original': url_for('static', filename=f'game_images/original/{filename}'),
-                'attempts': 0,
-                'max_attempts': 5,
-                'guesses': [],
-                'game_over': False,
-                'win': False
-            }
-        else:
-            flash('Error processing game image.', 'error')
+
+        # Cada jogo ganha um novo ID; o anterior deixa de existir
+        reset_session_game(session, game_store)
+
+        save_game_state(new_game_state(game, lambda path: url_for('static', filename=path)))
     except Exception as e:
-        flash('An error occurred starting the game.', 'error')
+        flash(views.GAME_START_FAILED, 'error')
         
     return redirect(url_for('interactive_game'))
 
+@app.route('/interactive-game/pool/stats')
+def game_pool_stats():
+    """Estatísticas do estoque de jogos pré-gerados."""
+    return jsonify(game_pool.stats())
+
 # -------------------------------
 # PROCESSA PALPITE DO JOGO
 # -------------------------------
@@ -184,32 +271,23 @@ def new_game():
 @app.route('/interactive-game/guess', methods=['POST'])
 def make_guess():
     """Processa uma tentativa do jogador."""
-    if 'game_state' not in session or session['game_state']['game_over']:
+    game_state = load_game_state()
+    if game_state is None or game_state['game_over']:
         return redirect(url_for('interactive_game'))
         
     guess = request.form.get('guess', '').strip()
     
     if not guess:
         return redirect(url_for('interactive_game'))
-        
-    game_state = session['game_state']
 
-    # Adiciona tentativa
-    game_state['guesses'].append(guess)
-    game_state['attempts'] += 1
-    
-    # Verifica acerto
-    if guess.lower() == game_state['card_name'].lower():
-        game_state['win'] = True
-        game_state['game_over'] = True
-        flash(f'Congratulations! You guessed correctly: {game_state["card_name"]}', 'success')
-    
-    # Se acabou as tentativas
-    elif game_state['attempts'] >= game_state['max_attempts']:
-        game_state['game_over'] = True
-        flash(f'Game Over! The card was: {game_state["card_name"]}', 'error')
-    
-    session.modified = True
+    result = apply_guess(game_state, guess)
+
+    # Acertou ou acabaram as tentativas
+    message = views.guess_message(result, game_state)
+    if message:
+        flash(*message)
+
+    save_game_state(game_state)
     return redirect(url_for('interactive_game'))
 
 # -------------------------------
@@ -223,59 +301,111 @@ def card_recognition():
     Redimensiona, comprime, passa no OCR e tenta identificar a carta.
     """
     if request.method == 'POST':
-        # Verifica se veio arquivo
-        if 'card_image' not in request.files:
-            flash('No file selected', 'error')
-            return redirect(request.url)
-        
-        file = request.files['card_image']
-        
-        if file.filename == '' or file.filename is None:
-            flash('No file selected', 'error')
-            return redirect(request.url)
-        
-        if file and allowed_file(file.filename):
-            # Salva arquivo original
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'original_' + filename)
-            file.save(filepath)
-            
-            try:
-                # Caminho para imagem tratada
-                image_new_path = os.path.join(app.config['UPLOAD_FOLDER'], 'processed_' + filename.rsplit('.', 1)[0] + '.jpeg')
+        # Formato pelos magic bytes (a extensão do nome não garante nada)
+        file = request.files.get('card_image')
+        image_format, error = views.check_upload(file)
 
-                # Redimensiona e comprime imagem para OCR
-                process_image(filepath, image_new_path)
+        if image_format:
+            try:
+                # Decodifica direto do upload em memória: nada é gravado em uploads/
+                image_bytes = process_image_to_bytes(file.stream, formats=[image_format])
 
                 # Executa OCR
-                identifier = CardRecognition.identify_card_from_image(image_new_path)
-                
-                # Remove original
-                os.remove(filepath)
+                identifier = CardRecognition.identify_card_from_bytes(image_bytes)
                 
                 # Se identificou algo, busca na Scryfall
                 if identifier:
                     card_data = Scryfall.search_card(identifier)
                     if card_data == "Not found":
-                        flash('Card not found in Scryfall database', 'error')
+                        flash(views.CARD_NOT_IN_SCRYFALL, 'error')
                         return redirect(request.url)
 
                     return render_template('pages/card-detail.html', identifier=identifier, card=card_data)
                 else:
-                    flash('Could not identify the card from the image', 'error')
+                    flash(views.CARD_NOT_IDENTIFIED, 'error')
                     return redirect(request.url)
                     
             except Exception as e:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
                 flash(f'Error processing image: {str(e)}', 'error')
                 return redirect(request.url)
         else:
-            flash('Invalid file type. Upload PNG/JPG/JPEG only.', 'error')
+            flash(error, 'error')
             return redirect(request.url)
     
     return render_template('pages/card-recognition.html')
 
+@app.route('/card-recognition/jobs', methods=['POST'])
+def create_recognition_job():
+    """
+    Recebe a imagem e enfileira o reconhecimento.
+    Responde na hora com o ID do job (HTTP 202).
+    """
+    file = request.files.get('card_image')
+    image_format, error = views.check_upload(file)
+    if error:
+        return jsonify({'error': error}), 400
+
+    # O job recebe os bytes do upload (o arquivo da requisição é fechado ao final dela)
+    try:
+        job = recognition_pipeline.submit(file.stream.read(), formats=[image_format])
+    except QueueFullError:
+        response = jsonify({'error': views.QUEUE_FULL})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    return jsonify(views.job_created(job, url_for('recognition_job_status', job_id=job['id']))), 202
+
+@app.route('/card-recognition/batch', methods=['GET', 'POST'])
+def card_recognition_batch():
+    """
+    Reconhecimento em lote: várias imagens e/ou arquivos .zip.
+    O POST responde em streaming (NDJSON), uma linha por carta
+    assim que ela termina, e uma linha final de resumo.
+    """
+    if request.method == 'GET':
+        return render_template('pages/card-recognition-batch.html')
+
+    files = [file for file in request.files.getlist('card_images') if file.filename]
+    if not files:
+        return jsonify({'error': views.NO_FILE}), 400
+
+    uploads = [(secure_filename(file.filename), file.stream) for file in files]
+
+    def generate():
+        for result in batch_recognizer.recognize_uploads(uploads):
+            if result.get('card_id'):
+                result['detail_url'] = url_for('card_detail', card_id=result['card_id'])
+            yield json.dumps(result) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/card-recognition/jobs/stats')
+def recognition_job_stats():
+    """Estatísticas do pipeline de reconhecimento (tempo médio por estágio)."""
+    return jsonify(recognition_pipeline.stats())
+
+@app.route('/card-recognition/jobs/<job_id>')
+def recognition_job_status(job_id):
+    """Retorna o estado de um job de reconhecimento em JSON."""
+    job = recognition_pipeline.get(job_id)
+    if job is None:
+        return jsonify({'error': views.JOB_NOT_FOUND}), 404
+
+    if job['status'] == 'done':
+        job['detail_url'] = url_for('card_detail', card_id=job['card_id'])
+    return jsonify(job)
+
+# -------------------------------
+# MÉTRICAS (PROMETHEUS)
+# -------------------------------
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas deste worker no formato do Prometheus (404 com METRICS_ENABLED=0)."""
+    if not metrics.ENABLED:
+        abort(404)
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 # -------------------------------
 # INICIALIZA O SERVIDOR
 # -------------------------------
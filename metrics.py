@@ -0,0 +1,278 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+import logging
+
+logger = logging.getLogger(__name__)
+
+# METRICS_ENABLED=0 desliga tudo: spans e contadores viram chamadas vazias
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Cabeçalho Server-Timing com os estágios de cada resposta (expõe tempos internos: opcional)
+SERVER_TIMING = ENABLED and os.environ.get("METRICS_SERVER_TIMING", "0") == "1"
+
+# Limites (s) dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+# -------------------------------------------------------------------
+# TIPOS DE MÉTRICA
+# -------------------------------------------------------------------
+class Counter:
+    """Contador por combinação de rótulos (só cresce)."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, label_values, value) for label_values, value in self._values.items()]
+
+
+class Histogram:
+    """Histograma cumulativo (formato Prometheus) por combinação de rótulos."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        if not ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                # [contagem por faixa (+ a faixa +Inf), soma, total]
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for label_values, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    samples.append((self.name + '_bucket', label_values + (le,), cumulative))
+                samples.append((self.name + '_sum', label_values, total))
+                samples.append((self.name + '_count', label_values, count))
+        return samples
+
+    def sample_labels(self, name):
+        return self.labels + ('le',) if name.endswith('_bucket') else self.labels
+
+
+class Collector:
+    """
+    Métrica lida na hora da coleta (ex: contadores que um cache já mantém):
+    não custa nada no caminho das requisições. `function` retorna
+    {valores dos rótulos: valor}.
+    """
+
+    def __init__(self, name, help, type, labels, function):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labels = labels
+        self.function = function
+
+    def samples(self):
+        try:
+            return [(self.name, label_values, value) for label_values, value in self.function().items()]
+        except Exception as e:
+            logger.warning("Metrics collector %s failed: %s", self.name, e)
+            return []
+
+
+_registry = []
+
+
+def counter(name, help, labels=()):
+    metric = Counter(name, help, labels)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS):
+    metric = Histogram(name, help, labels, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def register_collector(name, help, type, labels, function):
+    """Registra uma métrica lida por `function` a cada coleta (/metrics)."""
+    _registry.append(Collector(name, help, type, labels, function))
+
+
+# -------------------------------------------------------------------
+# MÉTRICAS DO APP
+# -------------------------------------------------------------------
+request_seconds = histogram(
+    'cardtrader_request_seconds', 'Latency of HTTP requests by route', ('route', 'method', 'status'))
+stage_seconds = histogram(
+    'cardtrader_stage_seconds', 'Latency of processing stages (decode, compress, ocr, lookup...)', ('stage',))
+upstream_seconds = histogram(
+    'cardtrader_upstream_seconds', 'Latency of each request to an external API', ('upstream', 'status'))
+rate_limit_wait_seconds = histogram(
+    'cardtrader_rate_limit_wait_seconds', 'Time spent waiting for the rate limiter', ('upstream',))
+image_bytes = counter(
+    'cardtrader_image_bytes_total', 'Image bytes read and written by each stage', ('stage', 'direction'))
+
+
+# -------------------------------------------------------------------
+# SPANS (TEMPO DE CADA ESTÁGIO)
+# -------------------------------------------------------------------
+
+# Estágios medidos na requisição atual (para o Server-Timing)
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+
+
+class _Span:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self.started
+        stage_seconds.observe(elapsed, self.stage)
+        logger.debug("stage=%s ms=%.1f", self.stage, elapsed * 1000)
+
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((self.stage, elapsed))
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage):
+    """
+    Mede um estágio: `with metrics.span('compress'): ...`.
+    O tempo vai para o histograma cardtrader_stage_seconds, para o log
+    (nível DEBUG) e para o Server-Timing da requisição, se ativado.
+    """
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _Span(stage)
+
+
+def observe_upstream(upstream, status, seconds):
+    """Registra uma requisição a uma API externa (status HTTP ou 'error')."""
+    if not ENABLED:
+        return
+    upstream_seconds.observe(seconds, upstream, str(status))
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((upstream, seconds))
+
+
+def count_image_bytes(stage, bytes_in, bytes_out):
+    """Registra os bytes de imagem lidos e gerados por um estágio."""
+    if not ENABLED:
+        return
+    image_bytes.inc(stage, 'in', amount=bytes_in)
+    image_bytes.inc(stage, 'out', amount=bytes_out)
+
+
+# -------------------------------------------------------------------
+# REQUISIÇÕES HTTP
+# -------------------------------------------------------------------
+def request_started():
+    """
+    Chamado no início de cada requisição (before_request).
+    Retorna o instante inicial, a ser passado para request_finished.
+    """
+    if not ENABLED:
+        return None
+    if SERVER_TIMING:
+        _request_spans.set([])
+    return time.perf_counter()
+
+
+def request_finished(started, route, method, response):
+    """
+    Chamado no fim de cada requisição (after_request): registra a latência
+    por rota (o padrão da rota, ex: /card-detail/<card_id>, não a URL) e
+    adiciona o Server-Timing à resposta, se ativado.
+    """
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    request_seconds.observe(elapsed, route, method, str(response.status_code))
+
+    if SERVER_TIMING:
+        spans = _request_spans.get() or []
+        response.headers['Server-Timing'] = ', '.join(
+            [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in spans] + [f'total;dur={elapsed * 1000:.1f}']
+        )
+        _request_spans.set(None)
+    return response
+
+
+# -------------------------------------------------------------------
+# EXPOSIÇÃO (FORMATO TEXTO DO PROMETHEUS)
+# -------------------------------------------------------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render():
+    """
+    Todas as métricas deste processo no formato texto do Prometheus.
+    Com vários workers, cada um expõe os próprios valores.
+    """
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, label_values, value in metric.samples():
+            labels = metric.sample_labels(name) if isinstance(metric, Histogram) else metric.labels
+            if labels:
+                label_text = ','.join(f'{label}="{_escape(label_value)}"'
+                                      for label, label_value in zip(labels, label_values))
+                lines.append(f'{name}{{{label_text}}} {value}')
+            else:
+                lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
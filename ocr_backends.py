@@ -0,0 +1,277 @@
+import os
+import abc
+import asyncio
+import base64
+import hashlib
+import logging
+import threading
+from io import BytesIO
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from rate_limit import bucket_from_env, request_with_retry, async_request_with_retry, SingleFlight, AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------------------
+# INTERFACE
+# -------------------------------------------------------------------
+class OCRBackend(abc.ABC):
+    """
+    Interface dos motores de OCR: recebem os bytes de uma imagem
+    (JPEG/PNG) e retornam o texto extraído, ou None em caso de falha.
+    """
+    name = 'base'
+
+    @abc.abstractmethod
+    def extract_text(self, image_bytes):
+        """Retorna o texto da imagem, ou None em caso de falha."""
+
+    async def extract_text_async(self, image_bytes, client):
+        """
+        Versão assíncrona (app ASGI). Por padrão roda extract_text numa
+        thread; motores remotos podem usar o cliente httpx compartilhado.
+        """
+        return await asyncio.to_thread(self.extract_text, image_bytes)
+
+    def close(self):
+        """Libera recursos (pools, sessões). Opcional."""
+
+
+# -------------------------------------------------------------------
+# OCR.SPACE (API REMOTA)
+# -------------------------------------------------------------------
+
+# Sessão HTTP do processo, com pool de conexões keep-alive para a OCR.space
+OCR_POOL_SIZE = int(os.environ.get("OCR_POOL_SIZE", "4"))
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Retorna a sessão compartilhada da OCR.space, criando uma nova se
+    necessário (ou após um fork: cada worker tem seus próprios sockets).
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OCR_POOL_SIZE, pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+                _session_pid = pid
+    return _session
+
+class OCRSpaceBackend(OCRBackend):
+    """
+    Motor remoto da OCR.space (comportamento original do projeto).
+    As requisições respeitam um limite compartilhado entre os workers
+    (OCR_RATE_LIMIT por segundo, com rajadas de até OCR_RATE_BURST; o plano
+    gratuito aceita 180 por hora, ou seja OCR_RATE_LIMIT=0.05), e a mesma
+    imagem enviada várias vezes ao mesmo tempo vira uma única requisição.
+    """
+    name = 'ocrspace'
+
+    def __init__(self, api_url=None, api_key=None, timeout=None, rate_limit=None, burst=None):
+        self.api_url = api_url or os.environ.get("OCR_API_URL", "https://api.ocr.space/parse/image")
+        self.headers = {'apikey': api_key or os.environ.get("OCR_API_KEY")}
+        self.timeout = timeout or float(os.environ.get("OCR_TIMEOUT", "30"))
+        self.rate_limiter = bucket_from_env(
+            "ocrspace",
+            rate_limit or float(os.environ.get("OCR_RATE_LIMIT", "1")),
+            burst or float(os.environ.get("OCR_RATE_BURST", "3"))
+        )
+        self._inflight = SingleFlight()
+        self._inflight_async = AsyncSingleFlight()
+
+    @staticmethod
+    def _payload(image_bytes):
+        # Converte o conteúdo da imagem em Base64
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+
+        # Payload requerido pela API do OCR.space
+        return {
+            'isOverlayRequired': False,  # Desabilita overlay visual no retorno
+            'OCREngine': 2,              # Usa engine OCR mais precisa
+            'language': 'auto',          # Detecta idioma automaticamente
+            'base64Image': f"data:image/jpeg;base64,{base64_image}"  # Imagem codificada
+        }
+
+    @staticmethod
+    def _parse(json_response):
+        # Verifica se houve erro de processamento
+        if not json_response.get('IsErroredOnProcessing'):
+            # Retorna o texto extraído
+            return json_response['ParsedResults'][0]['ParsedText']
+        else:
+            logger.warning("OCR Error: %s", json_response.get('ErrorMessage'))
+            return None
+
+    def extract_text(self, image_bytes):
+        try:
+            payload = OCRSpaceBackend._payload(image_bytes)
+
+            logger.debug("Payload prepared, making API request...")
+
+            # Faz a requisição POST para a API (imagens iguais em andamento compartilham a resposta)
+            response = self._inflight.do(hashlib.sha1(image_bytes).hexdigest(), lambda: request_with_retry(
+                lambda: get_session().post(self.api_url, headers=self.headers, data=payload, timeout=self.timeout),
+                self.rate_limiter, retries=2
+            ))
+
+            logger.debug("API request completed.")
+
+            # Lança exceção se o status não for 200
+            response.raise_for_status()
+
+            return OCRSpaceBackend._parse(response.json())
+
+        # Erros relacionados à requisição HTTP
+        except requests.exceptions.RequestException as e:
+            logger.error("An API request error occurred: %s", e)
+            return None
+
+    async def extract_text_async(self, image_bytes, client):
+        """Mesma requisição de extract_text, no cliente httpx.AsyncClient compartilhado."""
+        import httpx
+
+        # Base64 de uma imagem grande é trabalho de CPU: sai do event loop
+        payload = await asyncio.to_thread(OCRSpaceBackend._payload, image_bytes)
+
+        try:
+            response = await self._inflight_async.do(hashlib.sha1(image_bytes).hexdigest(), lambda: async_request_with_retry(
+                lambda: client.post(self.api_url, headers=self.headers, data=payload, timeout=self.timeout),
+                self.rate_limiter, retries=2, connection_errors=(httpx.TransportError,)
+            ))
+            response.raise_for_status()
+            return OCRSpaceBackend._parse(response.json())
+
+        except httpx.HTTPError as e:
+            logger.error("An API request error occurred: %s", e)
+            return None
+
+
+# -------------------------------------------------------------------
+# TESSERACT (LOCAL, EM POOL DE PROCESSOS "AQUECIDOS")
+# -------------------------------------------------------------------
+
+# Estado de cada processo do pool (o motor é carregado uma única vez)
+_tesseract_engine = None
+
+
+def _tesseract_init(language):
+    """
+    Inicializador dos processos do pool: carrega o motor uma vez.
+    Usa tesserocr (API C, motor residente) se disponível; senão pytesseract.
+    """
+    global _tesseract_engine
+    try:
+        import tesserocr
+        _tesseract_engine = ('tesserocr', tesserocr.PyTessBaseAPI(lang=language))
+    except ImportError:
+        import pytesseract
+        pytesseract.get_tesseract_version()  # Falha cedo se o binário não existir
+        _tesseract_engine = ('pytesseract', language)
+
+
+def _tesseract_ocr(image_bytes):
+    """Executado dentro de um processo do pool."""
+    from PIL import Image
+
+    # Tons de cinza: menos dados e o Tesseract binariza melhor
+    with Image.open(BytesIO(image_bytes)) as img:
+        img = img.convert('L')
+
+    kind, engine = _tesseract_engine
+    if kind == 'tesserocr':
+        engine.SetImage(img)
+        return engine.GetUTF8Text()
+
+    import pytesseract
+    return pytesseract.image_to_string(img, lang=engine)
+
+
+class TesseractBackend(OCRBackend):
+    """
+    Motor local (Tesseract). Roda em um pool de processos com o motor
+    pré-carregado, de modo que o OCR não paga inicialização a cada imagem.
+    Requer `tesserocr` ou `pytesseract` + o binário tesseract instalados.
+    """
+    name = 'tesseract'
+
+    def __init__(self, workers=None, language=None, timeout=None):
+        self.workers = workers or int(os.environ.get("TESSERACT_WORKERS", "2"))
+        self.language = language or os.environ.get("TESSERACT_LANG", "eng")
+        self.timeout = timeout or float(os.environ.get("OCR_TIMEOUT", "30"))
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Um pool por worker do gunicorn (recriado após fork)
+        pid = os.getpid()
+        if self._pool is None or self._pool_pid != pid:
+            with self._lock:
+                if self._pool is None or self._pool_pid != pid:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        initializer=_tesseract_init,
+                        initargs=(self.language,)
+                    )
+                    self._pool_pid = pid
+        return self._pool
+
+    def warm_up(self):
+        """Inicia os processos do pool antes da primeira requisição."""
+        pool = self._get_pool()
+        for _ in range(self.workers):
+            pool.submit(int)
+
+    def extract_text(self, image_bytes):
+        try:
+            return self._get_pool().submit(_tesseract_ocr, image_bytes).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            logger.warning("Tesseract OCR timed out after %ss", self.timeout)
+            return None
+        except BrokenProcessPool as e:
+            # Processo morto ou motor não instalado: recria o pool na próxima chamada
+            logger.error("Tesseract OCR pool failed: %s", e)
+            self._pool = None
+            return None
+        except Exception as e:
+            logger.error("Tesseract OCR error: %s", e)
+            return None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# -------------------------------------------------------------------
+# REGISTRO DE MOTORES
+# -------------------------------------------------------------------
+OCR_BACKENDS = {
+    OCRSpaceBackend.name: OCRSpaceBackend,
+    TesseractBackend.name: TesseractBackend,
+}
+
+
+def register_backend(name, backend_class):
+    """Registra um novo motor de OCR (ex: para testes ou outros serviços)."""
+    OCR_BACKENDS[name] = backend_class
+
+
+def backend_from_env():
+    """Cria o motor definido em OCR_BACKEND (padrão: ocrspace)."""
+    name = os.environ.get("OCR_BACKEND", OCRSpaceBackend.name).lower()
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {name}. Options: {', '.join(OCR_BACKENDS)}")
+    return OCR_BACKENDS[name]()
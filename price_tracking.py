@@ -0,0 +1,475 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import date, datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Campos de `prices` das cartas da Scryfall (guardados em centavos)
+CURRENCIES = ('usd', 'usd_foil', 'usd_etched', 'eur', 'eur_foil', 'tix')
+
+# Cartas gravadas por transação durante um snapshot
+WRITE_BATCH = 5000
+
+# Reserva de snapshot sem término há mais que isso (segundos): o worker morreu no meio
+SNAPSHOT_CLAIM_TIMEOUT = float(os.environ.get("PRICE_SNAPSHOT_CLAIM_TIMEOUT", 2 * 3600))
+
+
+def to_day(value):
+    """Converte date, 'AAAA-MM-DD' ou None (hoje, em UTC) no número do dia."""
+    if value is None:
+        return datetime.now(timezone.utc).date().toordinal()
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+
+def price_values(prices):
+    """
+    Tupla de preços em centavos (na ordem de CURRENCIES) a partir do
+    campo `prices` da Scryfall, que usa strings ("0.25") ou None.
+    """
+    prices = prices or {}
+    values = []
+    for currency in CURRENCIES:
+        value = prices.get(currency)
+        values.append(round(float(value) * 100) if value else None)
+    return tuple(values)
+
+
+# -------------------------------------------------------------------
+# SÉRIE HISTÓRICA DE PREÇOS (SQLITE)
+# -------------------------------------------------------------------
+class PriceStore:
+    """
+    Histórico de preços das cartas em SQLite.
+
+    A série é codificada por mudança: um ponto (carta, dia) só é gravado
+    quando algum preço difere do último ponto da carta, e vale até o
+    próximo. Preços estáveis não ocupam espaço, e a consulta "preço no dia D"
+    é o último ponto com dia <= D.
+
+    price_points é uma tabela WITHOUT ROWID com chave (carta, dia): os pontos
+    de uma carta ficam juntos e em ordem no disco, então o histórico de um
+    ano é uma única leitura sequencial do índice, mesmo com milhões de pontos.
+    As cartas são referenciadas por um inteiro (price_cards), não pelo UUID.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        columns = ', '.join(f"{currency} INTEGER" for currency in CURRENCIES)
+        conn = self._db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS price_cards (
+                    id INTEGER PRIMARY KEY,
+                    scryfall_id TEXT NOT NULL UNIQUE,
+                    name TEXT NOT NULL,
+                    watched INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS price_points (
+                    card INTEGER NOT NULL,
+                    day INTEGER NOT NULL,
+                    {columns},
+                    PRIMARY KEY (card, day)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS price_snapshots (
+                    day INTEGER NOT NULL,
+                    source TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    finished_at REAL,
+                    cards INTEGER,
+                    changed INTEGER,
+                    PRIMARY KEY (day, source)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS price_cards_watched ON price_cards (watched) WHERE watched = 1")
+
+    def _db(self):
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != pid:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    # -------------------------------
+    # GRAVAÇÃO
+    # -------------------------------
+
+    def _card_rows(self):
+        """UUID da Scryfall -> ID interno, de todas as cartas conhecidas."""
+        return dict(self._db().execute("SELECT scryfall_id, id FROM price_cards"))
+
+    def _latest_values(self):
+        """ID interno -> preços do último ponto de cada carta."""
+        columns = ', '.join(CURRENCIES)
+        # Com MAX(), o SQLite devolve as demais colunas da linha de maior dia
+        return {
+            row[0]: tuple(row[2:])
+            for row in self._db().execute(f"SELECT card, MAX(day), {columns} FROM price_points GROUP BY card")
+        }
+
+    def record(self, cards, day=None):
+        """
+        Grava os preços de um conjunto de cartas da Scryfall (iterável de dicts,
+        ex: o arquivo bulk) no dia informado. Só as cartas cujo preço mudou
+        desde o último ponto geram uma linha nova.
+        Retorna {'cards': cartas lidas, 'changed': pontos gravados}.
+        """
+        day = to_day(day)
+        conn = self._db()
+        rows = self._card_rows()
+        latest = self._latest_values()
+
+        placeholders = ', '.join('?' for _ in CURRENCIES)
+        insert_point = f"INSERT OR REPLACE INTO price_points VALUES (?, ?, {placeholders})"
+
+        seen, changed = 0, 0
+        new_cards, points = [], []
+
+        def flush():
+            with conn:
+                for scryfall_id, name in new_cards:
+                    cursor = conn.execute("INSERT OR IGNORE INTO price_cards (scryfall_id, name) VALUES (?, ?)",
+                                          (scryfall_id, name))
+                    rows[scryfall_id] = cursor.lastrowid if cursor.rowcount else conn.execute(
+                        "SELECT id FROM price_cards WHERE scryfall_id = ?", (scryfall_id,)).fetchone()[0]
+                conn.executemany(insert_point, [(rows[scryfall_id], day, *values) for scryfall_id, values in points])
+            new_cards.clear()
+            points.clear()
+
+        for card in cards:
+            if not card.get('id'):
+                continue
+            seen += 1
+
+            scryfall_id = card['id'].lower()
+            values = price_values(card.get('prices'))
+            row = rows.get(scryfall_id)
+
+            if row is None:
+                new_cards.append((scryfall_id, card.get('name', '')))
+            elif latest.get(row) == values:
+                continue
+
+            points.append((scryfall_id, values))
+            changed += 1
+            if len(points) >= WRITE_BATCH:
+                flush()
+
+        flush()
+        return {'cards': seen, 'changed': changed}
+
+    # -------------------------------
+    # LISTA DE ACOMPANHAMENTO
+    # -------------------------------
+
+    def watch(self, card, day=None):
+        """Passa a acompanhar uma carta (e já grava o preço atual dela)."""
+        scryfall_id = card['id'].lower()
+        values = price_values(card.get('prices'))
+        columns = ', '.join(CURRENCIES)
+
+        conn = self._db()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO price_cards (scryfall_id, name) VALUES (?, ?)",
+                         (scryfall_id, card.get('name', '')))
+            conn.execute("UPDATE price_cards SET watched = 1 WHERE scryfall_id = ?", (scryfall_id,))
+            row = self._card_row(scryfall_id)
+
+            # Só o último ponto desta carta (record() carregaria o de todas)
+            last = conn.execute(f"SELECT {columns} FROM price_points WHERE card = ? ORDER BY day DESC LIMIT 1",
+                                (row,)).fetchone()
+            if last != values:
+                conn.execute(f"INSERT OR REPLACE INTO price_points VALUES (?, ?, {', '.join('?' for _ in CURRENCIES)})",
+                             (row, to_day(day), *values))
+
+    def unwatch(self, scryfall_id):
+        conn = self._db()
+        with conn:
+            conn.execute("UPDATE price_cards SET watched = 0 WHERE scryfall_id = ?", (str(scryfall_id).lower(),))
+
+    def watched(self):
+        """UUIDs das cartas acompanhadas."""
+        return [row[0] for row in self._db().execute("SELECT scryfall_id FROM price_cards WHERE watched = 1")]
+
+    # -------------------------------
+    # CONTROLE DOS SNAPSHOTS
+    # -------------------------------
+
+    def claim_snapshot(self, day, source, timeout=SNAPSHOT_CLAIM_TIMEOUT):
+        """
+        Reserva o snapshot do dia para este processo. Retorna False se outro
+        worker (ou uma execução anterior) já o fez: cada dia roda uma vez só.
+        Uma reserva não terminada há mais de `timeout` segundos (worker que
+        morreu no meio) é assumida por este processo, no mesmo comando.
+        """
+        now = time.time()
+        conn = self._db()
+        with conn:
+            cursor = conn.execute("""
+                INSERT INTO price_snapshots (day, source, started_at) VALUES (?, ?, ?)
+                ON CONFLICT (day, source) DO UPDATE SET started_at = excluded.started_at
+                WHERE price_snapshots.finished_at IS NULL AND price_snapshots.started_at < ?
+            """, (to_day(day), source, now, now - timeout))
+        return cursor.rowcount == 1
+
+    def finish_snapshot(self, day, source, result):
+        conn = self._db()
+        with conn:
+            conn.execute("UPDATE price_snapshots SET finished_at = ?, cards = ?, changed = ? WHERE day = ? AND source = ?",
+                         (time.time(), result['cards'], result['changed'], to_day(day), source))
+
+    def release_snapshot(self, day, source):
+        """Desfaz a reserva de um snapshot que falhou (pode ser tentado de novo)."""
+        conn = self._db()
+        with conn:
+            conn.execute("DELETE FROM price_snapshots WHERE day = ? AND source = ? AND finished_at IS NULL",
+                         (to_day(day), source))
+
+    def snapshots(self, limit=30):
+        """Últimos snapshots: dia, origem, duração e quantidade de cartas."""
+        return [
+            {
+                'date': date.fromordinal(day).isoformat(), 'source': source,
+                'seconds': round(finished_at - started_at, 1) if finished_at else None,
+                'cards': cards, 'changed': changed
+            }
+            for day, source, started_at, finished_at, cards, changed in self._db().execute(
+                "SELECT day, source, started_at, finished_at, cards, changed FROM price_snapshots "
+                "ORDER BY day DESC LIMIT ?", (limit,))
+        ]
+
+    # -------------------------------
+    # CONSULTAS
+    # -------------------------------
+
+    @staticmethod
+    def _point(day, values):
+        point = {'date': date.fromordinal(day).isoformat()}
+        for currency, value in zip(CURRENCIES, values):
+            point[currency] = value / 100 if value is not None else None
+        return point
+
+    def _card_row(self, scryfall_id):
+        row = self._db().execute("SELECT id FROM price_cards WHERE scryfall_id = ?",
+                                 (str(scryfall_id).lower(),)).fetchone()
+        return row[0] if row else None
+
+    def history(self, scryfall_id, start=None, end=None, daily=False):
+        """
+        Preços de uma carta entre start e end (datas, inclusive).
+        Por padrão só os dias em que o preço mudou, começando pelo preço
+        em vigor em start; com daily=True, um ponto por dia.
+        Retorna None se a carta não tem histórico.
+        """
+        card = self._card_row(scryfall_id)
+        if card is None:
+            return None
+
+        end = to_day(end)
+        start = to_day(start) if start is not None else 0
+        columns = ', '.join(CURRENCIES)
+        conn = self._db()
+
+        # Ponto em vigor no início do intervalo + mudanças dentro dele
+        rows = conn.execute(f"""
+            SELECT * FROM (
+                SELECT day, {columns} FROM price_points WHERE card = ? AND day <= ? ORDER BY day DESC LIMIT 1
+            )
+            UNION ALL
+            SELECT day, {columns} FROM price_points WHERE card = ? AND day > ? AND day <= ?
+        """, (card, start, card, start, end)).fetchall()
+
+        if not daily:
+            return [PriceStore._point(max(row[0], start), row[1:]) for row in rows]
+
+        # Preenche os dias sem mudança com o último preço conhecido
+        points = []
+        for index, row in enumerate(rows):
+            first = max(row[0], start)
+            last = rows[index + 1][0] - 1 if index + 1 < len(rows) else end
+            points.extend(PriceStore._point(day, row[1:]) for day in range(first, last + 1))
+        return points
+
+    def price_on(self, scryfall_id, day=None):
+        """Preços de uma carta em vigor no dia (hoje por padrão), ou None."""
+        card = self._card_row(scryfall_id)
+        if card is None:
+            return None
+        row = self._db().execute(
+            f"SELECT day, {', '.join(CURRENCIES)} FROM price_points WHERE card = ? AND day <= ? "
+            "ORDER BY day DESC LIMIT 1", (card, to_day(day))
+        ).fetchone()
+        return PriceStore._point(row[0], row[1:]) if row else None
+
+    def percent_change(self, scryfall_id, start, end=None, currency='usd'):
+        """Variação percentual do preço de uma carta entre dois dias, ou None sem dados."""
+        if currency not in CURRENCIES:
+            raise ValueError(f"Unknown currency: {currency}")
+        before = self.price_on(scryfall_id, start)
+        after = self.price_on(scryfall_id, end)
+        if not before or not after or not before[currency] or after[currency] is None:
+            return None
+        return (after[currency] - before[currency]) * 100 / before[currency]
+
+    def movers(self, start, end=None, currency='usd', limit=20, min_price=1.0, watched_only=False, falling=False):
+        """
+        Cartas com maior alta (ou queda, com falling=True) percentual entre
+        dois dias, ignorando as que custavam menos de min_price no início.
+        Cada carta custa duas buscas no índice (preço em start e em end).
+        """
+        if currency not in CURRENCIES:
+            raise ValueError(f"Unknown currency: {currency}")
+
+        rows = self._db().execute(f"""
+            SELECT scryfall_id, name, before, after, (after - before) * 100.0 / before AS change FROM (
+                SELECT c.scryfall_id, c.name,
+                    (SELECT {currency} FROM price_points WHERE card = c.id AND day <= :start
+                     ORDER BY day DESC LIMIT 1) AS before,
+                    (SELECT {currency} FROM price_points WHERE card = c.id AND day <= :end
+                     ORDER BY day DESC LIMIT 1) AS after
+                FROM price_cards c {'WHERE c.watched = 1' if watched_only else ''}
+            )
+            WHERE before >= :min_price AND after IS NOT NULL
+            ORDER BY change {'ASC' if falling else 'DESC'}
+            LIMIT :limit
+        """, {'start': to_day(start), 'end': to_day(end), 'min_price': round(min_price * 100), 'limit': limit})
+
+        return [
+            {'id': scryfall_id, 'name': name, 'before': before / 100, 'after': after / 100,
+             'percent_change': round(change, 2)}
+            for scryfall_id, name, before, after, change in rows
+        ]
+
+
+# -------------------------------------------------------------------
+# SNAPSHOTS AGENDADOS
+# -------------------------------------------------------------------
+class PriceTracker:
+    """
+    Tira um snapshot diário dos preços, em uma thread em segundo plano:
+    - 'watched': só as cartas acompanhadas, via /cards/collection
+    - 'bulk': todas as cartas, pelo arquivo bulk da Scryfall (atualizado
+      uma vez por dia por eles)
+    Com vários workers, só um grava o snapshot de cada dia (claim_snapshot).
+    """
+
+    def __init__(self, store, source='watched', bulk_path='./data/default-cards.json', check_interval=15 * 60):
+        if source not in ('watched', 'bulk'):
+            raise ValueError(f"Unknown price snapshot source: {source}")
+        self.store = store
+        self.source = source
+        self.bulk_path = bulk_path
+        self.check_interval = check_interval
+
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_env():
+        """
+        Cria o rastreador a partir das variáveis de ambiente:
+        PRICE_DB (obrigatória; sem ela retorna None), PRICE_SNAPSHOT_SOURCE
+        (watched ou bulk) e PRICE_BULK_PATH.
+        """
+        if not os.environ.get("PRICE_DB"):
+            return None
+        return PriceTracker(
+            PriceStore(os.environ["PRICE_DB"]),
+            source=os.environ.get("PRICE_SNAPSHOT_SOURCE", "watched"),
+            bulk_path=os.environ.get("PRICE_BULK_PATH", "./data/default-cards.json")
+        )
+
+    def snapshot(self, day=None, bulk_path=None):
+        """
+        Tira o snapshot do dia agora (se ainda não foi tirado).
+        Com bulk_path, usa esse arquivo em vez de baixar o mais recente.
+        Retorna o resultado de PriceStore.record ou None se já existia.
+        """
+        from card_index import iter_bulk_cards, download_bulk_file
+        from scryfall import Scryfall
+
+        day = to_day(day)
+        if not self.store.claim_snapshot(day, self.source):
+            return None
+
+        started = time.time()
+        try:
+            if self.source == 'bulk':
+                if bulk_path is None:
+                    bulk_path = download_bulk_file(self.bulk_path)
+                result = self.store.record(iter_bulk_cards(bulk_path), day)
+            else:
+                result = self.store.record(Scryfall.get_collection(self.store.watched()), day)
+        except Exception:
+            self.store.release_snapshot(day, self.source)
+            raise
+
+        self.store.finish_snapshot(day, self.source, result)
+        logger.info("Price snapshot (%s): %d cards, %d changed, %.1fs",
+                    self.source, result['cards'], result['changed'], time.time() - started)
+        return result
+
+    def start(self):
+        """Inicia a thread de snapshots (uma por processo/worker do gunicorn)."""
+        pid = os.getpid()
+        if self._thread_pid == pid:
+            return
+
+        with self._lock:
+            if self._thread_pid != pid:
+                self._thread = threading.Thread(target=self._schedule_loop, name='price-tracker', daemon=True)
+                self._thread_pid = pid
+                self._thread.start()
+
+    def _schedule_loop(self):
+        while True:
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error("Error taking price snapshot: %s", e)
+            time.sleep(self.check_interval)
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Uso: python price_tracking.py <prices.db> snapshot [--bulk <bulk.json>] [--date AAAA-MM-DD]
+    #      python price_tracking.py <prices.db> history <card_id> [--from AAAA-MM-DD]
+    if len(sys.argv) < 3 or sys.argv[2] not in ('snapshot', 'history'):
+        print("Usage: python price_tracking.py <prices.db> snapshot [--bulk <bulk.json>] [--date YYYY-MM-DD]\n"
+              "       python price_tracking.py <prices.db> history <card_id> [--from YYYY-MM-DD]")
+        sys.exit(1)
+
+    def option(name):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else None
+
+    price_store = PriceStore(sys.argv[1])
+    if sys.argv[2] == 'snapshot':
+        tracker = PriceTracker(price_store, source='bulk' if '--bulk' in sys.argv else 'watched')
+        print(tracker.snapshot(option('--date'), bulk_path=option('--bulk')) or "Snapshot already taken for this day")
+    else:
+        for point in price_store.history(sys.argv[3], option('--from')) or []:
+            print(point)
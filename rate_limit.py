@@ -0,0 +1,360 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import sqlite3
+import tempfile
+import threading
+from email.utils import parsedate_to_datetime
+import requests
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Respostas que indicam limite excedido ou indisponibilidade passageira
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+# -------------------------------------------------------------------
+# BALDE DE FICHAS (TOKEN BUCKET)
+# -------------------------------------------------------------------
+class MemoryTokenBucket:
+    """
+    Balde de fichas em memória (limite por processo): `rate` fichas por
+    segundo, acumulando no máximo `burst`. Cada requisição reserva uma ficha;
+    sem fichas, espera a próxima. As reservas são feitas na ordem de chegada
+    (o saldo pode ficar negativo), então ninguém espera indefinidamente.
+    """
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, timeout=None):
+        """
+        Reserva uma ficha sem esperar. Retorna quantos segundos faltam para
+        ela valer (0 se já vale), ou None se passaria de `timeout`
+        (nesse caso nada é reservado). Usado também pelo código assíncrono.
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            wait = max(0.0, (1 - tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return None
+            self._tokens = tokens - 1
+            self._updated_at = now
+            return wait
+
+    def acquire(self, timeout=None):
+        """
+        Espera uma ficha. Retorna o tempo esperado (s), ou None se a espera
+        passaria de `timeout` (nesse caso nada é reservado).
+        """
+        wait = self.reserve(timeout)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Esvazia o balde por `seconds` segundos (ex: o servidor pediu Retry-After)."""
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self._updated_at = time.monotonic()
+
+
+class SQLiteTokenBucket:
+    """
+    Balde de fichas guardado em SQLite, compartilhado por todos os workers
+    do gunicorn da mesma máquina: o limite vale para o servidor inteiro,
+    não para cada processo. Cada reserva é uma transação curta (BEGIN IMMEDIATE).
+    """
+
+    def __init__(self, name, rate, burst, db_path):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.db_path = db_path
+        self._local = threading.local()
+
+        conn = self._db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS token_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                         (name, burst, time.time()))
+
+    def _db(self):
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != pid:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # O saldo do balde não precisa sobreviver a uma queda de energia
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def _update(self, change):
+        """Aplica change(saldo atual) -> (novo saldo, retorno) numa transação exclusiva."""
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+            tokens, result = change(tokens)
+            conn.execute("INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                         (self.name, tokens, now))
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reserve(self, timeout=None):
+        def take(tokens):
+            wait = max(0.0, (1 - tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return tokens, None
+            return tokens - 1, wait
+
+        return self._update(take)
+
+    def acquire(self, timeout=None):
+        wait = self.reserve(timeout)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        self._update(lambda tokens: (min(tokens, -seconds * self.rate), None))
+
+
+def bucket_from_env(name, rate, burst):
+    """
+    Cria o balde `name`: compartilhado entre os workers em RATE_LIMIT_DB
+    (padrão: um arquivo na pasta temporária) ou, com RATE_LIMIT_SHARED=0,
+    só em memória (cada processo com o limite inteiro).
+    """
+    if os.environ.get("RATE_LIMIT_SHARED", "1") == "0":
+        return MemoryTokenBucket(name, rate, burst)
+
+    db_path = os.environ.get("RATE_LIMIT_DB") or os.path.join(tempfile.gettempdir(), 'cardtrader_hub_rate_limits.db')
+    try:
+        return SQLiteTokenBucket(name, rate, burst, db_path)
+    except sqlite3.Error as e:
+        logger.warning("Shared rate limiter unavailable (%s), using a per-process limit for %s", e, name)
+        return MemoryTokenBucket(name, rate, burst)
+
+
+# -------------------------------------------------------------------
+# RETENTATIVAS COM ESPERA ALEATÓRIA
+# -------------------------------------------------------------------
+def retry_after_seconds(response):
+    """Segundos pedidos no cabeçalho Retry-After (número ou data HTTP), ou None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(response, bucket, attempt, backoff, max_backoff, max_retry_after):
+    """
+    Quanto esperar antes de repetir a requisição que recebeu `response`,
+    ou None se ela não deve ser repetida (a resposta vale como está).
+    """
+    if response.status_code not in RETRY_STATUSES:
+        return None
+
+    delay = retry_after_seconds(response)
+    if delay is None:
+        delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+
+    if response.status_code == 429:
+        logger.warning("Rate limited by %s (retry in %.1fs)", response.url, delay)
+        if bucket is not None:
+            # As próximas fichas (deste e dos outros workers) só saem depois da pausa
+            bucket.pause(min(delay, max_retry_after))
+
+    if delay > max_retry_after:
+        return None
+    if response.status_code == 429 and bucket is not None:
+        return 0  # A pausa do balde já faz a espera
+    return delay
+
+
+def request_with_retry(send, bucket=None, retries=3, backoff=0.5, max_backoff=8.0, max_retry_after=30.0):
+    """
+    Executa send() (que faz a requisição e retorna a resposta) respeitando
+    o balde de fichas e tentando de novo em 429/502/503/504 e erros de conexão.
+
+    A espera entre tentativas é o Retry-After do servidor ou, sem ele, um
+    valor aleatório entre 0 e backoff * 2^tentativa (limitado a max_backoff),
+    para que vários workers não tentem de novo ao mesmo tempo. Um 429 pausa
+    o balde, segurando também os outros workers. Se o servidor pedir mais
+    que max_retry_after, a resposta é devolvida sem nova tentativa.
+    """
+    upstream = bucket.name if bucket is not None else 'http'
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            metrics.rate_limit_wait_seconds.observe(bucket.acquire(), upstream)
+
+        started = time.perf_counter()
+        try:
+            response = send()
+        except requests.exceptions.ConnectionError:
+            metrics.observe_upstream(upstream, 'error', time.perf_counter() - started)
+            if attempt == retries:
+                raise
+            time.sleep(random.uniform(0, min(max_backoff, backoff * 2 ** attempt)))
+            continue
+        metrics.observe_upstream(upstream, response.status_code, time.perf_counter() - started)
+
+        delay = _retry_delay(response, bucket, attempt, backoff, max_backoff, max_retry_after) if attempt < retries else None
+        if delay is None:
+            return response
+
+        response.close()
+        time.sleep(delay)
+
+
+async def async_request_with_retry(send, bucket=None, retries=3, backoff=0.5, max_backoff=8.0, max_retry_after=30.0,
+                                   connection_errors=(OSError,)):
+    """
+    Versão assíncrona de request_with_retry: `send` é uma corrotina
+    (ex: um GET do httpx.AsyncClient) e as esperas não bloqueiam o event loop.
+    As operações no balde (SQLite, compartilhado entre os workers) rodam
+    numa thread. `connection_errors` são as exceções de conexão do cliente usado.
+    """
+    upstream = bucket.name if bucket is not None else 'http'
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            wait = await asyncio.to_thread(bucket.reserve)
+            metrics.rate_limit_wait_seconds.observe(wait, upstream)
+            if wait:
+                await asyncio.sleep(wait)
+
+        started = time.perf_counter()
+        try:
+            response = await send()
+        except connection_errors:
+            metrics.observe_upstream(upstream, 'error', time.perf_counter() - started)
+            if attempt == retries:
+                raise
+            await asyncio.sleep(random.uniform(0, min(max_backoff, backoff * 2 ** attempt)))
+            continue
+        metrics.observe_upstream(upstream, response.status_code, time.perf_counter() - started)
+
+        if attempt == retries or response.status_code not in RETRY_STATUSES:
+            return response
+        # Um 429 pausa o balde: também vai para uma thread
+        delay = await asyncio.to_thread(_retry_delay, response, bucket, attempt, backoff, max_backoff, max_retry_after)
+        if delay is None:
+            return response
+        await asyncio.sleep(delay)
+
+
+# -------------------------------------------------------------------
+# AGRUPAMENTO DE REQUISIÇÕES IGUAIS (SINGLE-FLIGHT)
+# -------------------------------------------------------------------
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas iguais simultâneas: enquanto uma chamada com a mesma
+    chave está em andamento, as outras threads esperam por ela e recebem
+    o mesmo resultado (ou a mesma exceção), em vez de repetir a requisição.
+    Vale dentro de um processo; entre workers, o cache em disco cumpre esse papel.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight para corrotinas: chamadas iguais simultâneas no mesmo
+    event loop aguardam a primeira e recebem o mesmo resultado.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, function):
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield: o cancelamento de quem espera não cancela a chamada original
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evita o aviso "exception was never retrieved" quando ninguém esperava
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
@@ -0,0 +1,277 @@
+import os
+import copy
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from card_detection import process_image_for_recognition
+from card_recognition import CardRecognition
+from scryfall import Scryfall
+
+# Estágios executados por cada job, em ordem
+STAGES = ('process_image', 'ocr', 'lookup')
+
+
+class QueueFullError(Exception):
+    """Lançada quando a fila de reconhecimento atingiu o limite."""
+
+
+# -------------------------------------------------------------------
+# ARMAZENAMENTO DOS JOBS
+# -------------------------------------------------------------------
+class MemoryJobStore:
+    """
+    Guarda os jobs em memória (válido só para o processo que os criou).
+    """
+
+    def __init__(self, ttl=15 * 60):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job['id']] = copy.deepcopy(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def prune(self):
+        """Remove jobs finalizados há mais tempo que o TTL."""
+        limit = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.get('finished_at') and job['finished_at'] < limit]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """
+    Guarda os jobs em um arquivo SQLite, permitindo que qualquer
+    worker do gunicorn responda à consulta de status.
+    """
+
+    def __init__(self, db_path, ttl=15 * 60):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._local = threading.local()
+
+        conn = self._db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS recognition_jobs (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def _db(self):
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != pid:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = pid
+        return conn
+
+    def save(self, job):
+        conn = self._db()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO recognition_jobs (id, data, updated_at) VALUES (?, ?, ?)",
+                (job['id'], json.dumps(job), time.time())
+            )
+
+    def get(self, job_id):
+        row = self._db().execute("SELECT data FROM recognition_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune(self):
+        conn = self._db()
+        with conn:
+            conn.execute("DELETE FROM recognition_jobs WHERE updated_at < ?", (time.time() - self.ttl,))
+
+
+# -------------------------------------------------------------------
+# PIPELINE DE RECONHECIMENTO
+# -------------------------------------------------------------------
+class RecognitionPipeline:
+    """
+    Executa o reconhecimento (processamento da imagem -> OCR -> Scryfall)
+    em um pool de threads limitado. O upload recebe um ID de job na hora
+    e o resultado é consultado depois. A imagem fica em memória até o job
+    rodar (no máximo max_pending uploads), sem passar pelo disco.
+    """
+
+    def __init__(self, workers=4, max_pending=32, store=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.store = store or MemoryJobStore()
+
+        self._executor = None
+        self._executor_pid = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+        # Estatísticas agregadas por estágio (neste processo)
+        self._stats = {
+            'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0,
+            'stage_ms': {stage: 0.0 for stage in ('queue',) + STAGES}
+        }
+
+    @staticmethod
+    def from_env(default_db_path='recognition_jobs.db'):
+        """
+        Cria o pipeline a partir das variáveis de ambiente:
+        RECOGNITION_WORKERS, RECOGNITION_QUEUE_SIZE e RECOGNITION_JOBS_DB
+        (padrão: `default_db_path`, para que qualquer worker responda ao status).
+        RECOGNITION_JOBS_STORE=memory guarda os jobs só no processo (um único worker).
+        """
+        if os.environ.get("RECOGNITION_JOBS_STORE", "sqlite") == "memory":
+            store = MemoryJobStore()
+        else:
+            store = SQLiteJobStore(os.environ.get("RECOGNITION_JOBS_DB") or default_db_path)
+        return RecognitionPipeline(
+            workers=int(os.environ.get("RECOGNITION_WORKERS", "4")),
+            max_pending=int(os.environ.get("RECOGNITION_QUEUE_SIZE", "32")),
+            store=store
+        )
+
+    def _get_executor(self):
+        # O pool é criado sob demanda para não atravessar o fork do gunicorn
+        pid = os.getpid()
+        if self._executor is None or self._executor_pid != pid:
+            with self._lock:
+                if self._executor is None or self._executor_pid != pid:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix='recognition'
+                    )
+                    self._executor_pid = pid
+                    self._slots = threading.BoundedSemaphore(self.max_pending)
+        return self._executor
+
+    def submit(self, image, formats=None):
+        """
+        Enfileira o reconhecimento de uma imagem (`image`: bytes do upload).
+        `formats` restringe os formatos que o Pillow tenta (ex: [sniff_image_format(...)]).
+        Retorna o job criado ou lança QueueFullError se a fila estiver cheia.
+        """
+        executor = self._get_executor()
+
+        # Controle de fluxo: recusa em vez de acumular uploads sem limite
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise QueueFullError("Recognition queue is full")
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'created_at': time.time(),
+            'finished_at': None,
+            'timings_ms': {},
+            'identifier': None,
+            'card_id': None,
+            'card_name': None,
+            'error': None
+        }
+        self.store.save(job)
+        self.store.prune()
+
+        with self._lock:
+            self._stats['submitted'] += 1
+
+        # Cópia para o chamador: o dict original é alterado pela thread do job
+        snapshot = dict(job)
+        try:
+            executor.submit(self._run, job, image, formats)
+        except RuntimeError:
+            self._slots.release()
+            raise
+        return snapshot
+
+    def get(self, job_id):
+        """Retorna o estado atual de um job ou None."""
+        return self.store.get(job_id)
+
+    def _run(self, job, image, formats):
+        started = time.perf_counter()
+        job['timings_ms']['queue'] = round((time.time() - job['created_at']) * 1000, 1)
+        job['status'] = 'running'
+        self.store.save(job)
+
+        try:
+            # 1. Redimensiona, comprime e analisa a carta (em memória)
+            stage_start = time.perf_counter()
+            image_bytes, analysis = process_image_for_recognition(image, formats)
+            job['timings_ms']['process_image'] = round((time.perf_counter() - stage_start) * 1000, 1)
+
+            # 2. OCR
+            stage_start = time.perf_counter()
+            identifier = CardRecognition.identify_card_from_bytes(image_bytes, analysis, detect=False)
+            job['timings_ms']['ocr'] = round((time.perf_counter() - stage_start) * 1000, 1)
+            job['identifier'] = identifier
+
+            if not identifier:
+                job['status'] = 'failed'
+                job['error'] = 'Could not identify the card from the image'
+            else:
+                # 3. Busca na Scryfall
+                stage_start = time.perf_counter()
+                card_data = Scryfall.search_card(identifier)
+                job['timings_ms']['lookup'] = round((time.perf_counter() - stage_start) * 1000, 1)
+
+                if card_data == "Not found":
+                    job['status'] = 'failed'
+                    job['error'] = 'Card not found in Scryfall database'
+                else:
+                    job['status'] = 'done'
+                    job['card_id'] = card_data['id']
+                    job['card_name'] = card_data['name']
+
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = f'Error processing image: {str(e)}'
+
+        finally:
+            job['timings_ms']['total'] = round((time.perf_counter() - started) * 1000, 1)
+            job['finished_at'] = time.time()
+            self.store.save(job)
+            self._record(job)
+            self._slots.release()
+
+    def _record(self, job):
+        with self._lock:
+            self._stats['completed' if job['status'] == 'done' else 'failed'] += 1
+            for stage, elapsed in job['timings_ms'].items():
+                if stage in self._stats['stage_ms']:
+                    self._stats['stage_ms'][stage] += elapsed
+
+    def stats(self):
+        """
+        Estatísticas do pipeline neste processo, incluindo
+        o tempo médio de cada estágio em milissegundos.
+        """
+        with self._lock:
+            finished = self._stats['completed'] + self._stats['failed']
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'submitted': self._stats['submitted'],
+                'rejected': self._stats['rejected'],
+                'completed': self._stats['completed'],
+                'failed': self._stats['failed'],
+                'in_flight': self._stats['submitted'] - finished,
+                'avg_stage_ms': {
+                    stage: round(total / finished, 1) if finished else 0.0
+                    for stage, total in self._stats['stage_ms'].items()
+                }
+            }
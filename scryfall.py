@@ -1,59 +1,424 @@
+import os
+import json
+import time
+import logging
+import threading
 import requests
-from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from card_cache import CardCache, SearchCache
+from card_index import CardIndex
+from fuzzy_match import FuzzyMatcher
+from set_codes import SetCodeTable
+from rate_limit import bucket_from_env, request_with_retry, SingleFlight
+
+logger = logging.getLogger(__name__)
 
 class Scryfall:
     # URL base da API Scryfall
-    BASE_URL = "https://api.scryfall.com"
+    BASE_URL = os.environ.get("SCRYFALL_BASE_URL", "https://api.scryfall.com").rstrip('/')
 
     # Cabeçalho (caso queira passar API headers no futuro)
     header = {}
 
+    # A Scryfall pede User-Agent e Accept explícitos
+    DEFAULT_HEADERS = {
+        "User-Agent": "CardtraderHub/1.0",
+        "Accept": "application/json"
+    }
+
+    # Configuração do pool de conexões (ajustável por variáveis de ambiente)
+    POOL_SIZE = int(os.environ.get("SCRYFALL_POOL_SIZE", "10"))
+    CONNECT_TIMEOUT = float(os.environ.get("SCRYFALL_CONNECT_TIMEOUT", "3.05"))
+    READ_TIMEOUT = float(os.environ.get("SCRYFALL_READ_TIMEOUT", "10"))
+
+    # Limite de requisições à API (a Scryfall pede no máximo ~10 por segundo),
+    # compartilhado entre os workers; requisições iguais simultâneas viram uma só
+    RATE_LIMIT = float(os.environ.get("SCRYFALL_RATE_LIMIT", "10"))
+    rate_limiter = bucket_from_env("scryfall", RATE_LIMIT, burst=RATE_LIMIT)
+    _inflight = SingleFlight()
+
+    # Sessão HTTP compartilhada (uma por processo/worker do gunicorn)
+    _session = None
+    _session_pid = None
+    _session_lock = threading.Lock()
+
+    # Cache local de cartas (LRU em memória + SQLite opcional)
+    cache = CardCache.from_env()
+
+    # Busca paginada: a Scryfall devolve até 175 cartas por página da API;
+    # o site mostra SEARCH_PAGE_SIZE por página e busca as da API sob demanda
+    SEARCH_PAGE_SIZE = int(os.environ.get("SCRYFALL_SEARCH_PAGE_SIZE", "30"))
+    API_PAGE_SIZE = 175
+
+    # Máximo de identificadores por requisição em /cards/collection
+    COLLECTION_BATCH = 75
+    search_cache = SearchCache.from_env()
+
+    # Índice local opcional montado a partir do arquivo bulk da Scryfall
+    index = None
+
+    # Busca aproximada local de nomes (criada sob demanda)
+    FUZZY_CATALOG = os.environ.get("SCRYFALL_FUZZY_CATALOG", "1") != "0"
+    _matcher = None
+    _matcher_failed_at = 0
+    _matcher_lock = threading.Lock()
+
+    # Tabela local de códigos de set (índice local, arquivo SET_CODES_PATH ou /sets, uma vez por worker)
+    SET_CODES_PATH = os.environ.get("SET_CODES_PATH")
+    SET_CATALOG = os.environ.get("SCRYFALL_SET_CATALOG", "1") != "0"
+    _set_codes = None
+    _set_codes_failed_at = 0
+
+    # Quantos candidatos (set + número) do reconhecimento são consultados de uma vez
+    CANDIDATE_LOOKUPS = 5
+
+    @staticmethod
+    def use_index(index):
+        """
+        Define o índice local consultado antes de qualquer chamada remota.
+        """
+        with Scryfall._matcher_lock:
+            Scryfall.index = index
+            Scryfall._matcher = None
+            Scryfall._set_codes = None
+
+    @staticmethod
+    def _create_session():
+        """
+        Cria uma sessão com pool de conexões keep-alive para a Scryfall.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=Scryfall.POOL_SIZE,
+            pool_block=True  # Limita o número de conexões abertas ao tamanho do pool
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        session.headers.update(Scryfall.DEFAULT_HEADERS)
+        return session
+
+    @staticmethod
+    def get_session():
+        """
+        Retorna a sessão compartilhada, criando uma nova se necessário.
+        A sessão é recriada após um fork (cada worker tem seus próprios sockets).
+        """
+        pid = os.getpid()
+        if Scryfall._session is None or Scryfall._session_pid != pid:
+            with Scryfall._session_lock:
+                if Scryfall._session is None or Scryfall._session_pid != pid:
+                    Scryfall._session = Scryfall._create_session()
+                    Scryfall._session_pid = pid
+        return Scryfall._session
+
+    @staticmethod
+    def configure(base_url=None, pool_size=None, connect_timeout=None, read_timeout=None):
+        """
+        Altera a configuração do cliente e descarta a sessão atual.
+        """
+        with Scryfall._session_lock:
+            if base_url is not None:
+                Scryfall.BASE_URL = base_url.rstrip('/')
+            if pool_size is not None:
+                Scryfall.POOL_SIZE = pool_size
+            if connect_timeout is not None:
+                Scryfall.CONNECT_TIMEOUT = connect_timeout
+            if read_timeout is not None:
+                Scryfall.READ_TIMEOUT = read_timeout
+
+            if Scryfall._session is not None:
+                Scryfall._session.close()
+            Scryfall._session = None
+            Scryfall._session_pid = None
+
+    @staticmethod
+    def _request(method, path, **kwargs):
+        """
+        Faz a requisição reaproveitando as conexões do pool, dentro do limite
+        de requisições e com novas tentativas em 429/5xx (ver request_with_retry).
+        Requisições iguais em andamento ao mesmo tempo são feitas uma única
+        vez e todas recebem a mesma resposta.
+        """
+        key = (method, path, json.dumps(kwargs, sort_keys=True))
+
+        def send():
+            return Scryfall.get_session().request(
+                method,
+                f"{Scryfall.BASE_URL}{path}",
+                headers=Scryfall.header,
+                timeout=(Scryfall.CONNECT_TIMEOUT, Scryfall.READ_TIMEOUT),
+                **kwargs
+            )
+
+        return Scryfall._inflight.do(key, lambda: request_with_retry(send, Scryfall.rate_limiter))
+
+    @staticmethod
+    def _get(path, params=None):
+        """
+        Faz um GET na API.
+        """
+        return Scryfall._request("GET", path, params=params)
+
+    @staticmethod
+    def _post(path, payload):
+        """
+        Faz um POST com corpo JSON na API (ex: /cards/collection).
+        """
+        return Scryfall._request("POST", path, json=payload)
+
+    @staticmethod
+    def download_image(image_url):
+        """
+        Baixa uma imagem de carta (ex: image_uris.large) pela sessão
+        compartilhada e dentro do mesmo limite de requisições da API.
+        Retorna os bytes; lança requests.HTTPError se a resposta não for 200.
+        """
+        def send():
+            return Scryfall.get_session().get(
+                image_url,
+                headers={'Accept': 'image/*'},
+                timeout=(Scryfall.CONNECT_TIMEOUT, Scryfall.READ_TIMEOUT)
+            )
+
+        response = Scryfall._inflight.do(('GET', image_url), lambda: request_with_retry(send, Scryfall.rate_limiter))
+        response.raise_for_status()
+        return response.content
+
+    @staticmethod
+    def get_matcher():
+        """
+        Retorna o matcher de nomes local. Usa os nomes do índice local ou,
+        sem índice, o catálogo /catalog/card-names (uma chamada por worker).
+        """
+        if Scryfall._matcher is not None:
+            return Scryfall._matcher
+
+        with Scryfall._matcher_lock:
+            if Scryfall._matcher is None:
+                if Scryfall.index is not None:
+                    Scryfall._matcher = FuzzyMatcher.from_index(Scryfall.index)
+                elif Scryfall.FUZZY_CATALOG and time.time() - Scryfall._matcher_failed_at > 300:
+                    try:
+                        response = Scryfall._get("/catalog/card-names")
+                        response.raise_for_status()
+                        Scryfall._matcher = FuzzyMatcher(response.json()['data'])
+                    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                        # Tenta de novo só depois de alguns minutos
+                        logger.warning("Could not load card name catalog: %s", e)
+                        Scryfall._matcher_failed_at = time.time()
+        return Scryfall._matcher
+
+    @staticmethod
+    def get_set_codes():
+        """
+        Retorna a tabela de códigos de set (set_codes.SetCodeTable) ou None.
+        Usa os sets do índice local, o arquivo SET_CODES_PATH ou, sem eles,
+        a lista /sets da API (salva em SET_CODES_PATH, se configurado).
+        """
+        if Scryfall._set_codes is not None:
+            return Scryfall._set_codes
+
+        with Scryfall._matcher_lock:
+            if Scryfall._set_codes is None:
+                if Scryfall.index is not None:
+                    Scryfall._set_codes = SetCodeTable.from_index(Scryfall.index)
+                elif Scryfall.SET_CODES_PATH and os.path.exists(Scryfall.SET_CODES_PATH):
+                    Scryfall._set_codes = SetCodeTable.load(Scryfall.SET_CODES_PATH)
+                elif Scryfall.SET_CATALOG and time.time() - Scryfall._set_codes_failed_at > 300:
+                    try:
+                        response = Scryfall._get("/sets")
+                        response.raise_for_status()
+                        Scryfall._set_codes = SetCodeTable.from_sets(response.json()['data'])
+                        if Scryfall.SET_CODES_PATH:
+                            Scryfall._set_codes.save(Scryfall.SET_CODES_PATH)
+                    except (requests.exceptions.RequestException, ValueError, KeyError, OSError) as e:
+                        logger.warning("Could not load set codes: %s", e)
+                        Scryfall._set_codes_failed_at = time.time()
+        return Scryfall._set_codes
+
+    # -------------------------------
+    # CANDIDATOS DO RECONHECIMENTO
+    # -------------------------------
+
+    @staticmethod
+    def _find_set_number_local(set_code, number):
+        """Carta por set + número no índice local ou no cache (sem chamada remota)."""
+        if Scryfall.index is not None:
+            card_data = Scryfall.index.get_by_set_number(set_code, number)
+            if card_data is not None:
+                return card_data
+        return Scryfall.cache.get_by_set_number(set_code, number)
+
+    @staticmethod
+    def _set_number_candidates(card):
+        """
+        Candidatos (set + número) do identificador, do mais provável para o
+        menos: a lista 'candidates' do reconhecimento ou o próprio set/número.
+        """
+        candidates = card.get('candidates') or [card]
+        return [candidate for candidate in candidates
+                if candidate.get('set') and candidate.get('number')][:Scryfall.CANDIDATE_LOOKUPS]
+
+    @staticmethod
+    def _resolve_candidates_local(candidates):
+        """
+        Procura os candidatos em ordem no índice local e no cache.
+        Retorna (carta do melhor candidato encontrado ou None,
+        candidatos mais prováveis que ele que ainda precisam da API).
+        """
+        pending = []
+        for candidate in candidates:
+            card_data = Scryfall._find_set_number_local(candidate['set'], candidate['number'])
+            if card_data is not None:
+                return card_data, pending
+            pending.append(candidate)
+        return None, pending
+
+    @staticmethod
+    def _collection_payload(candidates):
+        return {"identifiers": [{"set": candidate['set'].lower(), "collector_number": candidate['number']}
+                                for candidate in candidates]}
+
+    @staticmethod
+    def _pick_from_collection(candidates, cards):
+        """
+        Guarda no cache as cartas devolvidas por /cards/collection e retorna
+        a do candidato mais provável entre as encontradas (ou None).
+        """
+        found = {}
+        for card_data in cards:
+            key = CardCache.set_number_key(card_data.get('set', ''), card_data.get('collector_number', ''))
+            Scryfall.cache.put_card(card_data, key)
+            found[key] = card_data
+
+        for candidate in candidates:
+            card_data = found.get(CardCache.set_number_key(candidate['set'], candidate['number']))
+            if card_data is not None:
+                logger.debug("Resolved candidate %s %s", candidate['set'], candidate['number'])
+                return card_data
+        return None
+
+    @staticmethod
+    def _resolve_candidates(card):
+        """
+        Resolve os candidatos (set + número) do identificador: primeiro no
+        índice local e no cache e, para os que faltarem, uma única requisição
+        a /cards/collection (em vez de um GET por candidato). Com um só
+        candidato, usa o GET /cards/{set}/{número}.
+        """
+        local, pending = Scryfall._resolve_candidates_local(Scryfall._set_number_candidates(card))
+        if not pending:
+            return local
+
+        if len(pending) == 1:
+            candidate = pending[0]
+            logger.debug("Searching for card with set: %s and number: %s", candidate['set'], candidate['number'])
+            response = Scryfall._get(f"/cards/{candidate['set']}/{candidate['number']}")
+            if response.status_code == 200:
+                card_data = response.json()
+                Scryfall.cache.put_card(card_data, CardCache.set_number_key(candidate['set'], candidate['number']))
+                return card_data
+            return local
+
+        logger.debug("Searching for %d candidates in one collection request", len(pending))
+        response = Scryfall._post("/cards/collection", Scryfall._collection_payload(pending))
+        if response.status_code != 200:
+            logger.warning("Card collection request failed: HTTP %s", response.status_code)
+            return local
+        return Scryfall._pick_from_collection(pending, response.json()['data']) or local
+
+    @staticmethod
+    def _search_exact_name(name, query_name):
+        """
+        Busca uma carta pelo nome exato (índice, cache e por último a API).
+        """
+        if Scryfall.index is not None:
+            card_data = Scryfall.index.get_by_name(name)
+            if card_data is not None:
+                return card_data
+
+        cached = Scryfall.cache.get_by_name(name)
+        if cached is not None:
+            return cached
+
+        response = Scryfall._get("/cards/named", params={"exact": name})
+        if response.status_code == 200:
+            card_data = response.json()
+            Scryfall.cache.put_card(card_data, CardCache.name_key(query_name))
+            return card_data
+        return None
+
     @staticmethod
     def get_random_card():
         """
         Busca uma carta aleatória na API da Scryfall.
         """
+        # Com índice local, sorteia sem chamada remota
+        if Scryfall.index is not None:
+            card_data = Scryfall.index.random_card()
+            if card_data is not None:
+                return card_data
+
         # Faz requisição GET para /cards/random
-        response = requests.get(f"{Scryfall.BASE_URL}/cards/random", headers=Scryfall.header)
+        response = Scryfall._get("/cards/random")
 
-        # Se deu tudo certo, retorna JSON
+        # Se deu tudo certo, guarda no cache e retorna JSON
         if response.status_code == 200:
-            return response.json()
+            card_data = response.json()
+            Scryfall.cache.put_card(card_data)
+            return card_data
         else:
             return "Not found"
         
     @staticmethod
     def search_card(card):
         """
-        Busca uma carta tentando primeiro por set + number,
-        caso falhe, tenta buscar por nome da carta.
+        Busca uma carta tentando primeiro pelo ID da Scryfall (quando o
+        reconhecimento por imagem já o encontrou), depois por set + number
+        (todos os candidatos do reconhecimento, em 'candidates') e, caso
+        falhe, pelo nome da carta.
         """
-        # Verifica se existem informações de set e number
-        if card['number'] and card['set']:
-            print(f"Searching for card with set: {card['set']} and number: {card['number']}")
-
-            # Faz requisição direta para /cards/{set}/{number}
-            response = requests.get(
-                f"{Scryfall.BASE_URL}/cards/{card['set']}/{card['number']}", 
-                headers=Scryfall.header
-            )
+        if card.get('id'):
+            card_data = Scryfall.search_unique_card(card['id'])
+            if card_data != "Not found":
+                return card_data
 
-            # Se encontrou, retorna a carta
-            if response.status_code == 200:
-                return response.json()
+        # Candidatos de set + número (índice/cache e, para o resto, uma requisição só)
+        card_data = Scryfall._resolve_candidates(card)
+        if card_data is not None:
+            return card_data
 
         # Caso não tenha set/number ou tenha falhado, tenta fuzzy search por nome
-        print(f"Searching for card with name: {card['name']}")
+        logger.debug("Searching for card with name: %s", card['name'])
 
-        response = requests.get(
-            f"{Scryfall.BASE_URL}/cards/named",
-            params={"fuzzy": card['name']},
-            headers=Scryfall.header
-        )
+        if Scryfall.index is not None:
+            card_data = Scryfall.index.get_by_name(card['name'])
+            if card_data is not None:
+                return card_data
+
+        cached = Scryfall.cache.get_by_name(card['name'])
+        if cached is not None:
+            return cached
+
+        # Busca aproximada local: corrige erros de OCR sem a chamada fuzzy remota
+        matcher = Scryfall.get_matcher()
+        if matcher is not None:
+            best_name = matcher.best(card['name'])
+            if best_name is not None:
+                logger.debug("Local fuzzy match: %s", best_name)
+                card_data = Scryfall._search_exact_name(best_name, card['name'])
+                if card_data is not None:
+                    return card_data
+
+        response = Scryfall._get("/cards/named", params={"fuzzy": card['name']})
 
-        # Retorna resultado se sucesso
+        # Retorna resultado se sucesso (o nome pesquisado também vira chave do cache)
         if response.status_code == 200:
-            return response.json()
+            card_data = response.json()
+            Scryfall.cache.put_card(card_data, CardCache.name_key(card['name']))
+            return card_data
         else:
             return "Not found"
     
@@ -62,39 +427,177 @@ class Scryfall:
         """
         Busca uma carta pelo ID único da Scryfall.
         """
-        response = requests.get(
-            f"{Scryfall.BASE_URL}/cards/{card_id}", 
-            headers=Scryfall.header
-        )
+        if Scryfall.index is not None:
+            card_data = Scryfall.index.get_card(card_id)
+            if card_data is not None:
+                return card_data
+
+        cached = Scryfall.cache.get_card(card_id)
+        if cached is not None:
+            return cached
+
+        response = Scryfall._get(f"/cards/{card_id}")
 
         # Retorna JSON se sucesso
         if response.status_code == 200:
-            return response.json()
+            card_data = response.json()
+            Scryfall.cache.put_card(card_data)
+            return card_data
         else:
             return "Not found"
 
     @staticmethod
-    def search_card_by_query(query):
+    def card_version(card_id):
         """
-        Busca cartas usando qualquer termo textual.
-        A Scryfall permite consultas completas no parâmetro ?q=.
+        Versão da carta já buscada (ex: para ETag), sem serializá-la: o
+        checksum no índice local ou o momento em que entrou no cache.
+        Retorna None se a carta não está em nenhum dos dois.
         """
-        # Tratamento da query para URL segura
-        formatted_query = quote(query)
+        if Scryfall.index is not None:
+            checksum = Scryfall.index.checksum(card_id)
+            if checksum is not None:
+                return f"i{checksum:08x}"
+        fetched_at = Scryfall.cache.fetched_at(card_id)
+        return f"c{int(fetched_at * 1000):x}" if fetched_at else None
 
-        # Faz requisição para /cards/search?q=
-        response = requests.get(
-            f"{Scryfall.BASE_URL}/cards/search?q={formatted_query}"
-        )
+    @staticmethod
+    def get_collection(card_ids):
+        """
+        Busca várias cartas pelo ID em /cards/collection (até 75 por requisição),
+        sempre na API: usado quando os dados precisam estar atualizados (preços).
+        IDs não encontrados são ignorados; um lote que falha (HTTP diferente de
+        200, mesmo depois das novas tentativas) lança requests.HTTPError, para
+        quem chamou não tratar uma lista incompleta como completa.
+        """
+        card_ids = list(card_ids)
+        cards = []
+        for start in range(0, len(card_ids), Scryfall.COLLECTION_BATCH):
+            batch = card_ids[start:start + Scryfall.COLLECTION_BATCH]
+            response = Scryfall._post("/cards/collection", {"identifiers": [{"id": card_id} for card_id in batch]})
+            if response.status_code != 200:
+                raise requests.HTTPError(
+                    f"Card collection request failed: HTTP {response.status_code}", response=response)
 
-        # Se retornou OK
+            for card_data in response.json()['data']:
+                Scryfall.cache.put_card(card_data)
+                cards.append(card_data)
+        return cards
+
+    @staticmethod
+    def slim_card(card):
+        """
+        Resumo da carta com só o que a lista de resultados exibe
+        (ID, nome e as imagens small e normal, para o srcset).
+        Cartas de duas faces usam a imagem da frente.
+        """
+        image_uris = card.get('image_uris') or (card.get('card_faces') or [{}])[0].get('image_uris') or {}
+        return {
+            'id': card['id'],
+            'name': card['name'],
+            'image_uris': {'small': image_uris.get('small'), 'normal': image_uris.get('normal')}
+        }
+
+    @staticmethod
+    def _search_page_from_response(response):
+        """
+        Converte a resposta de /cards/search em {'total_cards', 'has_more', 'cards'}
+        (cartas resumidas), ou None se a busca falhou.
+        """
         if response.status_code == 200:
             data = response.json()
+            return {
+                'total_cards': data['total_cards'],
+                'has_more': data.get('has_more', False),
+                'cards': [Scryfall.slim_card(card) for card in data['data']]
+            }
+        if response.status_code == 404:
+            # Nenhuma carta encontrada (também vale guardar)
+            return {'total_cards': 0, 'has_more': False, 'cards': []}
+        return None
 
-            # Verifica se vieram resultados
-            if data['total_cards'] > 0:
-                return data['data']  # Retorna a lista de cartas
-            else:
+    @staticmethod
+    def _search_api_page(query, api_page):
+        """
+        Uma página de /cards/search (com cartas resumidas), do cache ou da API.
+        Retorna {'total_cards', 'has_more', 'cards', 'fetched_at'} ou None se a busca falhar.
+        """
+        cached = Scryfall.search_cache.get(query, api_page)
+        if cached is not None:
+            return cached
+
+        result = Scryfall._search_page_from_response(
+            Scryfall._get("/cards/search", params={"q": query, "page": api_page})
+        )
+        if result is not None:
+            result['fetched_at'] = time.time()
+            Scryfall.search_cache.put(query, api_page, result)
+        return result
+
+    @staticmethod
+    def _search_window(page, page_size):
+        """Intervalo [start, end) de resultados de uma página do site e a primeira página da API a ler."""
+        start = (max(page, 1) - 1) * page_size
+        return start, start + page_size, start // Scryfall.API_PAGE_SIZE + 1
+
+    @staticmethod
+    def _take_from_api_page(cards, result, api_page, start, end):
+        """
+        Acrescenta a `cards` os resultados da página da API que caem em [start, end).
+        Retorna True se não é preciso ler a próxima página.
+        """
+        offset = (api_page - 1) * Scryfall.API_PAGE_SIZE
+        cards.extend(result['cards'][max(start - offset, 0):end - offset])
+        return end <= offset + len(result['cards']) or not result['has_more']
+
+    @staticmethod
+    def search_cards(query, page=1, page_size=None):
+        """
+        Busca cartas usando qualquer termo textual (sintaxe completa do ?q=
+        da Scryfall) e retorna só a página pedida:
+        {'cards', 'total_cards', 'page', 'page_size', 'has_more', 'fetched_at'}
+        ('fetched_at': quando a página da API mais recente usada foi baixada).
+        Só as páginas da API que cobrem o intervalo pedido são baixadas.
+        Retorna "Not found" se a busca falhar.
+        """
+        page_size = page_size or Scryfall.SEARCH_PAGE_SIZE
+        start, end, api_page = Scryfall._search_window(page, page_size)
+
+        cards = []
+        fetched_at = 0
+        while True:
+            result = Scryfall._search_api_page(query, api_page)
+            if result is None:
                 return "Not found"
-        else:
-            return "Not found"
+            fetched_at = max(fetched_at, result.get('fetched_at', 0))
+            if Scryfall._take_from_api_page(cards, result, api_page, start, end):
+                break
+            api_page += 1
+
+        return {
+            'cards': cards,
+            'total_cards': result['total_cards'],
+            'page': page,
+            'page_size': page_size,
+            'has_more': end < result['total_cards'],
+            'fetched_at': fetched_at
+        }
+
+    @staticmethod
+    def iter_search(query):
+        """
+        Percorre todos os resultados de uma busca (cartas resumidas),
+        baixando cada página da API só quando a anterior termina.
+        """
+        api_page = 1
+        while True:
+            result = Scryfall._search_api_page(query, api_page)
+            if result is None:
+                return
+            yield from result['cards']
+            if not result['has_more']:
+                return
+            api_page += 1
+
+# Carrega o índice local, se configurado (snapshot .pkl ou arquivo bulk .json)
+if os.environ.get("SCRYFALL_INDEX_PATH"):
+    Scryfall.use_index(CardIndex.load(os.environ["SCRYFALL_INDEX_PATH"]))
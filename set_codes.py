@@ -0,0 +1,70 @@
+import os
+import json
+
+
+class SetCodeTable:
+    """
+    Tabela local dos códigos de set (ex: KHM, MH2) com o número de cartas
+    de cada um. O reconhecimento a usa para separar códigos de set de
+    palavras quaisquer de 3 a 5 letras maiúsculas que o OCR encontra, e
+    para conferir se um número de coleção cabe no set.
+    """
+
+    def __init__(self, sizes):
+        self._sizes = {code.upper(): int(count or 0) for code, count in sizes.items()}
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def __contains__(self, code):
+        return code.upper() in self._sizes
+
+    def card_count(self, code):
+        """Número de cartas do set (0 se desconhecido)."""
+        return self._sizes.get(code.upper(), 0)
+
+    # -------------------------------
+    # CONSTRUÇÃO
+    # -------------------------------
+
+    @staticmethod
+    def from_sets(sets):
+        """Cria a tabela a partir da lista de sets da Scryfall (campo 'data' de /sets)."""
+        return SetCodeTable({item['code']: item.get('card_count', 0) for item in sets if item.get('code')})
+
+    @staticmethod
+    def from_index(card_index):
+        """Cria a tabela a partir dos sets presentes no índice local (card_index.CardIndex)."""
+        return SetCodeTable(card_index.set_sizes())
+
+    def save(self, path):
+        """Salva a tabela em JSON."""
+        temp_path = path + ".temp"
+        with open(temp_path, 'w') as output:
+            json.dump(self._sizes, output, sort_keys=True)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path):
+        """Carrega uma tabela salva com save()."""
+        with open(path) as input_file:
+            return SetCodeTable(json.load(input_file))
+
+
+# -------------------------------------------------------------------
+# EXECUÇÃO DIRETA DO SCRIPT
+# -------------------------------------------------------------------
+if __name__ == '__main__':
+    import sys
+    from scryfall import Scryfall
+
+    # Uso: python set_codes.py <set_codes.json>  (baixa a lista de sets da Scryfall)
+    if len(sys.argv) < 2:
+        print("Usage: python set_codes.py <set_codes.json>")
+        sys.exit(1)
+
+    response = Scryfall._get("/sets")
+    response.raise_for_status()
+    table = SetCodeTable.from_sets(response.json()['data'])
+    table.save(sys.argv[1])
+    print(f"Saved {len(table)} set codes into {sys.argv[1]}")
@@ -0,0 +1,98 @@
+"""
+Testes do cache HTTP da API: ETag a partir da versão da carta (sem
+serializar a resposta), 304 para um If-None-Match igual e compressão.
+"""
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+import api
+from api import create_api, version_etag
+from scryfall import Scryfall
+
+CARD = {
+    'id': 'card-1',
+    'name': 'Lightning Bolt',
+    'oracle_text': 'Lightning Bolt deals 3 damage to any target. ' * 20,
+    'prices': {'usd': '1.00'}
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    lookups = []
+    versions = {'card-1': 'c1'}
+
+    def search_unique_card(card_id):
+        lookups.append(card_id)
+        return dict(CARD) if card_id == 'card-1' else "Not found"
+
+    monkeypatch.setattr(Scryfall, 'search_unique_card', staticmethod(search_unique_card))
+    monkeypatch.setattr(Scryfall, 'card_version', staticmethod(versions.get))
+
+    app = Flask(__name__)
+    app.register_blueprint(create_api(None, None, None))
+    client = app.test_client()
+    client.versions = versions
+    return client
+
+
+def test_version_etag():
+    assert version_etag('card', 'a', 'c1') == version_etag('card', 'a', 'c1')
+    assert version_etag('card', 'a', 'c1') != version_etag('card', 'a', 'c2')
+    assert version_etag('card', 'a', None) is None
+
+
+def test_card_revalidation(client, monkeypatch):
+    response = client.get('/api/v1/cards/card-1')
+    etag = response.headers['ETag']
+
+    assert response.status_code == 200
+    assert response.json['name'] == 'Lightning Bolt'
+    assert etag.startswith('W/')
+    assert 'public' in response.headers['Cache-Control']
+
+    # A revalidação não projeta nem serializa a carta
+    monkeypatch.setattr(api, 'project', lambda data, fields: pytest.fail("projected on a 304"))
+    cached = client.get('/api/v1/cards/card-1', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == etag
+
+
+def test_new_card_version_changes_the_etag(client):
+    etag = client.get('/api/v1/cards/card-1').headers['ETag']
+    client.versions['card-1'] = 'c2'
+
+    response = client.get('/api/v1/cards/card-1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_fields_have_their_own_etag(client):
+    full = client.get('/api/v1/cards/card-1')
+    response = client.get('/api/v1/cards/card-1?fields=name', headers={'If-None-Match': full.headers['ETag']})
+
+    assert response.status_code == 200
+    assert response.json == {'id': 'card-1', 'name': 'Lightning Bolt'}
+
+
+def test_missing_card(client):
+    response = client.get('/api/v1/cards/other')
+    assert response.status_code == 404
+    assert response.json == {'error': 'Card not found'}
+    assert 'no-store' in response.headers['Cache-Control']
+
+
+def test_gzip_keeps_the_etag(client):
+    plain = client.get('/api/v1/cards/card-1')
+    compressed = client.get('/api/v1/cards/card-1', headers={'Accept-Encoding': 'gzip'})
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] == plain.headers['ETag']
+    assert 'Accept-Encoding' in compressed.headers['Vary']
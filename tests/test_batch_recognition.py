@@ -0,0 +1,104 @@
+"""
+Testes do reconhecimento em lote: leitura de imagens e .zip pelos primeiros
+bytes, uma única busca por identificador repetido e o resumo final.
+Os pools de processos são trocados por threads e os estágios por funções locais.
+"""
+import io
+import os
+import sys
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+import batch_recognition
+from batch_recognition import BatchRecognizer
+
+JPEG = b'\xff\xd8\xff\xe0' + b'\x00' * 16
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 16
+
+
+@pytest.fixture
+def recognizer(monkeypatch):
+    """Lote com pools de threads; o nome da carta vem depois da assinatura da imagem."""
+    lookups = []
+    lock = threading.Lock()
+
+    def process_image(data, formats=None):
+        return data, None
+
+    def identify(image_bytes, analysis=None, detect=True):
+        name = image_bytes[20:].decode()
+        return {'set': '', 'number': '', 'name': name} if name else None
+
+    def search_card(identifier):
+        with lock:
+            lookups.append(identifier['name'])
+        if identifier['name'] == 'Missing':
+            return "Not found"
+        return {'id': f"id-{'-'.join(identifier['name'].lower().split())}", 'name': identifier['name']}
+
+    monkeypatch.setattr(batch_recognition, 'process_image_for_recognition', process_image)
+    monkeypatch.setattr(batch_recognition.CardRecognition, 'identify_card_from_bytes', staticmethod(identify))
+    monkeypatch.setattr(batch_recognition.Scryfall, 'search_card', staticmethod(search_card))
+
+    batch = BatchRecognizer(cpu_workers=2, io_workers=4)
+    pools = (ThreadPoolExecutor(2), ThreadPoolExecutor(4))
+    batch._pools = lambda reset=False: pools
+    batch.lookups = lookups
+    yield batch
+    for pool in pools:
+        pool.shutdown()
+
+
+def image(name):
+    return JPEG + name.encode()
+
+
+def test_repeated_cards_share_one_lookup(recognizer):
+    images = [(f"{n}.jpg", image(card), 'JPEG')
+              for n, card in enumerate(['Sol Ring', 'sol  ring', 'Sol Ring', 'Counterspell', 'Missing', ''])]
+
+    results = list(recognizer.run(images))
+    summary = results[-1]
+    by_file = {result['file']: result for result in results[:-1]}
+
+    assert summary['status'] == 'summary'
+    assert summary['cards'] == 6
+    assert summary['identified'] == 5
+    assert summary['found'] == 4
+    assert summary['lookups'] == 3
+    assert sorted(' '.join(name.lower().split()) for name in recognizer.lookups) == ['counterspell', 'missing', 'sol ring']
+
+    # Os três arquivos da mesma carta recebem o resultado da única busca
+    assert {by_file[f'{n}.jpg']['card_id'] for n in range(3)} == {'id-sol-ring'}
+    assert by_file['4.jpg']['error'] == 'Card not found in Scryfall database'
+    assert by_file['5.jpg']['error'] == 'Could not identify the card from the image'
+
+
+def test_collect_images_reads_files_and_zips_by_content():
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        zip_file.writestr('cards/a.png', PNG)
+        zip_file.writestr('cards/notes.txt', b'not an image')
+        zip_file.writestr('__MACOSX/cards/._a.png', PNG)
+        zip_file.writestr('cards/big.jpg', JPEG + b'x' * 100)
+    archive.seek(0)
+
+    uploads = [
+        ('photo.heic', io.BytesIO(JPEG)),   # extensão errada: vale o conteúdo
+        ('fake.jpg', io.BytesIO(b'hello')),
+        ('cards.bin', archive),
+    ]
+    images = BatchRecognizer(max_entry_bytes=50).collect_images(uploads)
+
+    assert [(name, image_format) for name, _, image_format in images] == [('photo.heic', 'JPEG'), ('a.png', 'PNG')]
+
+
+def test_collect_images_respects_max_files():
+    uploads = [(f"{n}.jpg", io.BytesIO(JPEG)) for n in range(5)]
+    assert len(BatchRecognizer(max_files=3).collect_images(uploads)) == 3
@@ -0,0 +1,87 @@
+"""
+Testes do cache de cartas: LRU em memória contado em cartas, validade
+(TTL), camada SQLite compartilhada entre instâncias e cache das buscas.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_cache import CardCache, SearchCache
+
+
+def make_card(number, name=None):
+    return {'id': f"ID-{number}", 'name': name or f"Card {number}", 'set': 'tst', 'collector_number': str(number)}
+
+
+def test_lookup_by_id_set_number_and_name():
+    cache = CardCache(max_entries=10)
+    cache.put_card(make_card(51, "Sól  Ring"))
+
+    assert cache.get_card("id-51")['name'] == "Sól  Ring"
+    assert cache.get_by_set_number("TST", "051")['id'] == "ID-51"
+    assert cache.get_by_name("sol ring")['id'] == "ID-51"
+    assert cache.get_by_name("Lightning Bolt") is None
+    assert cache.stats()['hits'] == 3
+    assert cache.stats()['misses'] == 1
+
+
+def test_capacity_counts_cards_and_evicts_least_recently_used():
+    cache = CardCache(max_entries=2)
+    cache.put_card(make_card(1))
+    cache.put_card(make_card(2))
+
+    # Usar a carta 1 faz da carta 2 a menos usada recentemente
+    assert cache.get_card("ID-1") is not None
+    cache.put_card(make_card(3))
+
+    assert cache.get_card("ID-2") is None
+    assert cache.get_card("ID-1") is not None
+    assert cache.get_card("ID-3") is not None
+    assert cache.stats()['entries'] == 2 * 3
+
+
+def test_expired_entries_are_misses():
+    cache = CardCache(ttl=0.05)
+    cache.put_card(make_card(1))
+    assert cache.get_card("ID-1") is not None
+
+    time.sleep(0.1)
+    assert cache.get_card("ID-1") is None
+
+
+def test_sqlite_tier_is_shared_between_instances(tmp_path):
+    db_path = str(tmp_path / "cards.db")
+    CardCache(db_path=db_path).put_card(make_card(7), CardCache.name_key("card sete"))
+
+    # Outra instância (outro worker): acha a carta no disco e promove para a memória
+    other = CardCache(db_path=db_path)
+    assert other.get_by_name("Card Sete")['id'] == "ID-7"
+    assert other.get_by_name("card sete")['id'] == "ID-7"
+    assert other.get_by_set_number("tst", "7")['id'] == "ID-7"
+    assert other.stats()['disk_hits'] == 2
+    assert other.stats()['hits'] == 1
+
+    other.clear()
+    assert CardCache(db_path=db_path).get_card("ID-7") is None
+
+
+def test_sqlite_tier_respects_ttl(tmp_path):
+    db_path = str(tmp_path / "cards.db")
+    CardCache(db_path=db_path, ttl=0.05).put_card(make_card(1))
+
+    time.sleep(0.1)
+    assert CardCache(db_path=db_path).get_card("ID-1") is None
+
+
+def test_search_cache_normalizes_the_query():
+    cache = SearchCache(max_entries=2)
+    cache.put("Sol  Ring", 1, {'cards': ['a']})
+
+    assert cache.get("sol ring", 1) == {'cards': ['a']}
+    assert cache.get("sol ring", 2) is None
+
+    cache.put("q2", 1, {})
+    cache.put("q3", 1, {})
+    assert cache.get("sol ring", 1) is None
@@ -0,0 +1,100 @@
+"""
+Testes do reconhecimento pela arte: hashes perceptuais estáveis a uma
+recompressão, busca por distância de Hamming e a regra da margem contra
+cartas parecidas (reimpressões com a mesma arte não contam como rivais).
+"""
+import os
+import sys
+import random
+import uuid
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_hashing import CardHashIndex, image_hashes, hamming
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def card_id(number):
+    return str(uuid.UUID(int=number))
+
+
+def make_index(rng, cards=200):
+    index = CardHashIndex(max_distance=28, min_margin=8)
+    hashes = {}
+    for number in range(1, cards + 1):
+        hashes[number] = (rng.getrandbits(64), rng.getrandbits(64))
+        index.add(card_id(number), f"Card {number}", 'tst', str(number), *hashes[number])
+    return index, hashes
+
+
+def test_hashes_survive_recompression():
+    art = Image.new('RGB', (400, 300), (30, 60, 90))
+    draw = ImageDraw.Draw(art)
+    for n in range(12):
+        draw.ellipse([n * 30, n * 20, n * 30 + 120, n * 20 + 90], fill=(n * 20, 255 - n * 20, 120))
+
+    buffer = BytesIO()
+    art.resize((300, 225)).save(buffer, 'JPEG', quality=60)
+    photo = Image.open(BytesIO(buffer.getvalue()))
+
+    (p1, d1), (p2, d2) = image_hashes(art), image_hashes(photo)
+    assert hamming(p1, p2) + hamming(d1, d2) <= 12
+
+
+def test_match_finds_a_noisy_copy():
+    rng = random.Random(11)
+    index, hashes = make_index(rng)
+    phash_value, dhash_value = hashes[42]
+
+    match = index.match(flip_bits(phash_value, 5, rng), flip_bits(dhash_value, 5, rng))
+
+    assert match is not None
+    assert match[0] == 10
+    assert match[1:] == (card_id(42), "Card 42", 'tst', '42')
+
+
+def test_distant_hashes_do_not_match():
+    rng = random.Random(12)
+    index, hashes = make_index(rng)
+    phash_value, dhash_value = hashes[7]
+
+    assert index.match(flip_bits(phash_value, 20, rng), flip_bits(dhash_value, 20, rng)) is None
+
+
+def test_margin_rule():
+    rng = random.Random(13)
+    index = CardHashIndex(max_distance=28, min_margin=8)
+    phash_value, dhash_value = rng.getrandbits(64), rng.getrandbits(64)
+    index.add(card_id(1), "Lightning Bolt", 'm10', '146', phash_value, dhash_value)
+
+    # Reimpressão com a mesma arte: não é rival
+    index.add(card_id(2), "Lightning Bolt", '2x2', '117', flip_bits(phash_value, 1, rng), dhash_value)
+    assert index.match(phash_value, dhash_value)[2] == "Lightning Bolt"
+
+    # Outra carta a poucos bits: correspondência ambígua
+    index.add(card_id(3), "Chain Lightning", 'sta', '39', flip_bits(phash_value, 3, rng), dhash_value)
+    assert index.match(phash_value, dhash_value) is None
+
+
+def test_add_replaces_and_snapshot_round_trip(tmp_path):
+    rng = random.Random(14)
+    index, hashes = make_index(rng, cards=20)
+    new_hashes = (rng.getrandbits(64), rng.getrandbits(64))
+    index.add(card_id(5), "Card 5", 'tst', '5', *new_hashes)
+
+    assert len(index) == 20
+    assert index.search(*hashes[5], limit=1)[0][1] != card_id(5)
+
+    path = str(tmp_path / 'hashes.pickle')
+    index.save(path)
+    loaded = CardHashIndex.load(path, max_distance=28, min_margin=8)
+    assert card_id(5) in loaded
+    assert loaded.match(*new_hashes)[1] == card_id(5)
@@ -0,0 +1,81 @@
+"""
+Testes do índice local montado a partir do arquivo bulk da Scryfall:
+consultas por ID, set + número e nome, atualização incremental e snapshot.
+"""
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_index import CardIndex, iter_bulk_cards
+
+BOLT_M10 = '00000000-0000-0000-0000-000000000001'
+BOLT_2X2 = '00000000-0000-0000-0000-000000000002'
+FIRE_ICE = '00000000-0000-0000-0000-000000000003'
+
+
+def bulk_cards():
+    return [
+        {'id': BOLT_M10, 'name': 'Lightning Bolt', 'set': 'm10', 'collector_number': '146',
+         'released_at': '2009-07-17'},
+        {'id': BOLT_2X2, 'name': 'Lightning Bolt', 'set': '2x2', 'collector_number': '117',
+         'released_at': '2022-07-08'},
+        {'id': FIRE_ICE, 'name': 'Fire // Ice', 'set': 'mh2', 'collector_number': '290',
+         'released_at': '2021-06-18', 'card_faces': [{'name': 'Fire'}, {'name': 'Ice'}]},
+    ]
+
+
+def write_bulk(path, cards):
+    # Formato do arquivo da Scryfall: um array com uma carta por linha
+    with open(path, 'w', encoding='utf-8') as bulk_file:
+        bulk_file.write('[\n' + ',\n'.join(json.dumps(card) for card in cards) + '\n]\n')
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return CardIndex.from_bulk_file(write_bulk(tmp_path / 'bulk.json', bulk_cards()))
+
+
+def test_streaming_reader_reads_every_card(tmp_path):
+    path = write_bulk(tmp_path / 'bulk.json', bulk_cards())
+    assert [card['id'] for card in iter_bulk_cards(path, chunk_size=16)] == [BOLT_M10, BOLT_2X2, FIRE_ICE]
+
+
+def test_lookups(index):
+    assert len(index) == 3
+    assert index.get_card(BOLT_M10.upper())['set'] == 'm10'
+    assert index.get_card('not-a-uuid') is None
+
+    assert index.get_by_set_number('M10', '0146')['id'] == BOLT_M10
+    assert index.get_by_set_number('m10', '999') is None
+
+    # Nome repetido: a impressão mais recente
+    assert index.get_by_name('lightning  BOLT')['id'] == BOLT_2X2
+    # Cartas de duas faces também pelo nome de cada face
+    assert index.get_by_name('Ice')['id'] == FIRE_ICE
+
+    assert index.set_sizes() == {'m10': 1, '2x2': 1, 'mh2': 1}
+
+
+def test_refresh_reports_changes(index, tmp_path):
+    cards = bulk_cards()[:2]
+    cards[0]['collector_number'] = '147'
+    stats = index.refresh(write_bulk(tmp_path / 'newer.json', cards))
+
+    assert stats == {'added': 0, 'updated': 1, 'unchanged': 1, 'removed': 1}
+    assert index.get_card(FIRE_ICE) is None
+    assert index.get_by_set_number('m10', '147')['id'] == BOLT_M10
+
+
+def test_snapshot_round_trip(index, tmp_path):
+    path = str(tmp_path / 'index.pickle')
+    index.save(path)
+
+    loaded = CardIndex.load(path)
+    assert len(loaded) == 3
+    assert loaded.get_by_name('fire // ice')['id'] == FIRE_ICE
+    assert loaded.checksum(BOLT_M10) == index.checksum(BOLT_M10)
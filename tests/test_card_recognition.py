@@ -0,0 +1,69 @@
+"""
+Testes da extração dos candidatos a partir do texto do OCR: códigos de
+set conferidos na tabela local e pontuados pela posição (perto do número
+de coleção, no rodapé) e, sem a tabela, só as palavras do rodapé.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+from card_recognition import CardRecognition
+from set_codes import SetCodeTable
+
+OCR_TEXT = """Lightning Bolt
+Instant
+Lightning Bolt deals 3 damage to any target. KHM
+The sparkmage shrieked, calling on the rage
+of the storms of his youth.
+Illus. Christopher Moeller
+146/249 C
+M10 EN
+TM & © 2009 Wizards of the Coast LLC"""
+
+
+def pairs(candidates):
+    return [(candidate['set'], candidate['number']) for candidate in candidates]
+
+
+def test_footer_code_with_the_set_table():
+    table = SetCodeTable({'M10': 249, 'KHM': 285})
+
+    candidates, sets, numbers = CardRecognition._extract_candidates_from_text(OCR_TEXT, table)
+
+    assert [(code, round(score, 2)) for code, score, _ in sets] == [('M10', 1.0), ('KHM', 0.7)]
+    assert pairs(candidates) == [('M10', '146'), ('KHM', '146'), ('', '')]
+    assert candidates[0]['confidence'] == 0.9
+    assert candidates[0]['name'] == 'Lightning Bolt'
+    assert candidates[-1]['name'] == 'Lightning Bolt'
+
+
+def test_unknown_codes_are_ignored_with_the_set_table():
+    candidates, sets, _ = CardRecognition._extract_candidates_from_text(OCR_TEXT, SetCodeTable({'KHM': 285}))
+
+    assert [code for code, _, _ in sets] == ['KHM']
+    assert pairs(candidates)[0] == ('KHM', '146')
+
+
+def test_number_larger_than_the_set_is_less_likely():
+    full = CardRecognition._extract_candidates_from_text(OCR_TEXT, SetCodeTable({'M10': 249}))[0]
+    small = CardRecognition._extract_candidates_from_text(OCR_TEXT, SetCodeTable({'M10': 100}))[0]
+
+    assert small[0]['confidence'] == round(full[0]['confidence'] * 0.7, 3)
+
+
+def test_without_the_table_only_footer_words_count():
+    candidates, sets, _ = CardRecognition._extract_candidates_from_text(OCR_TEXT)
+
+    # KHM no texto de regras não conta; LLC é ignorado
+    assert [(code, round(score, 2)) for code, score, _ in sets] == [('M10', 0.5)]
+    assert pairs(candidates) == [('M10', '146'), ('', '')]
+    assert candidates[0]['confidence'] < 0.5
+
+
+def test_name_only_when_there_is_no_number():
+    candidates, sets, numbers = CardRecognition._extract_candidates_from_text("Sol Ring\nArtifact\nM10")
+
+    assert numbers == []
+    assert candidates == [{'set': '', 'number': '', 'name': 'Sol Ring', 'confidence': 0.3}]
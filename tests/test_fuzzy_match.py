@@ -0,0 +1,53 @@
+"""
+Testes da busca aproximada de nomes: distância de edição, normalização
+dos erros comuns de OCR e escolha do melhor nome.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuzzy_match import FuzzyMatcher, levenshtein, ocr_normalize
+
+NAMES = ["Lightning Bolt", "Lightning Helix", "Llanowar Elves", "Counterspell", "Sol Ring",
+         "Storm Crow", "Swords to Plowshares", "Serra Angel"]
+
+
+def test_levenshtein():
+    assert levenshtein("kitten", "sitting") == 3
+    assert levenshtein("", "abc") == 3
+    assert levenshtein("bolt", "bolt") == 0
+    # Strings maiores que uma palavra de máquina
+    assert levenshtein("a" * 100, "a" * 99 + "b") == 1
+
+
+def test_ocr_normalize_unifies_common_confusions():
+    assert ocr_normalize("Storrn Crovv") == ocr_normalize("Storm Crow")
+    assert ocr_normalize("S0l R1ng.") == ocr_normalize("Sol Ring")
+    assert ocr_normalize("  Sérra   Angel ") == ocr_normalize("serra angel")
+
+
+def test_best_name_for_ocr_noise():
+    matcher = FuzzyMatcher(NAMES)
+
+    assert matcher.best("Lightnlng Bo1t") == "Lightning Bolt"
+    assert matcher.best("Storrn Crow") == "Storm Crow"
+    assert matcher.best("Swords to Plowshars") == "Swords to Plowshares"
+    assert matcher.best("COUNTERSPELL") == "Counterspell"
+
+
+def test_exact_match_scores_one():
+    assert FuzzyMatcher(NAMES).match("sol ring") == [("Sol Ring", 1.0)]
+
+
+def test_no_match_below_threshold():
+    matcher = FuzzyMatcher(NAMES)
+
+    assert matcher.best("Tarmogoyf") is None
+    assert matcher.best("") is None
+    assert matcher.match("zzzz qqqq") == []
+
+
+def test_candidates_are_ranked():
+    names = [name for name, _ in FuzzyMatcher(NAMES).match("Lightning", limit=2)]
+    assert sorted(names) == ["Lightning Bolt", "Lightning Helix"]
@@ -0,0 +1,92 @@
+"""
+Testes das imagens do jogo: nomes por HMAC do ID da carta e coleta de lixo
+por idade, por tamanho total e respeitando as cartas em uso.
+"""
+import os
+import sys
+import time
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+from game_images import GameImageStore
+
+RADII = [8]
+
+
+def card_id(number):
+    return str(uuid.UUID(int=number))
+
+
+def add_card(store, number, age, size=1000):
+    """Cria os arquivos de uma carta (original e borrada) usados há `age` segundos."""
+    original, blurred = store._relative_paths(card_id(number), RADII)
+    files = [store._absolute(original)] + [store._absolute(path) for path in blurred.values()]
+    used_at = time.time() - age
+    for path in files:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as image_file:
+            image_file.write(b'x' * size)
+        os.utime(path, (used_at, used_at))
+    return files
+
+
+@pytest.fixture
+def store(tmp_path):
+    return GameImageStore(root=str(tmp_path), secret=b'test-secret', max_bytes=10 ** 9,
+                          max_age=3600, min_age=60)
+
+
+def test_file_names_do_not_reveal_the_card(store):
+    original, blurred = store._relative_paths(card_id(1), RADII)
+
+    assert card_id(1) not in original
+    assert original.startswith(f"original/{original.split('/')[2][:2]}/")
+    other_secret = GameImageStore(root=store.root, secret=b'other')
+    assert other_secret._relative_paths(card_id(1), RADII)[0] != original
+
+
+def test_collect_removes_expired_images(store):
+    old = add_card(store, 1, age=7200)
+    recent = add_card(store, 2, age=600)
+
+    result = store.collect()
+
+    assert result['deleted'] == 2
+    assert not any(os.path.exists(path) for path in old)
+    assert all(os.path.exists(path) for path in recent)
+
+
+def test_collect_keeps_referenced_and_recently_used_images(store):
+    referenced = add_card(store, 1, age=7200)
+    just_used = add_card(store, 2, age=7200)
+    store.touch(card_id(2), RADII)
+
+    assert store.collect(referenced=[card_id(1)])['deleted'] == 0
+    assert all(os.path.exists(path) for path in referenced + just_used)
+
+
+def test_collect_trims_least_recently_used_over_the_size_limit(store):
+    store.max_bytes = 4000
+    oldest = add_card(store, 1, age=900)
+    middle = add_card(store, 2, age=600)
+    newest = add_card(store, 3, age=300)
+
+    result = store.collect()
+
+    assert result['deleted'] == 2
+    assert result['remaining_bytes'] == 4000
+    assert not any(os.path.exists(path) for path in oldest)
+    assert all(os.path.exists(path) for path in middle + newest)
+
+
+def test_min_age_is_never_below_the_game_ttl(monkeypatch):
+    import game_images
+    monkeypatch.setenv("GAME_IMAGES_MIN_AGE_MINUTES", "1")
+    monkeypatch.setenv("GAME_IMAGES_SECRET", "s")
+    monkeypatch.setenv("IMAGE_DERIVATIVES", "0")
+
+    assert GameImageStore.from_env().min_age == game_images.GAME_TTL
@@ -0,0 +1,110 @@
+"""
+Testes do estado dos jogos no servidor: armazenamento em memória e SQLite
+com expiração, o cookie só com o ID (e a migração dos jogos antigos, que
+ficavam inteiros no cookie) e as regras dos palpites.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_store import (
+    MemoryGameStore, SQLiteGameStore, new_game_state, apply_guess,
+    load_session_game, save_session_game, reset_session_game, current_blur_level
+)
+
+
+def make_game(name="Lightning Bolt"):
+    game = {
+        'card_name': name,
+        'card_id': 'card-1',
+        'image_path': 'game_images/blurred/8.jpg',
+        'image_paths': ['game_images/blurred/16.jpg', 'game_images/blurred/8.jpg', 'game_images/blurred/4.jpg'],
+        'image_path_original': 'game_images/original/1.jpg',
+    }
+    return new_game_state(game, lambda path: f"/static/{path}", max_attempts=3)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryGameStore()
+    return SQLiteGameStore(str(tmp_path / 'games.db'))
+
+
+def test_save_get_delete(store):
+    state = make_game()
+    store.save('g1', state)
+
+    loaded = store.get('g1')
+    assert loaded == state
+    loaded['attempts'] = 99
+    assert store.get('g1')['attempts'] == 0
+
+    store.delete('g1')
+    assert store.get('g1') is None
+    assert store.get('missing') is None
+
+
+def test_expired_games_are_not_returned(store):
+    store.ttl = -1
+    store.save('g1', make_game())
+    assert store.get('g1') is None
+
+
+def test_session_only_keeps_the_game_id(store):
+    session = {}
+    state = make_game()
+    save_session_game(session, store, state)
+
+    assert set(session) == {'game_id'}
+    assert load_session_game(session, store) == state
+
+    reset_session_game(session, store)
+    assert session == {}
+    assert load_session_game(session, store) is None
+
+
+def test_old_cookie_games_are_migrated_once(store):
+    session = {'game_state': {
+        'card_name': 'Sol Ring',
+        'image_url': '/static/game_images/blurred/x.jpg',
+        'attempts': 1, 'max_attempts': 5, 'guesses': ['Mox'], 'game_over': False, 'win': False,
+    }}
+
+    game_state = load_session_game(session, store)
+
+    assert 'game_state' not in session
+    assert game_state['word_length'] == len('Sol Ring')
+    assert game_state['image_url_original'] == '/static/game_images/original/x.jpg'
+    assert store.get(session['game_id']) == game_state
+
+
+def test_guesses_and_blur_levels():
+    game_state = make_game()
+    assert game_state['word_length'] == len("Lightning Bolt")
+    assert current_blur_level(game_state) == '/static/game_images/blurred/16.jpg'
+
+    assert apply_guess(game_state, 'Shock') == 'wrong'
+    assert current_blur_level(game_state) == '/static/game_images/blurred/8.jpg'
+
+    assert apply_guess(game_state, 'lightning bolt') == 'win'
+    assert game_state['game_over'] and game_state['win']
+
+
+def test_running_out_of_attempts():
+    game_state = make_game()
+    results = [apply_guess(game_state, guess) for guess in ('a', 'b', 'c')]
+
+    assert results == ['wrong', 'wrong', 'lose']
+    assert game_state['game_over'] and not game_state['win']
+    # Sem mais níveis, fica no último (o menos borrado)
+    assert current_blur_level(game_state) == '/static/game_images/blurred/4.jpg'
+
+
+def test_single_blur_level_uses_image_url():
+    game_state = make_game()
+    del game_state['image_urls']
+    assert current_blur_level(game_state) == game_state['image_url']
@@ -0,0 +1,75 @@
+"""
+Testes da compressão JPEG com busca binária da qualidade: mesmo resultado
+da busca linear de antes (a maior qualidade que cabe) com poucas codificações.
+"""
+import os
+import sys
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_utils import compress_to_jpeg, JPEG_QUALITIES
+
+
+@pytest.fixture(scope='module')
+def photo():
+    # Ruído: o tamanho do JPEG varia bastante com a qualidade
+    return Image.merge('RGB', [Image.effect_noise((320, 240), 60) for _ in range(3)])
+
+
+def sizes_by_quality(img):
+    sizes = {}
+    for quality in JPEG_QUALITIES:
+        buffer = BytesIO()
+        img.save(buffer, format='JPEG', quality=quality)
+        sizes[quality] = buffer.tell()
+    return sizes
+
+
+def counting_encodes(img):
+    """Conta as chamadas de save() da imagem."""
+    calls = []
+    original_save = img.save
+
+    def save(*args, **kwargs):
+        calls.append(kwargs.get('quality'))
+        return original_save(*args, **kwargs)
+
+    img.save = save
+    return calls
+
+
+def test_common_case_needs_two_encodes(photo):
+    img = photo.copy()
+    calls = counting_encodes(img)
+
+    data, quality = compress_to_jpeg(img, 10 * 1024 * 1024)
+
+    assert quality == 100
+    assert data[:2] == b'\xff\xd8'
+    assert calls == [95, 100]
+
+
+def test_picks_the_highest_quality_that_fits(photo):
+    sizes = sizes_by_quality(photo)
+
+    for max_bytes in (sizes[90] + 1, sizes[60], sizes[35] + 10, sizes[15]):
+        expected = max(quality for quality, size in sizes.items() if size <= max_bytes)
+        img = photo.copy()
+        calls = counting_encodes(img)
+
+        data, quality = compress_to_jpeg(img, max_bytes)
+
+        assert quality == expected
+        assert len(data) <= max_bytes
+        assert len(calls) <= 6
+
+
+def test_returns_the_smallest_when_nothing_fits(photo):
+    data, quality = compress_to_jpeg(photo.copy(), 100)
+
+    assert quality == JPEG_QUALITIES[-1]
+    assert len(data) > 100
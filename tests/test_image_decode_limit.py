@@ -0,0 +1,61 @@
+"""
+Testes do limite de memória da decodificação: imagens que passariam de
+MAX_DECODE_BYTES são recusadas antes de decodificar; JPEGs grandes passam
+graças à decodificação reduzida (draft).
+"""
+import os
+import sys
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_utils
+from image_utils import ImageTooLargeError, DecodeBudget, process_image_to_bytes
+
+
+def encoded(size, image_format):
+    buffer = BytesIO()
+    Image.new('RGB', size, (40, 90, 160)).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def test_rejects_images_over_the_limit(monkeypatch):
+    # 2000x1500 RGB = 9 MB decodificado; PNG não tem decodificação reduzida
+    monkeypatch.setattr(image_utils, 'MAX_DECODE_BYTES', 4 * 1024 * 1024)
+
+    with pytest.raises(ImageTooLargeError):
+        process_image_to_bytes(encoded((2000, 1500), 'PNG'), formats=['PNG'])
+
+    # Nada fica reservado no orçamento depois da recusa
+    assert image_utils.decode_budget.available == image_utils.decode_budget.total_bytes
+
+
+def test_large_jpeg_fits_through_draft_decoding(monkeypatch):
+    # 4000x3000 ocupa 36 MB inteiro, mas o draft decodifica em 1/2 (2000x1500, 9 MB)
+    monkeypatch.setattr(image_utils, 'MAX_DECODE_BYTES', 16 * 1024 * 1024)
+
+    data = process_image_to_bytes(encoded((4000, 3000), 'JPEG'), max_resolution=(1920, 1080), formats=['JPEG'])
+
+    with Image.open(BytesIO(data)) as result:
+        assert result.format == 'JPEG'
+        assert max(result.size) <= 1920
+
+
+def test_images_under_the_limit_are_processed():
+    data = process_image_to_bytes(encoded((800, 600), 'PNG'))
+    assert data[:2] == b'\xff\xd8'
+
+
+def test_decode_budget_waits_and_times_out():
+    budget = DecodeBudget(100)
+    assert budget.acquire(80) == 80
+
+    with pytest.raises(ImageTooLargeError):
+        budget.acquire(50, timeout=0.05)
+
+    budget.release(80)
+    # Pedidos maiores que o orçamento inteiro reservam só o orçamento
+    assert budget.acquire(500) == 100
@@ -0,0 +1,103 @@
+"""
+Testes das métricas: histogramas e contadores no formato texto do
+Prometheus, spans dos estágios e o cabeçalho Server-Timing.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Registro vazio, com o histograma dos estágios recriado nele."""
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+    monkeypatch.setattr(metrics, '_registry', [])
+    monkeypatch.setattr(metrics, 'stage_seconds', metrics.histogram('test_stage_seconds', 'Stages', ('stage',)))
+    return metrics._registry
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self):
+        self.headers = {}
+
+
+def test_render_counters_and_histograms(registry):
+    requests_total = metrics.counter('test_requests_total', 'Requests', ('route',))
+    latency = metrics.histogram('test_latency_seconds', 'Latency', buckets=(0.1, 1.0))
+
+    requests_total.inc('/search')
+    requests_total.inc('/search', amount=2)
+    requests_total.inc('say "hi"\n')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5.0)
+
+    lines = metrics.render().splitlines()
+
+    assert '# TYPE test_requests_total counter' in lines
+    assert 'test_requests_total{route="/search"} 3' in lines
+    assert 'test_requests_total{route="say \\"hi\\"\\n"} 1' in lines
+    assert '# TYPE test_latency_seconds histogram' in lines
+    assert [line for line in lines if line.startswith('test_latency_seconds')] == [
+        'test_latency_seconds_bucket{le="0.1"} 1',
+        'test_latency_seconds_bucket{le="1.0"} 2',
+        'test_latency_seconds_bucket{le="+Inf"} 3',
+        'test_latency_seconds_sum 5.55',
+        'test_latency_seconds_count 3',
+    ]
+
+
+def test_spans_and_collectors(registry):
+    metrics.register_collector('test_cache_hits_total', 'Cache hits', 'counter', ('layer',),
+                               lambda: {('memory',): 7})
+    metrics.register_collector('test_broken', 'Broken', 'gauge', (), lambda: 1 / 0)
+
+    with metrics.span('compress'):
+        pass
+    with metrics.span('compress'):
+        pass
+
+    text = metrics.render()
+    assert 'test_stage_seconds_count{stage="compress"} 2' in text
+    assert 'test_cache_hits_total{layer="memory"} 7' in text
+    # Um coletor com erro não derruba a coleta
+    assert '# TYPE test_broken gauge' in text
+
+
+def test_disabled_metrics_record_nothing(registry, monkeypatch):
+    requests_total = metrics.counter('test_requests_total', 'Requests')
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+
+    requests_total.inc()
+    with metrics.span('ocr'):
+        pass
+
+    assert requests_total.samples() == []
+    assert metrics.stage_seconds.samples() == []
+    assert metrics.request_started() is None
+
+
+def test_server_timing(registry, monkeypatch):
+    monkeypatch.setattr(metrics, 'SERVER_TIMING', True)
+    monkeypatch.setattr(metrics, 'request_seconds', metrics.histogram('test_request_seconds', 'Requests',
+                                                                        ('route', 'method', 'status')))
+    monkeypatch.setattr(metrics, 'upstream_seconds', metrics.histogram('test_upstream_seconds', 'Upstream',
+                                                                         ('upstream', 'status')))
+
+    started = metrics.request_started()
+    with metrics.span('decode'):
+        pass
+    metrics.observe_upstream('scryfall', 200, 0.25)
+    response = metrics.request_finished(started, '/card-detail/<card_id>', 'GET', FakeResponse())
+
+    stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert stages == ['decode', 'scryfall', 'total']
+    assert 'scryfall;dur=250.0' in response.headers['Server-Timing']
+    assert 'test_request_seconds_count{route="/card-detail/<card_id>",method="GET",status="200"} 1' in metrics.render()
@@ -0,0 +1,101 @@
+"""
+Testes do histórico de preços: gravação só das mudanças, consultas de
+histórico e variação, e a reserva dos snapshots diários entre workers
+(incluindo a reserva abandonada e a liberação quando a Scryfall falha).
+"""
+import os
+import sys
+from datetime import date
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+from price_tracking import PriceStore, PriceTracker, price_values, to_day
+from scryfall import Scryfall
+
+BOLT = 'AAAAAAAA-0000-0000-0000-000000000001'
+RING = 'aaaaaaaa-0000-0000-0000-000000000002'
+
+
+def card(card_id, usd, name='Card'):
+    return {'id': card_id, 'name': name, 'prices': {'usd': usd, 'eur': None}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path / 'prices.db'))
+
+
+def test_price_values_are_cents():
+    assert price_values({'usd': '0.25', 'tix': '1.5'}) == (25, None, None, None, None, 150)
+    assert price_values(None) == (None,) * 6
+
+
+def test_record_only_writes_changes(store):
+    assert store.record([card(BOLT, '1.00'), card(RING, '2.00')], '2024-01-01') == {'cards': 2, 'changed': 2}
+    assert store.record([card(BOLT, '1.00'), card(RING, '2.50')], '2024-01-02') == {'cards': 2, 'changed': 1}
+    assert store.record([card(BOLT, '1.20'), {'name': 'no id'}], '2024-01-05') == {'cards': 1, 'changed': 1}
+
+    history = store.history(BOLT.lower(), end='2024-01-10')
+    assert [(point['date'], point['usd']) for point in history] == [('2024-01-01', 1.0), ('2024-01-05', 1.2)]
+    assert store.history('unknown') is None
+
+
+def test_history_window_and_daily(store):
+    store.record([card(RING, '2.00')], '2024-01-01')
+    store.record([card(RING, '3.00')], '2024-01-04')
+
+    # Começa pelo preço em vigor no início do intervalo
+    history = store.history(RING, start='2024-01-02', end='2024-01-05')
+    assert [(point['date'], point['usd']) for point in history] == [('2024-01-02', 2.0), ('2024-01-04', 3.0)]
+
+    daily = store.history(RING, start='2024-01-02', end='2024-01-05', daily=True)
+    assert [point['usd'] for point in daily] == [2.0, 2.0, 3.0, 3.0]
+    assert store.price_on(RING, '2024-01-03')['usd'] == 2.0
+    assert store.percent_change(RING, '2024-01-01', '2024-01-04') == 50.0
+
+
+def test_movers(store):
+    store.record([card(BOLT, '2.00', 'Bolt'), card(RING, '4.00', 'Ring')], '2024-01-01')
+    store.record([card(BOLT, '3.00', 'Bolt'), card(RING, '3.00', 'Ring')], '2024-01-08')
+
+    rising = store.movers('2024-01-01', '2024-01-08')
+    assert [(mover['name'], mover['percent_change']) for mover in rising] == [('Bolt', 50.0), ('Ring', -25.0)]
+    assert store.movers('2024-01-01', '2024-01-08', falling=True)[0]['name'] == 'Ring'
+
+
+def test_snapshot_is_claimed_once_per_day(store):
+    day = to_day(date(2024, 1, 1))
+
+    assert store.claim_snapshot(day, 'watched')
+    assert not store.claim_snapshot(day, 'watched')
+    # Reserva abandonada (worker morreu): é assumida depois do timeout
+    assert store.claim_snapshot(day, 'watched', timeout=-1)
+
+    store.finish_snapshot(day, 'watched', {'cards': 3, 'changed': 1})
+    assert not store.claim_snapshot(day, 'watched', timeout=-1)
+    assert store.snapshots()[0]['cards'] == 3
+
+    # Outra origem tem a sua própria reserva; liberada, pode ser tentada de novo
+    assert store.claim_snapshot(day, 'bulk')
+    store.release_snapshot(day, 'bulk')
+    assert store.claim_snapshot(day, 'bulk')
+
+
+class FailedResponse:
+    status_code = 503
+
+
+def test_failed_collection_releases_the_snapshot(store, monkeypatch):
+    store.watch(card(BOLT, '1.00'), '2024-01-01')
+    monkeypatch.setattr(Scryfall, '_post', staticmethod(lambda path, payload: FailedResponse()))
+    tracker = PriceTracker(store)
+
+    with pytest.raises(requests.HTTPError):
+        tracker.snapshot('2024-01-02')
+
+    assert store.snapshots() == []
+    assert store.claim_snapshot('2024-01-02', 'watched')
@@ -0,0 +1,154 @@
+"""
+Testes do limite de requisições à Scryfall: balde de fichas (em memória e
+em SQLite, compartilhado entre processos), novas tentativas com Retry-After
+e o agrupamento de requisições iguais simultâneas (single-flight).
+"""
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+import rate_limit
+from rate_limit import (
+    MemoryTokenBucket, SQLiteTokenBucket, SingleFlight, _retry_delay, request_with_retry, retry_after_seconds
+)
+
+
+class FakeResponse:
+    url = 'https://api.scryfall.com/cards/named'
+
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {'Retry-After': retry_after} if retry_after is not None else {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Troca as esperas por uma lista com os tempos pedidos."""
+    waited = []
+    monkeypatch.setattr(rate_limit.time, 'sleep', waited.append)
+    return waited
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def bucket(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryTokenBucket('scryfall', rate=10, burst=2)
+    return SQLiteTokenBucket('scryfall', rate=10, burst=2, db_path=str(tmp_path / 'limits.db'))
+
+
+def test_bucket_reserves_in_order(bucket):
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # Sem fichas: a próxima vale em 1/rate, a seguinte em 2/rate
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+    # Passaria do timeout: nada é reservado
+    assert bucket.reserve(timeout=0.1) is None
+    assert bucket.reserve() == pytest.approx(0.3, abs=0.02)
+
+
+def test_bucket_pause(bucket):
+    bucket.pause(2)
+    assert bucket.reserve() == pytest.approx(2.1, abs=0.02)
+
+
+def test_sqlite_bucket_is_shared(tmp_path):
+    path = str(tmp_path / 'limits.db')
+    first = SQLiteTokenBucket('scryfall', rate=10, burst=1, db_path=path)
+    second = SQLiteTokenBucket('scryfall', rate=10, burst=1, db_path=path)
+
+    assert first.reserve() == 0
+    assert second.reserve() == pytest.approx(0.1, abs=0.02)
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(FakeResponse(429, '3')) == 3.0
+    assert retry_after_seconds(FakeResponse(429, 'Thu, 01 Jan 1970 00:00:00 GMT')) == 0.0
+    assert retry_after_seconds(FakeResponse(429, 'soon')) is None
+    assert retry_after_seconds(FakeResponse(429)) is None
+
+
+def test_retry_delay():
+    bucket = MemoryTokenBucket('scryfall', rate=10, burst=10)
+
+    assert _retry_delay(FakeResponse(404), bucket, 0, 0.5, 8.0, 30.0) is None
+    assert _retry_delay(FakeResponse(503, '2'), bucket, 0, 0.5, 8.0, 30.0) == 2.0
+    assert 0 <= _retry_delay(FakeResponse(502), bucket, 3, 0.5, 8.0, 30.0) <= 4.0
+    # Pedido longo demais: a resposta vale como está
+    assert _retry_delay(FakeResponse(503, '60'), bucket, 0, 0.5, 8.0, 30.0) is None
+
+    # 429 pausa o balde, que passa a fazer a espera
+    assert _retry_delay(FakeResponse(429, '2'), bucket, 0, 0.5, 8.0, 30.0) == 0
+    assert bucket.reserve() == pytest.approx(2.1, abs=0.02)
+    assert _retry_delay(FakeResponse(429, '2'), None, 0, 0.5, 8.0, 30.0) == 2.0
+
+
+def test_request_with_retry(sleeps):
+    responses = [FakeResponse(503, '1'), FakeResponse(502, '2'), FakeResponse(200)]
+
+    response = request_with_retry(lambda: responses[len(sleeps)])
+
+    assert response.status_code == 200
+    assert sleeps == [1.0, 2.0]
+    assert responses[0].closed and responses[1].closed
+
+
+def test_request_with_retry_gives_up(sleeps):
+    response = request_with_retry(lambda: FakeResponse(503, '1'), retries=2)
+
+    assert response.status_code == 503
+    assert not response.closed
+    assert sleeps == [1.0, 1.0]
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {'name': 'Sol Ring'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(('GET', '/cards/1'), fetch)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+
+    deadline = time.time() + 5
+    while flight.coalesced < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert flight.coalesced == 4
+    assert results == [{'name': 'Sol Ring'}] * 5
+
+    # Terminada a chamada, a próxima com a mesma chave é nova
+    flight.do(('GET', '/cards/1'), fetch)
+    assert len(calls) == 2
+
+
+def test_single_flight_does_not_keep_errors():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
+    assert flight.do('key', lambda: 'ok') == 'ok'
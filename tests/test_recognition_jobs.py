@@ -0,0 +1,110 @@
+"""
+Testes do pipeline de reconhecimento em segundo plano: criação e consulta
+dos jobs, fila cheia e o caminho sem detecção da carta. Processamento,
+OCR e Scryfall são substituídos por funções locais.
+"""
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+import recognition_jobs
+import card_detection
+from recognition_jobs import RecognitionPipeline, SQLiteJobStore, QueueFullError
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Estágios falsos: a imagem é o próprio identificador; b'block' espera `release`."""
+    release = threading.Event()
+
+    def process_image(image, formats=None):
+        if image == b'block':
+            release.wait(5)
+        return image, None
+
+    def identify(image_bytes, analysis=None, detect=True):
+        return {'name': image_bytes.decode()} if image_bytes != b'blank' else None
+
+    def search_card(identifier):
+        if identifier['name'] == 'missing':
+            return "Not found"
+        return {'id': f"id-{identifier['name']}", 'name': identifier['name']}
+
+    monkeypatch.setattr(recognition_jobs, 'process_image_for_recognition', process_image)
+    monkeypatch.setattr(recognition_jobs.CardRecognition, 'identify_card_from_bytes', staticmethod(identify))
+    monkeypatch.setattr(recognition_jobs.Scryfall, 'search_card', staticmethod(search_card))
+    yield release
+    release.set()
+
+
+def wait_for(pipeline, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = pipeline.get(job_id)
+        if job['status'] not in ('queued', 'running'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_submit_and_get(stages, tmp_path):
+    pipeline = RecognitionPipeline(workers=2, max_pending=4, store=SQLiteJobStore(str(tmp_path / 'jobs.db')))
+
+    job = pipeline.submit(b'Sol Ring')
+    assert job['status'] == 'queued'
+
+    finished = wait_for(pipeline, job['id'])
+    assert finished['status'] == 'done'
+    assert finished['card_id'] == 'id-Sol Ring'
+    assert set(finished['timings_ms']) >= {'queue', 'process_image', 'ocr', 'lookup', 'total'}
+
+    # Outro worker lê o mesmo arquivo de jobs
+    other = RecognitionPipeline(store=SQLiteJobStore(str(tmp_path / 'jobs.db')))
+    assert other.get(job['id'])['card_name'] == 'Sol Ring'
+    assert pipeline.get('unknown') is None
+
+
+def test_failures_are_reported(stages):
+    pipeline = RecognitionPipeline(workers=1, max_pending=4)
+
+    blank = wait_for(pipeline, pipeline.submit(b'blank')['id'])
+    missing = wait_for(pipeline, pipeline.submit(b'missing')['id'])
+
+    assert blank['status'] == 'failed'
+    assert blank['error'] == 'Could not identify the card from the image'
+    assert missing['error'] == 'Card not found in Scryfall database'
+    assert pipeline.stats()['failed'] == 2
+
+
+def test_full_queue_rejects_uploads(stages):
+    pipeline = RecognitionPipeline(workers=1, max_pending=2)
+
+    first = pipeline.submit(b'block')
+    pipeline.submit(b'Sol Ring')
+    with pytest.raises(QueueFullError):
+        pipeline.submit(b'Sol Ring')
+    assert pipeline.stats()['rejected'] == 1
+
+    # Terminados os jobs, a fila volta a aceitar
+    stages.set()
+    wait_for(pipeline, first['id'])
+    deadline = time.time() + 5
+    while pipeline.stats()['in_flight'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert pipeline.submit(b'Sol Ring')['status'] == 'queued'
+
+
+def test_detection_failure_falls_back_to_the_whole_image(monkeypatch):
+    def broken_analysis(image_bytes):
+        raise ValueError("no contour")
+
+    monkeypatch.setattr(card_detection, 'process_image_to_bytes', lambda source, formats=None: b'jpeg')
+    monkeypatch.setattr(card_detection, 'analyze_card', broken_analysis)
+
+    assert card_detection.process_image_for_recognition(b'upload') == (b'jpeg', None)
@@ -0,0 +1,99 @@
+"""
+Testes da paginação da busca: uma página do site (SEARCH_PAGE_SIZE) é
+montada a partir das páginas de 175 cartas da API, baixando só as que
+cobrem o intervalo pedido.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+from scryfall import Scryfall
+
+API_PAGE_SIZE = Scryfall.API_PAGE_SIZE
+
+
+@pytest.fixture
+def api_pages(monkeypatch):
+    """Busca falsa com 400 resultados; guarda as páginas da API lidas."""
+    total = 400
+    requested = []
+
+    def search_api_page(query, api_page):
+        requested.append(api_page)
+        offset = (api_page - 1) * API_PAGE_SIZE
+        numbers = range(offset, min(offset + API_PAGE_SIZE, total))
+        return {
+            'total_cards': total,
+            'has_more': offset + API_PAGE_SIZE < total,
+            'cards': [{'id': str(n), 'name': f"Card {n}"} for n in numbers],
+            'fetched_at': 1000.0 + api_page
+        }
+
+    monkeypatch.setattr(Scryfall, '_search_api_page', staticmethod(search_api_page))
+    return requested
+
+
+def ids(result):
+    return [int(card['id']) for card in result['cards']]
+
+
+def test_search_window():
+    assert Scryfall._search_window(1, 50) == (0, 50, 1)
+    assert Scryfall._search_window(4, 50) == (150, 200, 1)
+    assert Scryfall._search_window(5, 50) == (200, 250, 2)
+    # Páginas inválidas viram a primeira
+    assert Scryfall._search_window(0, 50) == (0, 50, 1)
+
+
+def test_take_from_api_page():
+    result = {'cards': [{'id': str(n)} for n in range(API_PAGE_SIZE, 2 * API_PAGE_SIZE)], 'has_more': True}
+
+    cards = []
+    assert Scryfall._take_from_api_page(cards, result, 2, 200, 250)
+    assert [card['id'] for card in cards] == [str(n) for n in range(200, 250)]
+
+    # O intervalo passa do fim desta página: falta ler a próxima
+    cards = []
+    assert not Scryfall._take_from_api_page(cards, result, 2, 300, 400)
+    assert len(cards) == 2 * API_PAGE_SIZE - 300
+
+    # Última página da busca: não há próxima para ler
+    cards = []
+    assert Scryfall._take_from_api_page(cards, dict(result, has_more=False), 2, 300, 400)
+
+
+def test_page_inside_one_api_page(api_pages):
+    result = Scryfall.search_cards('t:goblin', page=2, page_size=50)
+
+    assert ids(result) == list(range(50, 100))
+    assert api_pages == [1]
+    assert result['total_cards'] == 400
+    assert result['has_more'] is True
+    assert result['fetched_at'] == 1001.0
+
+
+def test_page_spanning_two_api_pages(api_pages):
+    result = Scryfall.search_cards('t:goblin', page=4, page_size=50)
+
+    assert ids(result) == list(range(150, 200))
+    assert api_pages == [1, 2]
+    assert result['fetched_at'] == 1002.0
+
+
+def test_last_page(api_pages):
+    result = Scryfall.search_cards('t:goblin', page=8, page_size=50)
+
+    assert ids(result) == list(range(350, 400))
+    assert api_pages == [3]
+    assert result['has_more'] is False
+
+    assert Scryfall.search_cards('t:goblin', page=9, page_size=50)['cards'] == []
+
+
+def test_failed_search(monkeypatch):
+    monkeypatch.setattr(Scryfall, '_search_api_page', staticmethod(lambda query, api_page: None))
+    assert Scryfall.search_cards('t:goblin') == "Not found"
@@ -0,0 +1,80 @@
+"""
+Testes da sessão compartilhada da Scryfall: as consultas devem reaproveitar
+a mesma conexão keep-alive em vez de abrir uma conexão TCP por chamada.
+A Scryfall é substituída por um servidor HTTP local.
+"""
+import os
+import sys
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+from scryfall import Scryfall
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def setup(self):
+        super().setup()
+        # Uma chamada de setup() por conexão TCP aceita
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        card_id = self.path.rsplit('/', 1)[-1]
+        body = json.dumps({'object': 'card', 'id': card_id, 'name': f'Card {card_id}'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    original_url = Scryfall.BASE_URL
+    original_index = Scryfall.index
+    Scryfall.configure(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+    Scryfall.index = None
+    Scryfall.cache.clear()
+    yield server
+
+    Scryfall.configure(base_url=original_url)
+    Scryfall.index = original_index
+    Scryfall.cache.clear()
+    server.shutdown()
+    server.server_close()
+
+
+def test_lookups_reuse_one_connection(stand_in):
+    for number in range(5):
+        card = Scryfall.search_unique_card(f"card-{number}")
+        assert card['id'] == f"card-{number}"
+
+    assert stand_in.connections == 1
+
+
+def test_configure_discards_the_session(stand_in):
+    assert Scryfall.search_unique_card("first")['id'] == "first"
+
+    # Nova configuração: a sessão (e a conexão) anterior é descartada
+    Scryfall.configure(base_url=Scryfall.BASE_URL)
+    assert Scryfall.search_unique_card("second")['id'] == "second"
+
+    assert stand_in.connections == 2
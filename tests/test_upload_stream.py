@@ -0,0 +1,84 @@
+"""
+Testes dos uploads: formato pelos primeiros bytes (não pela extensão),
+arquivo em memória com limite de tamanho e a recusa (413) no app, com e
+sem Content-Length.
+"""
+import io
+import os
+import sys
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_SHARED", "0")
+
+from upload_stream import SpooledUpload, sniff_image_format
+from views import MAX_FILE_SIZE
+
+JPEG = b'\xff\xd8\xff\xe0\x00\x10JFIF'
+PNG = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR'
+HEIC = b'\x00\x00\x00\x18ftypheic\x00\x00\x00\x00'
+
+
+def test_sniff_image_format():
+    assert sniff_image_format(JPEG) == 'JPEG'
+    assert sniff_image_format(bytearray(PNG)) == 'PNG'
+    assert sniff_image_format(b'GIF89a\x01\x00') == 'GIF'
+    assert sniff_image_format(HEIC) == 'HEIF'
+    assert sniff_image_format(b'\x00\x00\x00\x18ftypisom') is None
+    assert sniff_image_format(b'<html>') is None
+    assert sniff_image_format(b'') is None
+
+
+def test_sniff_restores_the_stream_position():
+    stream = io.BytesIO(b'header' + PNG)
+    stream.seek(6)
+
+    assert sniff_image_format(stream) == 'PNG'
+    assert stream.tell() == 6
+
+
+def test_spooled_upload_limit():
+    upload = SpooledUpload(max_bytes=10, spool_bytes=4)
+    upload.write(b'12345')
+    upload.write(b'67890')
+    upload.seek(0)
+    assert upload.read() == b'1234567890'
+
+    with pytest.raises(RequestEntityTooLarge):
+        upload.write(b'!')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import main
+    # Sem as threads do estoque de jogos e dos preços (acessam a Scryfall)
+    monkeypatch.setattr(main, 'start_background_threads', lambda: None)
+    return main.app.test_client()
+
+
+def test_upload_over_the_limit_is_refused(client):
+    data = {'card_image': (io.BytesIO(JPEG + b'\x00' * MAX_FILE_SIZE), 'card.jpg')}
+    assert client.post('/card-recognition', data=data).status_code == 413
+
+
+def test_chunked_upload_over_the_limit_is_refused(client):
+    # Sem Content-Length: o servidor (ex: gunicorn) marca o corpo como terminado
+    body = (b'--x\r\nContent-Disposition: form-data; name="card_image"; filename="card.jpg"\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + JPEG + b'\x00' * MAX_FILE_SIZE + b'\r\n--x--\r\n')
+
+    response = client.post('/card-recognition', input_stream=io.BytesIO(body),
+                           headers={'Transfer-Encoding': 'chunked'},
+                           environ_overrides={'wsgi.input_terminated': True},
+                           content_type='multipart/form-data; boundary=x')
+    assert response.status_code == 413
+
+
+def test_invalid_file_type_uses_the_content(client):
+    data = {'card_image': (io.BytesIO(b'not an image'), 'card.jpg')}
+    response = client.post('/card-recognition', data=data)
+
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session['_flashes'][0][1] == 'Invalid file type. Upload PNG/JPG/JPEG/GIF/HEIC only.'
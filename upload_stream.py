@@ -0,0 +1,58 @@
+import os
+from tempfile import SpooledTemporaryFile
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Uploads até este tamanho ficam só em memória; acima disso vão para um arquivo temporário
+UPLOAD_SPOOL_BYTES = int(os.environ.get("UPLOAD_SPOOL_BYTES", 8 * 1024 * 1024))
+
+# Assinaturas (magic bytes) dos formatos aceitos -> nome do formato no Pillow
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+# Marcas do contêiner ISO BMFF (bytes 8 a 12, depois de "ftyp") usadas por HEIC/HEIF
+HEIF_BRANDS = {b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'hevm', b'hevs', b'mif1', b'msf1'}
+
+
+class SpooledUpload(SpooledTemporaryFile):
+    """
+    Destino de um arquivo enviado: fica em memória até `spool_bytes` e
+    recusa (HTTP 413) o upload assim que ele passa de `max_bytes`, mesmo
+    sem Content-Length (envio em chunks).
+    """
+
+    def __init__(self, max_bytes, spool_bytes=UPLOAD_SPOOL_BYTES):
+        super().__init__(max_size=spool_bytes, mode='w+b')
+        self.max_bytes = max_bytes
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        if self.written > self.max_bytes:
+            raise RequestEntityTooLarge()
+        return super().write(data)
+
+
+def sniff_image_format(source):
+    """
+    Identifica o formato pelos primeiros bytes (não pela extensão do nome).
+    `source` pode ser bytes ou um arquivo com seek (a posição é restaurada).
+    Retorna o nome do formato no Pillow ('JPEG', 'PNG', 'GIF', 'HEIF') ou None.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        head = bytes(source[:16])
+    else:
+        position = source.tell()
+        head = source.read(16)
+        source.seek(position)
+
+    for signature, image_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+
+    if head[4:8] == b'ftyp' and head[8:12] in HEIF_BRANDS:
+        return 'HEIF'
+    return None
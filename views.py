@@ -0,0 +1,125 @@
+"""
+Lógica das páginas compartilhada pelo app WSGI (main.py) e pelo ASGI
+(asgi.py): validação dos uploads, mensagens, argumentos dos templates e
+os ganchos de requisição. Só depende do werkzeug, usado pelo Flask e pelo
+Quart; cada app fica apenas com o que muda entre eles (await, flash).
+"""
+from werkzeug.exceptions import RequestEntityTooLarge
+from game_store import current_blur_level
+from image_derivatives import ImageDerivatives, IMMUTABLE_MAX_AGE
+from upload_stream import sniff_image_format
+
+# Configurações de upload
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'heic'}
+MAX_FILE_SIZE = 5 * 1024 * 1024  # Tamanho máximo: 5MB
+MAX_BATCH_SIZE = 50 * 1024 * 1024  # Tamanho máximo de um lote (várias imagens ou .zip)
+
+# Rota que aceita uploads acima de MAX_FILE_SIZE
+BATCH_ENDPOINT = 'card_recognition_batch'
+
+# Mensagens exibidas pelas duas versões das páginas
+NO_FILE = 'No file selected'
+INVALID_FILE_TYPE = 'Invalid file type. Upload PNG/JPG/JPEG/GIF/HEIC only.'
+QUEUE_FULL = 'Recognition queue is full, try again shortly'
+CARD_NOT_FOUND = 'Card not found'
+CARD_NOT_IN_SCRYFALL = 'Card not found in Scryfall database'
+CARD_NOT_IDENTIFIED = 'Could not identify the card from the image'
+JOB_NOT_FOUND = 'Job not found'
+NO_VALID_CARD = 'Could not fetch a valid card.'
+GAME_START_FAILED = 'An error occurred starting the game.'
+EMPTY_SEARCH = 'Please enter a search term'
+
+
+def upload_limit(endpoint):
+    """Tamanho máximo de cada arquivo enviado para a rota."""
+    return MAX_BATCH_SIZE if endpoint == BATCH_ENDPOINT else MAX_FILE_SIZE
+
+
+def limit_upload_size(endpoint, content_length):
+    """Gancho before_request: só as rotas de lote aceitam uploads acima de MAX_FILE_SIZE."""
+    if endpoint != BATCH_ENDPOINT and (content_length or 0) > MAX_FILE_SIZE:
+        raise RequestEntityTooLarge()
+
+
+def cache_derived_images(endpoint, path, response):
+    """
+    Gancho after_request: as derivadas levam o hash do conteúdo na URL,
+    então navegador e CDN guardam sem revalidar.
+    """
+    if endpoint == 'static' and response.status_code in (200, 304) and ImageDerivatives.is_derived(path):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+def check_upload(file):
+    """
+    Confere o arquivo enviado. Retorna (formato, None) ou (None, mensagem de erro).
+    O formato vem dos primeiros bytes (a extensão do nome não garante nada).
+    """
+    if file is None or not file.filename:
+        return None, NO_FILE
+
+    image_format = sniff_image_format(file.stream)
+    if not image_format:
+        return None, INVALID_FILE_TYPE
+    return image_format, None
+
+
+def job_created(job, status_url):
+    """Corpo da resposta 202 de um job de reconhecimento enfileirado."""
+    return {'job_id': job['id'], 'status': job['status'], 'status_url': status_url}
+
+
+def search_template_args(results, search_term, page):
+    """Argumentos de pages/card-search.html para uma página de resultados."""
+    return {
+        'cards': results['cards'],
+        'search_term': search_term,
+        'page': page,
+        'total_cards': results['total_cards'],
+        'first_result': (page - 1) * results['page_size'] + 1,
+        'has_more': results['has_more']
+    }
+
+
+def game_image_sources(derivatives, image_url, static_url):
+    """srcset das derivadas de uma imagem do jogo (None: a página usa a imagem original)."""
+    if derivatives is None:
+        return None
+    return derivatives.sources_for_url(image_url, static_url)
+
+
+def game_template_args(game_state, image_sources):
+    """
+    Argumentos de pages/interactive-game.html para um jogo ativo.
+    `image_sources(url)` retorna o srcset de uma imagem (ver game_image_sources).
+    """
+    image_url = current_blur_level(game_state)
+    game_over = game_state['game_over']
+    return {
+        'game_active': True,
+        'image_url': image_url,
+        'image_url_original': game_state['image_url_original'],
+        'image': image_sources(image_url),
+        'image_original': image_sources(game_state['image_url_original']) if game_over else None,
+        'attempts': game_state['attempts'],
+        'max_attempts': game_state['max_attempts'],
+        'guesses': game_state['guesses'],
+        'game_over': game_over,
+        'win': game_state['win'],
+        'correct_card_name': game_state.get('card_name') if game_over else None,
+        'word_length': game_state.get('word_length'),
+        'target_word': game_state.get('card_name')
+    }
+
+
+def guess_message(result, game_state):
+    """Mensagem (texto, categoria) do resultado de um palpite, ou None se o jogo continua."""
+    if result == 'win':
+        return f'Congratulations! You guessed correctly: {game_state["card_name"]}', 'success'
+    if result == 'lose':
+        return f'Game Over! The card was: {game_state["card_name"]}', 'error'
+    return None